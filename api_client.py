@@ -0,0 +1,120 @@
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, build_http
+from httplib2 import HttpLib2Error
+import threading
+import json
+import time
+import os
+
+import response_cache
+import raw_journal
+import rate_limiter
+
+YOUTUBE_SERVICE_NAME = "youtube"
+YOUTUBE_API_VERSION = "v3"
+# Optional path to a pinned copy of the discovery document; by default the copy
+# bundled with google-api-python-client is used (no network fetch)
+YOUTUBE_DISCOVERY_FILE = os.getenv("YOUTUBE_DISCOVERY_FILE")
+
+# Cap on concurrent API requests across all threads of the process
+MAX_INFLIGHT_REQUESTS = int(os.getenv("YOUTUBE_MAX_INFLIGHT", "8"))
+
+_inflight = threading.BoundedSemaphore(MAX_INFLIGHT_REQUESTS)
+_local = threading.local()
+
+def set_max_inflight(limit: int):
+    global _inflight
+    _inflight = threading.BoundedSemaphore(max(1, limit))
+
+# Every request built by our clients waits for a rate-limiter token and an in-flight slot
+# before hitting the network; 429/5xx/network errors are retried with backoff.
+# Cacheable metadata calls are sent with If-None-Match and a 304 is served from disk.
+# Fresh responses are appended to the raw journal before they are parsed.
+class HarvestHttpRequest(HttpRequest):
+    def execute(self, http=None, num_retries=0):
+        cache = response_cache.get_cache()
+        cache_key = cache.key_for(self) if cache else None
+        cached = cache.get(cache_key) if cache_key else None
+        if cached:
+            self.headers["If-None-Match"] = cached["etag"]
+
+        # Clients are shared by every thread, httplib2 connections are not
+        http = http or thread_http()
+        limiter = rate_limiter.get_limiter()
+        attempt = 0
+        while True:
+            limiter.acquire()
+            try:
+                with _inflight:
+                    response = super().execute(http=http, num_retries=num_retries)
+                break
+            except HttpError as e:
+                if cached and e.resp.status == 304:
+                    limiter.on_success()
+                    return cached["body"]
+                if not rate_limiter.is_retryable(e) or attempt >= limiter.max_retries:
+                    raise
+                delay = limiter.on_throttle(attempt, rate_limiter.retry_after_seconds(e.resp))
+                print(f"⚠️ {self.methodId} got HTTP {e.resp.status}, retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{limiter.max_retries})")
+            except (HttpLib2Error, OSError) as e:
+                if attempt >= limiter.max_retries:
+                    raise
+                delay = limiter.on_throttle(attempt)
+                print(f"⚠️ {self.methodId} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+        limiter.on_success()
+
+        journal = raw_journal.get_journal()
+        if journal and isinstance(response, dict):
+            journal.record(self, response)
+        if cache_key and isinstance(response, dict) and response.get("etag"):
+            cache.put(cache_key, response["etag"], response)
+        return response
+
+_discovery = None
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Parsed once per process. build() would re-read and re-parse the ~400 KB
+# document for every client it constructs.
+def discovery_document() -> dict:
+    global _discovery
+    with _clients_lock:
+        if _discovery is None:
+            if YOUTUBE_DISCOVERY_FILE:
+                with open(YOUTUBE_DISCOVERY_FILE, encoding="utf-8") as f:
+                    _discovery = json.load(f)
+            else:
+                document = get_static_doc(YOUTUBE_SERVICE_NAME, YOUTUBE_API_VERSION)
+                _discovery = json.loads(document) if document else None
+        return _discovery
+
+def build_client(api_key: str):
+    document = discovery_document()
+    if document is None:  # no bundled copy: let build() fetch it
+        return build(YOUTUBE_SERVICE_NAME, YOUTUBE_API_VERSION, developerKey=api_key,
+                     requestBuilder=HarvestHttpRequest)
+    return build_from_document(document, developerKey=api_key, requestBuilder=HarvestHttpRequest)
+
+# One client per key for the whole process, built on first use. Safe to share
+# across threads because every request executes on its thread's own connection
+# (see thread_http), so Streamlit reruns and new worker threads reuse it.
+def get_client(api_key: str):
+    with _clients_lock:
+        client = _clients.get(api_key)
+    if client is None:
+        client = build_client(api_key)
+        with _clients_lock:
+            client = _clients.setdefault(api_key, client)
+    return client
+
+# httplib2.Http is not thread-safe: one per thread, kept for connection reuse
+def thread_http():
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = _local.http = build_http()
+    return http
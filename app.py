@@ -1,179 +1,284 @@
 import streamlit as st
-import psycopg2
-import psycopg2.extras
 import os
 import pandas as pd
 import plotly.express as px
-from googleapiclient.discovery import build
 from dotenv import load_dotenv
+from key_pool import get_pool
+from bulk_writer import bulk_upsert
+from db_pool import ConnectionPool, connect_postgres
+from query_cache import QueryCache
+from channel_stats import create_summary_tables, refresh_channel_stats, refresh_all_stats
+from pagination import keyset_query, next_cursor, PAGE_SIZE
+from indexes import apply_index_migrations
+from comments import migrate_comment_channels
+from streaming import read_frame, iter_frames, STREAM_CHUNK_ROWS
+from insights import QUERIES
+from export import snapshot_available, query_snapshot
+from stats_snapshots import create_snapshot_tables, channel_growth_query, video_growth_query
+from migration import create_archive_tables, migrate_videos
+from background_jobs import JobRunner, JobBusy
 
 load_dotenv()
 
-API_KEY = os.getenv("YOUTUBE_API_KEY")
-youtube = build("youtube", "v3", developerKey=API_KEY)
-
 # ---------------------- PostgreSQL Connection ----------------------
+# One pool per Streamlit server process, shared by every session and rerun
+@st.cache_resource
+def get_db_pool():
+    return ConnectionPool(connect_postgres)
+
+# Pooled connection; close() hands it back to the pool
 def get_db_connection():
     try:
-        return psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            sslmode='require'
-        )
+        return get_db_pool().getconn()
     except Exception as e:
         st.error(f"❌ Database connection failed: {e}")
         return None
 
+# ---------------------- Query Result Cache ----------------------
+# Shared by all sessions; writers below invalidate the tables they touch
+@st.cache_resource
+def get_query_cache():
+    return QueryCache()
+
+# ---------------------- Summary Tables & Indexes ----------------------
+# Created (and back-filled if empty) once per server process
+@st.cache_resource
+def init_schema():
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        migrate_comment_channels(conn)
+        apply_index_migrations(conn)
+        create_summary_tables(conn)
+        create_snapshot_tables(conn)
+        create_archive_tables(conn)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM channel_stats LIMIT 1")
+            if cursor.fetchone() is None:
+                refresh_all_stats(conn)
+        return True
+    finally:
+        conn.close()
+
 # ---------------------- Utility ----------------------
-def fetch_data(query, params=None):
+# stream=True reads through a server-side cursor in chunks (bounded memory for
+# large exports and analytics); results are built column-wise from tuples.
+def fetch_data(query, params=None, use_cache=True, stream=False):
+    cache = get_query_cache() if use_cache else None
+    if cache:
+        cached = cache.get(query, params)
+        if cached is not None:
+            return cached
+
     conn = get_db_connection()
     if not conn:
         return pd.DataFrame()
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            cursor.execute(query, params if params else ())
-            result = cursor.fetchall()
-            return pd.DataFrame(result)
+        df = read_frame(conn, query, params, server_side=stream)
+        if cache:
+            cache.put(query, params, df)
+        return df
     except Exception as e:
         st.error(f"❌ Query error: {e}")
         return pd.DataFrame()
     finally:
         conn.close()
 
-# ---------------------- Fetch & Store Channel Info ----------------------
-def fetch_channel_data(channel_id):
-    try:
-        response = youtube.channels().list(
-            part="snippet,statistics,contentDetails",
-            id=channel_id
-        ).execute()
-
-        if response.get("items"):
-            data = response["items"][0]
-            return {
-                "channel_id": channel_id,
-                "channel_name": data["snippet"]["title"],
-                "subscribers": data["statistics"].get("subscriberCount", 0),
-                "views": data["statistics"].get("viewCount", 0),
-                "total_videos": data["statistics"].get("videoCount", 0),
-                "description": data["snippet"].get("description", ""),
-                "playlist_id": data["contentDetails"]["relatedPlaylists"].get("uploads", "")
-            }
-        return None
-    except Exception as e:
-        st.error(f"❌ Error fetching channel data: {e}")
-        return None
-
-def store_channel_data(channel_data):
+# Yield DataFrame chunks of a large result without materialising it
+def stream_data(query, params=None, chunk_size=STREAM_CHUNK_ROWS):
     conn = get_db_connection()
     if not conn:
         return
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO channels (channel_id, channel_name, subscribers, views, total_videos, description, playlist_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (channel_id) DO UPDATE SET
-                    channel_name = EXCLUDED.channel_name,
-                    subscribers = EXCLUDED.subscribers,
-                    views = EXCLUDED.views,
-                    total_videos = EXCLUDED.total_videos,
-                    description = EXCLUDED.description,
-                    playlist_id = EXCLUDED.playlist_id
-            """, (
-                channel_data["channel_id"],
-                channel_data["channel_name"],
-                channel_data["subscribers"],
-                channel_data["views"],
-                channel_data["total_videos"],
-                channel_data["description"],
-                channel_data["playlist_id"]
-            ))
-            conn.commit()
-        st.success(f"✅ Channel '{channel_data['channel_name']}' stored.")
-    except Exception as e:
-        st.error(f"❌ Error storing channel: {e}")
+        yield from iter_frames(conn, query, params, chunk_size, server_side=True)
     finally:
         conn.close()
 
+# ---------------------- Fetch & Store Channel Info ----------------------
+# These run inside background jobs, off the script thread: no st.* calls, and
+# errors propagate to the job row
+def fetch_channel_data(channel_id):
+    response = get_pool().execute(lambda yt: yt.channels().list(
+        part="snippet,statistics,contentDetails",
+        id=channel_id
+    ))
+
+    if response.get("items"):
+        data = response["items"][0]
+        return {
+            "channel_id": channel_id,
+            "channel_name": data["snippet"]["title"],
+            "subscribers": data["statistics"].get("subscriberCount", 0),
+            "views": data["statistics"].get("viewCount", 0),
+            "total_videos": data["statistics"].get("videoCount", 0),
+            "description": data["snippet"].get("description", ""),
+            "playlist_id": data["contentDetails"]["relatedPlaylists"].get("uploads", "")
+        }
+    return None
+
+def store_channel_data(conn, channel_data):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO channels (channel_id, channel_name, subscribers, views, total_videos, description, playlist_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (channel_id) DO UPDATE SET
+                channel_name = EXCLUDED.channel_name,
+                subscribers = EXCLUDED.subscribers,
+                views = EXCLUDED.views,
+                total_videos = EXCLUDED.total_videos,
+                description = EXCLUDED.description,
+                playlist_id = EXCLUDED.playlist_id
+        """, (
+            channel_data["channel_id"],
+            channel_data["channel_name"],
+            channel_data["subscribers"],
+            channel_data["views"],
+            channel_data["total_videos"],
+            channel_data["description"],
+            channel_data["playlist_id"]
+        ))
+        conn.commit()
+    refresh_channel_stats(conn, [channel_data["channel_id"]])
+
 # ---------------------- Fetch & Store Playlists ----------------------
 def fetch_playlists(channel_id):
+    response = get_pool().execute(lambda yt: yt.playlists().list(
+        part="snippet",
+        channelId=channel_id,
+        maxResults=50
+    ))
+    return [{
+        "playlist_id": item["id"],
+        "title": item["snippet"]["title"],
+        "channel_id": channel_id
+    } for item in response.get("items", [])]
+
+def store_playlists(conn, playlists):
+    return bulk_upsert(conn, "playlists", ["playlist_id", "title", "channel_id"],
+                       [(p["playlist_id"], p["title"], p["channel_id"]) for p in playlists], ["playlist_id"])
+
+# ---------------------- Background Jobs ----------------------
+# Buttons only queue work; the job status panel below polls the dashboard_jobs
+# table. The pool and cache are passed in from the script run that submits.
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(get_db_pool())
+
+def collect_channel_job(channel_id, with_playlists, pool, cache):
+    def run(report):
+        report(0.1, "Fetching channel from the YouTube API")
+        channel_data = fetch_channel_data(channel_id)
+        if not channel_data:
+            raise LookupError(f"No data found for channel {channel_id}")
+        result = {"channel": channel_data["channel_name"]}
+        with pool.connection() as conn:
+            report(0.4, "Storing channel")
+            store_channel_data(conn, channel_data)
+            cache.invalidate("channels", "channel_stats", "video_comment_stats")
+            if with_playlists:
+                report(0.6, "Fetching playlists")
+                stored = store_playlists(conn, fetch_playlists(channel_id))
+                cache.invalidate("playlists")
+                result["playlists"] = stored["rows"]
+        return result
+    return run
+
+# Chunked and incremental (see migration.py): only videos changed since the last
+# run are copied, one committed primary-key range at a time
+def migrate_job(channel_id, full, pool, cache):
+    def run(report):
+        with pool.connection() as conn:
+            result = migrate_videos(conn, channel_id=channel_id, full=full,
+                                    progress=lambda done, total, rows: report(done / total if total else 0,
+                                                                              f"{rows:,} rows copied"))
+        cache.invalidate("archived_videos", "video_stats_snapshots", "channel_stats_daily")
+        return result
+    return run
+
+# One job per resource (channel, or the migration scope) at a time. `options` are
+# the settings that change what the job does: a request with the same options
+# follows the running job, one with different options is refused until it ends.
+def submit_job(kind, channel_id, run, options=()):
+    target = channel_id or "all channels"
     try:
-        response = youtube.playlists().list(
-            part="snippet",
-            channelId=channel_id,
-            maxResults=50
-        ).execute()
-        return [{
-            "playlist_id": item["id"],
-            "title": item["snippet"]["title"],
-            "channel_id": channel_id
-        } for item in response.get("items", [])]
-    except Exception as e:
-        st.error(f"❌ Error fetching playlists: {e}")
-        return []
-
-def store_playlists(playlists):
-    conn = get_db_connection()
-    if not conn or not playlists:
+        job_id, created = get_job_runner().submit(kind, run, channel_id=channel_id, options=options)
+    except JobBusy as e:
+        st.warning(f"⚠️ A {kind} job for {target} is already running"
+                   + (f" ({e.options})" if e.options else "") + "; try again when it finishes.")
         return
-    try:
-        with conn.cursor() as cursor:
-            for p in playlists:
-                cursor.execute("""
-                    INSERT INTO playlists (playlist_id, title, channel_id)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (playlist_id) DO UPDATE SET
-                        title = EXCLUDED.title,
-                        channel_id = EXCLUDED.channel_id
-                """, (p["playlist_id"], p["title"], p["channel_id"]))
-            conn.commit()
-        st.success("✅ Playlists stored.")
     except Exception as e:
-        st.error(f"❌ Error storing playlists: {e}")
-    finally:
-        conn.close()
+        st.error(f"❌ Could not start the {kind} job: {e}")
+        return
+    job_ids = st.session_state.setdefault("job_ids", [])
+    if job_id not in job_ids:
+        job_ids.insert(0, job_id)
+    if created:
+        st.info(f"⏳ {kind.capitalize()} job queued.")
+    else:
+        st.info(f"ℹ️ A {kind} job for {target} is already running; following it.")
+
+def collect_channel(channel_id, with_playlists=False):
+    submit_job("collect", channel_id, collect_channel_job(channel_id, with_playlists, get_db_pool(), get_query_cache()),
+               options=("playlists",) if with_playlists else ())
+
+def migrate_data(channel_id=None, full=False):
+    submit_job("migrate", channel_id, migrate_job(channel_id, full, get_db_pool(), get_query_cache()),
+               options=("full",) if full else ())
+
+# Re-runs on its own every JOB_POLL_SECONDS but only queries this session's
+# unfinished jobs (nothing at all when there are none); finished jobs are kept
+# in session state. A full rerun when one of them finishes picks up the new data.
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_status_panel():
+    job_ids = st.session_state.get("job_ids", [])
+    finished = st.session_state.setdefault("jobs_finished", {})
+    unfinished = [job_id for job_id in job_ids if job_id not in finished]
+    current = {}
+    if unfinished:
+        try:
+            current = {job["job_id"]: job for job in get_job_runner().jobs(unfinished)}
+        except Exception as e:
+            st.error(f"❌ Could not read job status: {e}")
+            return
+    jobs = [finished.get(job_id) or current.get(job_id) for job_id in job_ids[:20]]
+    jobs = [job for job in jobs if job]
+    if not jobs:
+        return
+
+    st.write("### ⏳ Background Jobs")
+    newly_finished = False
+    for job in jobs:
+        label = (f"{job['kind'].capitalize()} · {job['channel_id'] or 'all channels'}"
+                 + (f" ({job['options']})" if job.get("options") else ""))
+        if job["status"] in ("queued", "running"):
+            st.progress(job["progress"] or 0.0, text=f"{label}: {job['status']} {job['message'] or ''}")
+            continue
+        if job["status"] == "done":
+            st.success(f"✅ {label}: {job['result']}")
+        else:
+            st.error(f"❌ {label}: {job['error']}")
+        if job["job_id"] not in finished:
+            finished[job["job_id"]] = job
+            newly_finished = True
+
+    if newly_finished:
+        st.rerun(scope="app")
 
 # ---------------------- Streamlit UI ----------------------
 st.set_page_config(page_title="YouTube Harvester", layout="wide")
+init_schema()
 
 st.title("📺 YouTube Channel Harvester")
 channel_id = st.text_input("Enter Channel ID")
 
 if st.button("Collect Channel + Playlists"):
     if channel_id:
-        channel_data = fetch_channel_data(channel_id)
-        if channel_data:
-            store_channel_data(channel_data)
-            playlists = fetch_playlists(channel_id)
-            store_playlists(playlists)
-        else:
-            st.warning("⚠️ Invalid or missing channel.")
-
-# ---------------------- Data Migration Function ----------------------
-def migrate_data():
-    conn = get_db_connection()
-    if not conn:
-        return
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO archived_videos (video_id, title, views, likes, comments)
-                SELECT video_id, title, views, likes, comment_count FROM videos
-                ON CONFLICT (video_id) DO UPDATE SET
-                    views = EXCLUDED.views,
-                    likes = EXCLUDED.likes,
-                    comments = EXCLUDED.comments
-            """)
-            conn.commit()
-        st.success("✅ Data migration completed successfully!")
-    except Exception as e:
-        st.error(f"❌ Data migration failed: {e}")
-    finally:
-        conn.close()
+        collect_channel(channel_id, with_playlists=True)
+    else:
+        st.warning("⚠️ Please enter a Channel ID.")
 
 # ---------------------- Streamlit UI ----------------------
 if st.button("🛠️ Migrate Video Data"):
@@ -206,11 +311,7 @@ col1, col2 = st.columns(2)
 with col1:
     if st.button("📥 Collect and Store Data"):
         if channel_id:
-            channel_data = fetch_channel_data(channel_id)
-            if channel_data:
-                store_channel_data(channel_data)
-            else:
-                st.warning("⚠️ No data found for the given Channel ID.")
+            collect_channel(channel_id)
         else:
             st.warning("⚠️ Please enter a Channel ID.")
 
@@ -232,17 +333,51 @@ col3, col4 = st.columns(2)
 with col3:
     if st.button("📥 Collect and Store Data for Selected Channel"):
         if selected_channel_id:
-            channel_data = fetch_channel_data(selected_channel_id)
-            if channel_data:
-                store_channel_data(channel_data)
-            else:
-                st.warning("⚠️ No data found for the selected Channel.")
+            collect_channel(selected_channel_id)
         else:
             st.warning("⚠️ Please select a channel.")
 
 with col4:
     if st.button("🛠️ Migrate to SQL for Selected Channel"):
-        migrate_data()
+        if selected_channel_id:
+            migrate_data(selected_channel_id)
+        else:
+            st.warning("⚠️ Please select a channel.")
+
+job_status_panel()
+
+# ---------------------- Paged Tables ----------------------
+VIDEO_VIEW_COLUMNS = ["video_id", "title", "published_date", "views", "likes", "comment_count", "duration"]
+COMMENT_VIEW_COLUMNS = ["comment_id", "video_id", "comment_author", "comment_text", "likes", "published_date"]
+
+# Keyset-paged table: pages live in session state and "Load more" fetches the
+# next page after the last row shown, so render cost does not grow with the table
+def paged_table(key, table, columns, where, params, order_columns, total_estimate, empty_message):
+    state = st.session_state.get(key)
+    if state is None or state["params"] != params:
+        state = st.session_state[key] = {"params": params, "pages": [], "cursor": None, "done": False}
+
+    def load_page():
+        query, page_params = keyset_query(table, columns, where, order_columns, state["cursor"])
+        page = fetch_data(query, tuple(params) + tuple(page_params))
+        if not page.empty:
+            state["pages"].append(page)
+            state["cursor"] = next_cursor(page, order_columns)
+        state["done"] = len(page) < PAGE_SIZE
+
+    if not state["pages"] and not state["done"]:
+        load_page()
+    if not state["pages"]:
+        st.warning(empty_message)
+        return
+
+    df = pd.concat(state["pages"], ignore_index=True)
+    total = f"~{int(total_estimate):,}" if total_estimate is not None else "?"
+    st.caption(f"Showing {len(df):,} of {total} rows")
+    st.dataframe(df, height=400)
+    if not state["done"] and st.button("⬇️ Load more", key=f"{key}_more"):
+        load_page()
+        st.rerun()
 
 # ---------------------- Display Data ----------------------
 active_channel_id = channel_id if channel_id else selected_channel_id
@@ -264,117 +399,44 @@ if active_channel_id:
     else:
         st.warning("⚠️ No playlists found.")
 
+    estimates = fetch_data("SELECT video_count, comment_count FROM channel_stats WHERE channel_id = %s",
+                           (active_channel_id,))
+    estimate = estimates.iloc[0] if not estimates.empty else {}
+
     st.write("### 📌 Videos from this Channel")
-    df_videos = fetch_data("SELECT * FROM videos WHERE channel_id = %s", (active_channel_id,))
-    if not df_videos.empty:
-        st.dataframe(df_videos)
-    else:
-        st.warning("⚠️ No videos found.")
-
-    if not df_videos.empty:
-        video_ids = tuple(df_videos["video_id"])
-        if video_ids:
-            st.write("### 📌 Comments on Videos from this Channel")
-            placeholders = ", ".join(["%s"] * len(video_ids))
-            query = f"SELECT * FROM comments WHERE video_id IN ({placeholders})"
-            df_comments = fetch_data(query, video_ids)
-            st.dataframe(df_comments if not df_comments.empty else st.warning("⚠️ No comments found."))
+    paged_table(
+        f"videos_{active_channel_id}", "videos", VIDEO_VIEW_COLUMNS,
+        "channel_id = %s", (active_channel_id,), ["published_date", "video_id"],
+        estimate.get("video_count"), "⚠️ No videos found."
+    )
+
+    # comments.channel_id with idx_comments_channel_published serves this order directly,
+    # so every page is an index range scan instead of a sort over the join with videos
+    st.write("### 📌 Comments on Videos from this Channel")
+    paged_table(
+        f"comments_{active_channel_id}", "comments", COMMENT_VIEW_COLUMNS,
+        "channel_id = %s", (active_channel_id,), ["published_date", "comment_id"],
+        estimate.get("comment_count"), "⚠️ No comments found."
+    )
 else:
     st.warning("⚠️ Please enter a Channel ID or select a channel.")
 
-# ---------------------- SQL Queries for Insights ----------------------
-QUERIES = {
-    "Videos and their Channels": """
-        SELECT v.title AS video_name, c.channel_name
-        FROM videos v
-        JOIN channels c ON v.channel_id = c.channel_id
-    """,
-
-    "Channels with Most Videos": """
-        SELECT c.channel_name, COUNT(v.video_id) AS video_count
-        FROM videos v
-        JOIN channels c ON v.channel_id = c.channel_id
-        GROUP BY c.channel_name
-        ORDER BY video_count DESC
-    """,
-
-    "Top 10 Most Viewed Videos": """
-        SELECT v.title AS video_name, c.channel_name, v.views
-        FROM videos v
-        JOIN channels c ON v.channel_id = c.channel_id
-        ORDER BY v.views DESC
-        LIMIT 10
-    """,
-
-    "Total Views per Channel": """
-        SELECT c.channel_name, COALESCE(SUM(v.views), 0) AS total_views
-        FROM channels c
-        LEFT JOIN videos v ON c.channel_id = v.channel_id
-        GROUP BY c.channel_name
-    """,
-
-    "Channels that Published Videos in 2022": """
-        SELECT DISTINCT c.channel_name
-        FROM videos v
-        JOIN channels c ON v.channel_id = c.channel_id
-        WHERE YEAR(v.published_date) = 2022
-    """,
-
-    "Average Video Duration per Channel": """
-        SELECT
-            c.channel_name,
-            AVG(
-                TIME_TO_SEC(
-                    STR_TO_DATE(REPLACE(REPLACE(REPLACE(v.duration, 'PT', ''), 'M', ':'), 'S', ''), '%i:%s')
-                )
-            ) AS avg_duration_minutes
-        FROM channels c
-        JOIN videos v ON c.channel_id = v.channel_id
-        WHERE v.duration IS NOT NULL AND v.duration <> ''
-        GROUP BY c.channel_name
-    """,
-
-    "Top 10 Videos with Most Comments": """
-        SELECT v.title AS video_name, c.channel_name, COUNT(cm.comment_id) AS comment_count
-        FROM comments cm
-        JOIN videos v ON cm.video_id = v.video_id
-        JOIN channels c ON v.channel_id = c.channel_id
-        GROUP BY v.title, c.channel_name
-        ORDER BY comment_count DESC
-        LIMIT 10
-    """,
-
-    "Videos with Most Likes": """
-        SELECT v.title AS video_name, c.channel_name, v.likes
-        FROM videos v
-        JOIN channels c ON v.channel_id = c.channel_id
-        ORDER BY v.likes DESC
-        LIMIT 10
-    """,
-
-    "Total Likes per Video": """
-        SELECT v.title AS video_name, v.likes
-        FROM videos v
-        ORDER BY v.likes DESC
-    """,
-
-    "Videos with Most Liked Comments": """
-        SELECT v.title AS video_name, c.channel_name, SUM(cm.likes) AS total_comment_likes  
-        FROM comments cm  
-        JOIN videos v ON cm.video_id = v.video_id  
-        JOIN channels c ON v.channel_id = c.channel_id  
-        GROUP BY v.title, c.channel_name  
-        ORDER BY total_comment_likes DESC  
-        LIMIT 10
-    """
-}
-
 st.title("🔍 YouTube Data Insights")
 
 query_option = st.selectbox("Select a query:", list(QUERIES.keys()))
 
+use_snapshot = st.checkbox("Run on the Parquet snapshot (DuckDB)", value=False, disabled=not snapshot_available(),
+                           help="Query the files written by `python export.py` instead of the database")
+
 if st.button("Run Query"):
-    df = fetch_data(QUERIES[query_option])
+    if use_snapshot:
+        try:
+            df = query_snapshot(QUERIES[query_option])
+        except Exception as e:
+            st.error(f"❌ Snapshot query error: {e}")
+            df = pd.DataFrame()
+    else:
+        df = fetch_data(QUERIES[query_option])
     st.dataframe(df if not df.empty else st.warning("⚠️ No data found for this query."))
 
 st.title("📊 Data Visualizations")
@@ -382,17 +444,16 @@ st.title("📊 Data Visualizations")
 # Select Visualization Type
 visualization_type = st.radio(
     "📌 Select a Visualization",
-    ["None", "Total Views per Channel", "Top 10 Most Viewed Videos", "Average Video Duration per Channel", "Videos with Most Liked Comments"]
+    ["None", "Total Views per Channel", "Top 10 Most Viewed Videos", "Average Video Duration per Channel", "Videos with Most Liked Comments",
+     "Growth over Time"]
 )
 
 # 📊 **Total Views per Channel**
 if visualization_type == "Total Views per Channel":
     st.write("### 📊 Total Views per Channel")
     df_views = fetch_data("""
-        SELECT c.channel_name, COALESCE(SUM(v.views), 0) AS total_views
-        FROM channels c
-        LEFT JOIN videos v ON c.channel_id = v.channel_id
-        GROUP BY c.channel_name
+        SELECT channel_name, total_views
+        FROM channel_stats
         ORDER BY total_views DESC
     """)
     if not df_views.empty:
@@ -420,19 +481,7 @@ elif visualization_type == "Top 10 Most Viewed Videos":
 # ⏳ **Average Video Duration per Channel**
 elif visualization_type == "Average Video Duration per Channel":
     st.write("### ⏳ Average Video Duration per Channel")
-    df_avg_duration = fetch_data("""
-        SELECT
-            c.channel_name,
-            AVG(
-                TIME_TO_SEC(
-                    STR_TO_DATE(REPLACE(REPLACE(REPLACE(v.duration, 'PT', ''), 'M', ':'), 'S', ''), '%i:%s')
-                )
-            ) / 60 AS avg_duration_minutes
-        FROM channels c
-        JOIN videos v ON c.channel_id = v.channel_id
-        WHERE v.duration IS NOT NULL AND v.duration <> ''
-        GROUP BY c.channel_name
-    """)
+    df_avg_duration = fetch_data(QUERIES["Average Video Duration per Channel"])
     if not df_avg_duration.empty:
         fig = px.bar(df_avg_duration, x="channel_name", y="avg_duration_minutes", title="Average Video Duration (Minutes)", color="avg_duration_minutes", height=500)
         st.plotly_chart(fig)
@@ -442,17 +491,38 @@ elif visualization_type == "Average Video Duration per Channel":
 # ❤️ **Videos with Most Liked Comments**
 elif visualization_type == "Videos with Most Liked Comments":
     st.write("### ❤️ Videos with Most Liked Comments")
-    df_liked_comments = fetch_data("""
-        SELECT v.title AS video_name, c.channel_name, SUM(cm.likes) AS total_comment_likes  
-        FROM comments cm  
-        JOIN videos v ON cm.video_id = v.video_id  
-        JOIN channels c ON v.channel_id = c.channel_id  
-        GROUP BY v.title, c.channel_name  
-        ORDER BY total_comment_likes DESC  
-        LIMIT 10
-    """)
+    df_liked_comments = fetch_data(QUERIES["Videos with Most Liked Comments"])
     if not df_liked_comments.empty:
         fig = px.pie(df_liked_comments, names="video_name", values="total_comment_likes", title="Videos with Most Liked Comments")
         st.plotly_chart(fig)
     else:
         st.warning("⚠️ No data available.")
+
+# 📈 **Growth over Time** (daily channel totals and per-video snapshots, read by primary key)
+elif visualization_type == "Growth over Time":
+    st.write("### 📈 Growth over Time")
+    if not active_channel_id:
+        st.warning("⚠️ Please enter a Channel ID or select a channel.")
+    else:
+        df_channel_growth = fetch_data(*channel_growth_query(active_channel_id))
+        if not df_channel_growth.empty:
+            fig = px.line(df_channel_growth, x="snapshot_date", y=["views", "likes", "comments"],
+                          title="Channel Totals per Day", height=500)
+            st.plotly_chart(fig)
+        else:
+            st.warning("⚠️ No snapshots recorded for this channel yet.")
+
+        df_growth_videos = fetch_data(
+            "SELECT video_id, title FROM videos WHERE channel_id = %s ORDER BY views DESC LIMIT 50",
+            (active_channel_id,)
+        )
+        if not df_growth_videos.empty:
+            titles = dict(zip(df_growth_videos["video_id"], df_growth_videos["title"]))
+            growth_video_id = st.selectbox("🎬 Video", list(titles), format_func=titles.get)
+            df_video_growth = fetch_data(*video_growth_query(growth_video_id))
+            if not df_video_growth.empty:
+                fig = px.line(df_video_growth, x="captured_at", y="views", title=titles[growth_video_id],
+                              markers=True, height=500)
+                st.plotly_chart(fig)
+            else:
+                st.warning("⚠️ No snapshots recorded for this video yet.")
@@ -0,0 +1,184 @@
+from googleapiclient.errors import HttpError
+import httplib2
+import asyncio
+import aiohttp
+import json
+import os
+
+from key_pool import get_pool, endpoint_cost, is_quota_error
+from parsers import channel_info, comment_info, parse_video_details, playlist_row, PLAYLIST_COLUMNS
+from comments import COMMENT_PAGE_SIZE
+import rate_limiter
+import raw_journal
+
+# asyncio transport for the endpoints the harvester uses. One aiohttp session keeps
+# a pool of keep-alive connections, so thousands of pages (e.g. comment pages) can
+# be in flight from a single thread. Goes through the same key pool, rate limiter
+# and raw journal as the googleapiclient path, and returns the same shapes as the
+# fetchers in youtube.py. Errors are raised as googleapiclient HttpError.
+API_BASE_URL = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+ASYNC_CONCURRENCY = int(os.getenv("YOUTUBE_ASYNC_CONCURRENCY", "64"))
+ASYNC_TIMEOUT = float(os.getenv("YOUTUBE_ASYNC_TIMEOUT", "30"))
+MAX_VIDEO_IDS_PER_REQUEST = 50
+
+class AsyncYouTubeClient:
+    def __init__(self, key_pool=None, base_url: str = API_BASE_URL, concurrency: int = ASYNC_CONCURRENCY,
+                 limiter=None):
+        self.key_pool = key_pool or get_pool()
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.limiter = limiter or rate_limiter.get_limiter()
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector,
+                                              timeout=aiohttp.ClientTimeout(total=ASYNC_TIMEOUT))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def _throttle(self):
+        while True:
+            wait = self.limiter.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    # GET one page of `resource` (e.g. "commentThreads"), rotating keys on quota
+    # errors and backing off on 429/5xx/network errors like HarvestHttpRequest.
+    # The cost is reserved once per key, not once per retry.
+    async def request(self, resource: str, **params) -> dict:
+        method_id = f"youtube.{resource}.list"
+        params = {k: str(v) for k, v in params.items() if v is not None}
+        cost = endpoint_cost(method_id)
+        attempt, key = 0, None
+        while True:
+            if key is None:
+                key = self.key_pool.acquire(cost)
+            await self._throttle()
+            try:
+                async with self._session.get(f"{self.base_url}/{resource}", params={**params, "key": key}) as resp:
+                    content = await resp.read()
+                    status, headers = resp.status, resp.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                if attempt >= self.limiter.max_retries:
+                    raise
+                delay = self.limiter.on_throttle(attempt)
+                print(f"⚠️ {method_id} failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                if status == 200:
+                    self.limiter.on_success()
+                    body = json.loads(content)
+                    journal = raw_journal.get_journal()
+                    if journal:
+                        # A flush compresses and fsyncs a segment; keep that off the event loop
+                        await asyncio.get_running_loop().run_in_executor(None, journal.append, method_id, params, body)
+                    return body
+
+                error = HttpError(httplib2.Response({"status": status, **{k.lower(): v for k, v in headers.items()}}),
+                                  content, uri=f"{self.base_url}/{resource}")
+                if is_quota_error(error):
+                    print(f"API Key ...{key[-4:]} quota exceeded. Trying the next API key...")
+                    self.key_pool.mark_exhausted(key)
+                    key = None
+                    continue
+                if not rate_limiter.is_retryable(error) or attempt >= self.limiter.max_retries:
+                    raise error
+                delay = self.limiter.on_throttle(attempt, rate_limiter.retry_after_seconds(error.resp))
+                print(f"⚠️ {method_id} got HTTP {status}, retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.limiter.max_retries})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    # Yield every page of a paginated list call
+    async def pages(self, resource: str, **params):
+        page_token = None
+        while True:
+            response = await self.request(resource, pageToken=page_token, **params)
+            yield response
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return
+
+    # ---------------------- Fetchers (same shapes as youtube.py) ----------------------
+    async def get_channel_info(self, channel_id: str) -> dict:
+        response = await self.request("channels", part="snippet,contentDetails,statistics", id=channel_id)
+        return channel_info(response["items"][0]) if response.get("items") else {}
+
+    async def get_video_ids(self, channel_id: str, playlist_id: str = None) -> list:
+        if not playlist_id:
+            response = await self.request("channels", part="contentDetails", id=channel_id)
+            if not response.get("items"):
+                return []
+            playlist_id = response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        return [item["contentDetails"]["videoId"]
+                async for page in self.pages("playlistItems", part="contentDetails", playlistId=playlist_id,
+                                             maxResults=50)
+                for item in page.get("items", [])]
+
+    async def search_video_ids(self, channel_id: str) -> list:
+        return [item["id"]["videoId"]
+                async for page in self.pages("search", part="id", channelId=channel_id, maxResults=50, type="video")
+                for item in page.get("items", [])]
+
+    # (rows as parse_video_details tuples, IDs the API did not return); all chunks in parallel
+    async def get_video_details(self, video_ids: list) -> tuple:
+        chunks = [video_ids[i:i + MAX_VIDEO_IDS_PER_REQUEST]
+                  for i in range(0, len(video_ids), MAX_VIDEO_IDS_PER_REQUEST)]
+        responses = await asyncio.gather(*(
+            self.request("videos", part="snippet,contentDetails,statistics", id=",".join(chunk)) for chunk in chunks
+        ))
+        rows = [parse_video_details(item) for response in responses for item in response.get("items", [])]
+        found = {row[0] for row in rows}
+        return rows, [video_id for video_id in video_ids if video_id not in found]
+
+    # Comment dicts of one video (as youtube.get_video_comments), all pages unless
+    # max_comments is set. Quota 403s never get here: request() rotates the key.
+    async def get_video_comments(self, video_id: str, max_comments: int = None) -> list:
+        comments = []
+        try:
+            async for page in self.pages("commentThreads", part="snippet", videoId=video_id,
+                                         maxResults=COMMENT_PAGE_SIZE):
+                items = page.get("items", [])
+                if max_comments is not None:
+                    items = items[:max(max_comments - len(comments), 0)]
+                comments.extend(comment_info(item, video_id) for item in items)
+                if max_comments is not None and len(comments) >= max_comments:
+                    break
+        except HttpError as e:
+            if e.resp.status != 403 or "commentsDisabled" not in rate_limiter.error_reasons(e):
+                raise
+        return comments
+
+    # {video_id: comment dicts}; the videos are fetched concurrently
+    async def get_comments(self, video_ids: list, max_comments: int = None) -> dict:
+        results = await asyncio.gather(*(self.get_video_comments(v, max_comments) for v in video_ids))
+        return dict(zip(video_ids, results))
+
+    async def get_playlists(self, channel_id: str) -> list:
+        return [dict(zip(PLAYLIST_COLUMNS, playlist_row(item)))
+                async for page in self.pages("playlists", part="snippet,contentDetails", channelId=channel_id,
+                                             maxResults=50)
+                for item in page.get("items", [])]
+
+async def _harvest(channel_ids: list, with_comments: bool, max_comments: int) -> dict:
+    async with AsyncYouTubeClient() as client:
+        async def one(channel_id):
+            channel, video_ids, playlists = await asyncio.gather(
+                client.get_channel_info(channel_id), client.get_video_ids(channel_id), client.get_playlists(channel_id)
+            )
+            videos, missing = await client.get_video_details(video_ids)
+            comments = await client.get_comments([row[0] for row in videos if row[9] > 0], max_comments) \
+                if with_comments else {}
+            return {"channel": channel, "playlists": playlists, "video_ids": video_ids, "videos": videos,
+                    "missing": missing, "comments": comments}
+
+        results = await asyncio.gather(*(one(c) for c in channel_ids), return_exceptions=True)
+        return dict(zip(channel_ids, results))
+
+# Blocking entry point: harvest several channels on one event loop.
+# Returns {channel_id: dict of results, or the exception that channel raised}.
+def harvest_channels_async(channel_ids: list, with_comments: bool = True, max_comments: int = None) -> dict:
+    return asyncio.run(_harvest(channel_ids, with_comments, max_comments))
@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+import threading
+import socket
+import json
+import time
+import os
+
+from bulk_writer import dialect_of
+
+# Long-running dashboard work (API harvests, migrations) runs on a process-wide
+# thread pool instead of inside the Streamlit script run. Every job has a row in
+# dashboard_jobs with its status, progress and result, so any session (or another
+# server process) can follow it. While a job is queued or running its
+# active_key (the resource it works on, e.g. "collect:<channel_id>") is set; the
+# UNIQUE constraint on that column is what stops two jobs writing the same rows at
+# once. A second request with the same options follows the running job, one with
+# different options (e.g. a collect with playlists) is refused with JobBusy.
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+# A running job whose process stopped heartbeating this long ago is considered dead
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "120"))
+
+JOB_TABLE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_jobs (
+        job_id VARCHAR(64) PRIMARY KEY,
+        kind VARCHAR(32) NOT NULL,
+        channel_id VARCHAR(255) NULL,
+        active_key VARCHAR(255) NULL UNIQUE,
+        status VARCHAR(16) NOT NULL DEFAULT 'queued',
+        progress DOUBLE PRECISION DEFAULT 0,
+        message TEXT NULL,
+        result TEXT NULL,
+        error TEXT NULL,
+        owner VARCHAR(255) NULL,
+        options VARCHAR(255) NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        heartbeat_at TIMESTAMP NULL,
+        finished_at TIMESTAMP NULL
+    );
+    """
+]
+
+JOB_FIELDS = ["job_id", "kind", "channel_id", "options", "status", "progress", "message", "result", "error",
+              "created_at", "finished_at"]
+
+# submit() found the resource busy with a job whose options differ
+class JobBusy(Exception):
+    def __init__(self, job_id: str, options: str):
+        super().__init__(f"job {job_id} is already running on this resource"
+                         + (f" with options {options}" if options else ""))
+        self.job_id = job_id
+        self.options = options
+
+def create_dashboard_job_table(connection):
+    schema = "current_schema()" if dialect_of(connection) == "postgresql" else "DATABASE()"
+    cursor = connection.cursor()
+    try:
+        for query in JOB_TABLE_QUERIES:
+            cursor.execute(query)
+        # Tables created before job options were recorded
+        cursor.execute(f"""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = {schema} AND table_name = 'dashboard_jobs' AND column_name = 'options'
+        """)
+        if cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE dashboard_jobs ADD COLUMN options VARCHAR(255) NULL")
+        connection.commit()
+    finally:
+        cursor.close()
+
+class JobRunner:
+    def __init__(self, pool, workers: int = BACKGROUND_WORKERS):
+        self.pool = pool
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard-job")
+        self._running = set()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        with pool.connection() as conn:
+            create_dashboard_job_table(conn)
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+
+    def _stale_interval(self, connection) -> str:
+        if dialect_of(connection) == "postgresql":
+            return "CURRENT_TIMESTAMP - %s * INTERVAL '1 second'"
+        return "CURRENT_TIMESTAMP - INTERVAL %s SECOND"
+
+    # Free the active_key of jobs (or of the job holding `active_key`) whose process
+    # died without finishing them. Swept by the heartbeat thread, and for one key on submit.
+    def _expire_stale(self, cursor, connection, active_key: str = None):
+        key_filter = " AND active_key = %s" if active_key else ""
+        cursor.execute(f"""
+            UPDATE dashboard_jobs
+            SET status = 'failed', active_key = NULL, error = 'Worker process stopped', finished_at = CURRENT_TIMESTAMP
+            WHERE active_key IS NOT NULL{key_filter}
+              AND COALESCE(heartbeat_at, created_at) < {self._stale_interval(connection)}
+        """, ([active_key] if active_key else []) + [JOB_STALE_SECONDS])
+
+    # Queue fn(report) -> result (JSON-serialisable) unless a job with the same key
+    # is already queued or running. report(progress 0..1, message) updates the row.
+    # `options` name the settings that change what the job does.
+    # Returns (job_id, created); created is False when an existing job with the same
+    # options was found. Raises JobBusy when the existing job's options differ.
+    def submit(self, kind: str, fn, channel_id: str = None, active_key: str = None, options=()) -> tuple:
+        active_key = active_key or f"{kind}:{channel_id or '*'}"
+        options = ",".join(options) or None
+        job_id = uuid4().hex
+        with self.pool.connection() as conn:
+            postgres = dialect_of(conn) == "postgresql"
+            insert = ("INSERT INTO dashboard_jobs (job_id, kind, channel_id, active_key, owner, options, heartbeat_at) "
+                      "VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)")
+            insert = insert + " ON CONFLICT DO NOTHING" if postgres else insert.replace("INSERT", "INSERT IGNORE", 1)
+            cursor = conn.cursor()
+            try:
+                self._expire_stale(cursor, conn, active_key)
+                cursor.execute(insert, (job_id, kind, channel_id, active_key, self.owner, options))
+                created = cursor.rowcount == 1
+                existing = None
+                if not created:
+                    cursor.execute("SELECT job_id, options FROM dashboard_jobs WHERE active_key = %s", (active_key,))
+                    existing = cursor.fetchone()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        if not created:
+            if existing is None:  # the other job finished in between; try again
+                return self.submit(kind, fn, channel_id, active_key, options.split(",") if options else ())
+            if (existing[1] or None) != options:
+                raise JobBusy(existing[0], existing[1])
+            return existing[0], False
+        with self._lock:
+            self._running.add(job_id)  # heartbeat while queued too
+        self._executor.submit(self._run, job_id, fn)
+        return job_id, True
+
+    # Only touches the job while it has `status`; returns False otherwise (e.g. it
+    # was expired as stale, and its key may already belong to a newer job)
+    def _update(self, job_id: str, assignments: str, params: tuple, status: str = "running") -> bool:
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"UPDATE dashboard_jobs SET {assignments}, heartbeat_at = CURRENT_TIMESTAMP "
+                               f"WHERE job_id = %s AND status = %s", params + (job_id, status))
+                conn.commit()
+                return cursor.rowcount > 0
+            finally:
+                cursor.close()
+
+    def _run(self, job_id: str, fn):
+        try:
+            if not self._update(job_id, "status = 'running'", (), status="queued"):
+                print(f"⚠️ Background job {job_id} was expired before it started")
+                return
+
+            def report(progress: float, message: str = None):
+                self._update(job_id, "progress = %s, message = %s", (max(0.0, min(float(progress), 1.0)), message))
+
+            result = fn(report)
+            if not self._update(job_id, "status = 'done', progress = 1, active_key = NULL, result = %s, "
+                                        "finished_at = CURRENT_TIMESTAMP", (json.dumps(result, default=str),)):
+                print(f"⚠️ Background job {job_id} finished after it was expired; result not recorded")
+        except Exception as e:
+            print(f"❌ Background job {job_id} failed: {e}")
+            try:
+                self._update(job_id, "status = 'failed', active_key = NULL, error = %s, finished_at = CURRENT_TIMESTAMP",
+                             (str(e),))
+            except Exception as update_error:
+                print(f"❌ Could not record the failure of job {job_id}: {update_error}")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    # Keeps heartbeat_at fresh for jobs that go a while without reporting progress,
+    # and every JOB_STALE_SECONDS / 2 expires the jobs of processes that died
+    def _heartbeat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                job_ids = list(self._running)
+            sweep = time.monotonic() - self._last_sweep >= JOB_STALE_SECONDS / 2
+            if not job_ids and not sweep:
+                continue
+            try:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        if job_ids:
+                            cursor.execute(
+                                f"UPDATE dashboard_jobs SET heartbeat_at = CURRENT_TIMESTAMP "
+                                f"WHERE job_id IN ({', '.join(['%s'] * len(job_ids))})", job_ids
+                            )
+                        if sweep:
+                            self._expire_stale(cursor, conn)
+                            self._last_sweep = time.monotonic()
+                        conn.commit()
+                    finally:
+                        cursor.close()
+            except Exception as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+    # These jobs, newest first, as dicts (result decoded). Read-only, so polling
+    # sessions add no write load.
+    def jobs(self, job_ids: list, limit: int = 20) -> list:
+        job_ids = list(job_ids)[:limit]
+        if not job_ids:
+            return []
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM dashboard_jobs "
+                               f"WHERE job_id IN ({', '.join(['%s'] * len(job_ids))}) ORDER BY created_at DESC",
+                               job_ids)
+                rows = cursor.fetchall()
+                conn.commit()
+            finally:
+                cursor.close()
+        jobs = [dict(zip(JOB_FIELDS, row)) for row in rows]
+        for job in jobs:
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+        return jobs
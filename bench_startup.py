@@ -0,0 +1,61 @@
+from googleapiclient.discovery import build
+import subprocess
+import threading
+import statistics
+import time
+import sys
+
+import api_client
+
+# Startup-time benchmark: module import cost in a fresh interpreter, and what a
+# YouTube client costs to build the old way (build() per thread/rerun) versus the
+# process-cached client built from the static discovery document. No network or
+# database access; the API key is a dummy.
+#   python bench_startup.py [--repeat N]
+IMPORT_MODULES = ["api_client", "key_pool", "youtube", "export", "job_queue", "harvest_engine"]
+DUMMY_KEY = "benchmark-key"
+
+def _timed(fn, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def import_time(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+# What every Streamlit rerun (a new script thread) used to pay
+def build_per_call():
+    build(api_client.YOUTUBE_SERVICE_NAME, api_client.YOUTUBE_API_VERSION, developerKey=DUMMY_KEY,
+          requestBuilder=api_client.HarvestHttpRequest)
+
+def cached_client_new_thread():
+    thread = threading.Thread(target=api_client.get_client, args=(DUMMY_KEY,))
+    thread.start()
+    thread.join()
+
+def report(name: str, timings: list):
+    print(f"  {name:<44} median {statistics.median(timings):8.2f} ms   max {max(timings):8.2f} ms")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 20
+
+    print("Import time (fresh interpreter):")
+    for module in IMPORT_MODULES:
+        try:
+            report(f"import {module}", [import_time(module) for _ in range(3)])
+        except RuntimeError as e:
+            print(f"  import {module:<37} skipped ({e})")
+
+    print("Client construction:")
+    report("build() (old: every new thread / rerun)", _timed(build_per_call, repeat))
+    report("first get_client() (parses the document)", _timed(lambda: api_client.get_client(DUMMY_KEY), 1))
+    report("get_client() from a new thread (rerun)", _timed(cached_client_new_thread, repeat))
+    report("build_client() from the parsed document", _timed(lambda: api_client.build_client(DUMMY_KEY), repeat))
@@ -0,0 +1,112 @@
+import io
+import os
+
+# Rows per statement and an approximate payload cap so a chunk stays well below
+# max_allowed_packet (MySQL) and keeps each PostgreSQL COPY reasonably small
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "5000"))
+BULK_CHUNK_BYTES = int(os.getenv("BULK_CHUNK_BYTES", str(4 * 1024 * 1024)))
+
+def dialect_of(connection) -> str:
+    raw = getattr(connection, "raw", connection)  # unwrap db_pool.PooledConnection
+    return "postgresql" if type(raw).__module__.startswith("psycopg2") else "mysql"
+
+def _row_size(row) -> int:
+    return sum(len(str(value)) + 3 for value in row)
+
+# Split rows into chunks bounded by both row count and approximate byte size
+def chunk_rows(rows, max_rows: int = BULK_CHUNK_ROWS, max_bytes: int = BULK_CHUNK_BYTES):
+    chunk, size = [], 0
+    for row in rows:
+        row_size = _row_size(row)
+        if chunk and (len(chunk) >= max_rows or size + row_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
+
+# Every value is quoted so "" stays an empty string; None is left unquoted,
+# which COPY ... CSV reads as NULL
+def _csv_value(value) -> str:
+    return "" if value is None else '"' + str(value).replace('"', '""') + '"'
+
+def _csv_line(row) -> str:
+    return ",".join(_csv_value(value) for value in row) + "\n"
+
+def _upsert_postgres(cursor, table: str, columns: list, keys: list, updates: list, rows: list) -> tuple:
+    stage = f"{table}_stage"
+    column_list = ", ".join(columns)
+    cursor.execute(f"DROP TABLE IF EXISTS pg_temp.{stage}")
+    cursor.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA")
+    # Input order, so the last of several rows with the same key wins (as on MySQL)
+    cursor.execute(f"ALTER TABLE {stage} ADD COLUMN stage_seq BIGINT GENERATED ALWAYS AS IDENTITY")
+
+    buffer = io.StringIO()
+    buffer.writelines(_csv_line(row) for row in rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    conflict = f"DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in updates)}" if updates else "DO NOTHING"
+    # With DO NOTHING every returned row is an insert; not reading xmax also keeps
+    # this usable on partitioned tables, which do not expose system columns
+    inserted_flag = "(xmax = 0)" if updates else "TRUE"
+    cursor.execute(f"""
+        WITH upserted AS (
+            INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({', '.join(keys)}) {column_list} FROM {stage}
+            ORDER BY {', '.join(keys)}, stage_seq DESC
+            ON CONFLICT ({', '.join(keys)}) {conflict}
+            RETURNING {inserted_flag} AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM upserted
+    """)
+    inserted, updated = cursor.fetchone()
+    cursor.execute(f"DROP TABLE IF EXISTS pg_temp.{stage}")
+    return inserted, updated
+
+def _upsert_mysql(cursor, table: str, columns: list, keys: list, updates: list, rows: list) -> tuple:
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    if updates:
+        conflict = " ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in updates)
+    else:
+        conflict = f" ON DUPLICATE KEY UPDATE {keys[0]} = {keys[0]}"
+    query = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+             + ", ".join([placeholders] * len(rows)) + conflict)
+    cursor.execute(query, [value for row in rows for value in row])
+
+    # MySQL counts 1 affected row per insert, 2 per changed update and 0 per
+    # unchanged row; the split below is exact unless updates and no-ops are mixed
+    updated = max(0, cursor.rowcount - len(rows))
+    inserted = max(0, cursor.rowcount - 2 * updated)
+    return inserted, updated
+
+# Insert-or-update rows in chunks: COPY into a staging table plus INSERT ... ON
+# CONFLICT on PostgreSQL, multi-row VALUES with ON DUPLICATE KEY UPDATE on MySQL.
+# With commit=False the caller owns the transaction (e.g. to commit alongside a
+# resume checkpoint) and also rolls it back on error; with commit=True a failed
+# chunk is rolled back here. Returns {"rows", "inserted", "updated"}.
+def bulk_upsert(connection, table: str, columns: list, rows, key_columns: list, update_columns: list = None,
+                commit: bool = True, max_rows: int = BULK_CHUNK_ROWS, max_bytes: int = BULK_CHUNK_BYTES) -> dict:
+    if update_columns is None:
+        update_columns = [c for c in columns if c not in key_columns]
+    upsert = _upsert_postgres if dialect_of(connection) == "postgresql" else _upsert_mysql
+    result = {"rows": 0, "inserted": 0, "updated": 0}
+
+    cursor = connection.cursor()
+    try:
+        for chunk in chunk_rows(rows, max_rows, max_bytes):
+            inserted, updated = upsert(cursor, table, columns, key_columns, update_columns, [tuple(r) for r in chunk])
+            if commit:
+                connection.commit()
+            result["rows"] += len(chunk)
+            result["inserted"] += inserted
+            result["updated"] += updated
+    except Exception:
+        if commit:
+            connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return result
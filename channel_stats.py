@@ -0,0 +1,155 @@
+from bulk_writer import dialect_of
+import time
+import sys
+import os
+
+# Summary tables behind the dashboard insights. The ingest path refreshes the
+# rows of the channels it just wrote; the scheduled job below refreshes all.
+STATS_REFRESH_INTERVAL = int(os.getenv("STATS_REFRESH_INTERVAL", "900"))
+STATS_CHANNEL_CHUNK = 500
+
+# Portable DDL (valid on both MySQL and PostgreSQL)
+SUMMARY_TABLE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS channel_stats (
+        channel_id VARCHAR(255) PRIMARY KEY,
+        channel_name VARCHAR(255) NOT NULL,
+        video_count INT DEFAULT 0,
+        total_views BIGINT DEFAULT 0,
+        total_likes BIGINT DEFAULT 0,
+        avg_duration_seconds DOUBLE PRECISION NULL,
+        comment_count BIGINT DEFAULT 0,
+        comment_likes BIGINT DEFAULT 0,
+        refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS video_comment_stats (
+        video_id VARCHAR(255) PRIMARY KEY,
+        channel_id VARCHAR(255) NOT NULL,
+        comment_count BIGINT DEFAULT 0,
+        comment_likes BIGINT DEFAULT 0,
+        refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+]
+
+VIDEO_COMMENT_STATS_QUERY = """
+    INSERT INTO video_comment_stats (video_id, channel_id, comment_count, comment_likes, refreshed_at)
+    SELECT v.video_id, v.channel_id, COUNT(cm.comment_id), COALESCE(SUM(cm.likes), 0), CURRENT_TIMESTAMP
+    FROM videos v
+    LEFT JOIN comments cm ON cm.video_id = v.video_id
+    {where}
+    GROUP BY v.video_id, v.channel_id
+"""
+
+CHANNEL_STATS_QUERY = """
+    INSERT INTO channel_stats (channel_id, channel_name, video_count, total_views, total_likes,
+                               avg_duration_seconds, comment_count, comment_likes, refreshed_at)
+    SELECT c.channel_id, c.channel_name,
+           COALESCE(v.video_count, 0), COALESCE(v.total_views, 0), COALESCE(v.total_likes, 0),
+           v.avg_duration_seconds, COALESCE(s.comment_count, 0), COALESCE(s.comment_likes, 0), CURRENT_TIMESTAMP
+    FROM channels c
+    LEFT JOIN (
+        SELECT v.channel_id, COUNT(*) AS video_count, SUM(v.views) AS total_views,
+               SUM(v.likes) AS total_likes, AVG(v.duration) AS avg_duration_seconds
+        FROM videos v {where}
+        GROUP BY v.channel_id
+    ) v ON v.channel_id = c.channel_id
+    LEFT JOIN (
+        SELECT s.channel_id, SUM(s.comment_count) AS comment_count, SUM(s.comment_likes) AS comment_likes
+        FROM video_comment_stats s {where_stats}
+        GROUP BY s.channel_id
+    ) s ON s.channel_id = c.channel_id
+    {where_channels}
+"""
+
+def _upsert_clause(connection, columns: list, key: str) -> str:
+    if dialect_of(connection) == "postgresql":
+        return f" ON CONFLICT ({key}) DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in columns)
+    return " ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in columns)
+
+def create_summary_tables(connection):
+    cursor = connection.cursor()
+    try:
+        for query in SUMMARY_TABLE_QUERIES:
+            cursor.execute(query)
+        connection.commit()
+    finally:
+        cursor.close()
+
+def _refresh(cursor, connection, channel_ids: list = None):
+    params = []
+    where = where_stats = where_channels = ""
+    if channel_ids is not None:
+        placeholders = ", ".join(["%s"] * len(channel_ids))
+        where = f"WHERE v.channel_id IN ({placeholders})"
+        where_stats = f"WHERE s.channel_id IN ({placeholders})"
+        where_channels = f"WHERE c.channel_id IN ({placeholders})"
+        params = list(channel_ids)
+
+    cursor.execute(
+        VIDEO_COMMENT_STATS_QUERY.format(where=where)
+        + _upsert_clause(connection, ["channel_id", "comment_count", "comment_likes", "refreshed_at"], "video_id"),
+        params
+    )
+    cursor.execute(
+        CHANNEL_STATS_QUERY.format(where=where, where_stats=where_stats, where_channels=where_channels)
+        + _upsert_clause(connection, ["channel_name", "video_count", "total_views", "total_likes",
+                                      "avg_duration_seconds", "comment_count", "comment_likes", "refreshed_at"],
+                         "channel_id"),
+        params * 3
+    )
+
+# Recompute the summary rows of just these channels (index-backed, cheap per channel)
+def refresh_channel_stats(connection, channel_ids: list):
+    channel_ids = list(dict.fromkeys(c for c in channel_ids if c))
+    if not channel_ids:
+        return
+    cursor = connection.cursor()
+    try:
+        for i in range(0, len(channel_ids), STATS_CHANNEL_CHUNK):
+            _refresh(cursor, connection, channel_ids[i:i + STATS_CHANNEL_CHUNK])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def refresh_stats_for_videos(connection, video_ids: list):
+    video_ids = list(dict.fromkeys(video_ids))
+    if not video_ids:
+        return
+    channel_ids = []
+    cursor = connection.cursor()
+    try:
+        for i in range(0, len(video_ids), STATS_CHANNEL_CHUNK):
+            chunk = video_ids[i:i + STATS_CHANNEL_CHUNK]
+            cursor.execute(
+                f"SELECT DISTINCT channel_id FROM videos WHERE video_id IN ({', '.join(['%s'] * len(chunk))})",
+                chunk
+            )
+            channel_ids.extend(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+    refresh_channel_stats(connection, channel_ids)
+
+def refresh_all_stats(connection):
+    cursor = connection.cursor()
+    try:
+        _refresh(cursor, connection)
+        cursor.execute("DELETE FROM channel_stats WHERE channel_id NOT IN (SELECT channel_id FROM channels)")
+        cursor.execute("DELETE FROM video_comment_stats WHERE video_id NOT IN (SELECT video_id FROM videos)")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# Scheduled full refresh every STATS_REFRESH_INTERVAL seconds; same as
+# `python harvester.py refresh-stats --interval N`, which takes the same flags
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(["refresh-stats", "--interval", str(STATS_REFRESH_INTERVAL), *sys.argv[1:]]))
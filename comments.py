@@ -0,0 +1,189 @@
+from googleapiclient.errors import HttpError
+from key_pool import get_pool, KeyPoolExhausted
+from bulk_writer import bulk_upsert, dialect_of
+from channel_stats import refresh_stats_for_videos, _upsert_clause
+from parsers import to_mysql_datetime
+import os
+
+# commentThreads/comments.list page size (API maximum) and rows per database batch
+COMMENT_PAGE_SIZE = 100
+COMMENT_BATCH_SIZE = int(os.getenv("COMMENT_BATCH_SIZE", "1000"))
+
+# channel_id is the channel of the video (snippet.channelId), not the author's
+COMMENT_COLUMNS = ["comment_id", "video_id", "comment_text", "comment_author", "published_date", "likes", "parent_id",
+                   "channel_id"]
+
+# Resume state per video. Portable DDL (valid on both MySQL and PostgreSQL);
+# updated_at is set by save_progress rather than ON UPDATE.
+COMMENT_PROGRESS_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS comment_progress (
+        video_id VARCHAR(255) PRIMARY KEY,
+        next_page_token TEXT NULL,
+        comments_fetched INT DEFAULT 0,
+        completed BOOLEAN DEFAULT FALSE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+PROGRESS_COLUMNS = ["next_page_token", "comments_fetched", "completed", "updated_at"]
+
+# Yield (thread_items, next_page_token) for every commentThreads page of a video,
+# starting from page_token so an interrupted video can pick up where it stopped
+def iter_comment_pages(video_id: str, page_token: str = None, include_replies: bool = False):
+    pool = get_pool()
+    part = "snippet,replies" if include_replies else "snippet"
+    while True:
+        response = pool.execute(lambda yt: yt.commentThreads().list(
+            part=part,
+            videoId=video_id,
+            maxResults=COMMENT_PAGE_SIZE,
+            pageToken=page_token
+        ))
+        page_token = response.get("nextPageToken")
+        yield response.get("items", []), page_token
+        if not page_token:
+            return
+
+# Yield every reply of a top-level comment (commentThreads only embeds the first few)
+def iter_replies(parent_id: str):
+    pool = get_pool()
+    page_token = None
+    while True:
+        response = pool.execute(lambda yt: yt.comments().list(
+            part="snippet",
+            parentId=parent_id,
+            maxResults=COMMENT_PAGE_SIZE,
+            pageToken=page_token
+        ))
+        yield from response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+def comment_row(comment: dict, video_id: str, parent_id: str = None, channel_id: str = None) -> tuple:
+    snippet = comment["snippet"]
+    return (comment["id"], video_id, snippet.get("textDisplay", ""), snippet.get("authorDisplayName", "Unknown"),
+            to_mysql_datetime(snippet.get("publishedAt")), int(snippet.get("likeCount", 0)), parent_id,
+            channel_id or snippet.get("channelId"))
+
+def thread_rows(item: dict, video_id: str, include_replies: bool = False) -> list:
+    top = item["snippet"]["topLevelComment"]
+    channel_id = item["snippet"].get("channelId")
+    rows = [comment_row(top, video_id, channel_id=channel_id)]
+    if include_replies and item["snippet"].get("totalReplyCount", 0):
+        replies = item.get("replies", {}).get("comments", [])
+        if item["snippet"]["totalReplyCount"] > len(replies):
+            replies = iter_replies(top["id"])
+        rows.extend(comment_row(reply, video_id, top["id"], channel_id) for reply in replies)
+    return rows
+
+# comments.channel_id lets the dashboard page a channel's comments on one index
+# instead of sorting the join with videos. Adds the column to older tables and
+# fills it for rows written without it.
+def migrate_comment_channels(connection):
+    schema = "current_schema()" if dialect_of(connection) == "postgresql" else "DATABASE()"
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = {schema} AND table_name = 'comments' AND column_name = 'channel_id'
+        """)
+        if cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE comments ADD COLUMN channel_id VARCHAR(255) NULL")
+        cursor.execute("""
+            UPDATE comments SET channel_id = (SELECT v.channel_id FROM videos v WHERE v.video_id = comments.video_id)
+            WHERE channel_id IS NULL
+        """)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def create_comment_progress_table(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(COMMENT_PROGRESS_TABLE_QUERY)
+        connection.commit()
+    finally:
+        cursor.close()
+
+# Resume state per video: next page to fetch and whether the video is finished
+def load_progress(connection, video_id: str) -> tuple:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT next_page_token, comments_fetched, completed FROM comment_progress WHERE video_id = %s",
+            (video_id,)
+        )
+        row = cursor.fetchone()
+        return (row[0], row[1], bool(row[2])) if row else (None, 0, False)
+    finally:
+        cursor.close()
+
+def save_progress(connection, cursor, video_id: str, next_page_token: str, comments_fetched: int, completed: bool):
+    cursor.execute(
+        "INSERT INTO comment_progress (video_id, next_page_token, comments_fetched, completed, updated_at) "
+        "VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)" + _upsert_clause(connection, PROGRESS_COLUMNS, "video_id"),
+        (video_id, next_page_token, comments_fetched, completed)
+    )
+
+# Rows and the resume token are committed together, so a crash never skips a page
+def flush_comments(connection, video_id: str, rows: list, next_page_token: str, comments_fetched: int, completed: bool):
+    cursor = connection.cursor()
+    try:
+        if rows:
+            bulk_upsert(connection, "comments", COMMENT_COLUMNS, rows, ["comment_id"],
+                        update_columns=["comment_text", "likes"], commit=False)
+        save_progress(connection, cursor, video_id, next_page_token, comments_fetched, completed)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# Stream all comment pages of one video into the database in batches.
+# Returns the number of rows written during this call.
+def harvest_video_comments(connection, video_id: str, include_replies: bool = False, max_comments: int = None,
+                           batch_size: int = COMMENT_BATCH_SIZE, restart: bool = False) -> int:
+    page_token, fetched, completed = (None, 0, False) if restart else load_progress(connection, video_id)
+    if completed:
+        return 0
+
+    written, buffer = 0, []
+    try:
+        for items, next_page_token in iter_comment_pages(video_id, page_token, include_replies):
+            if max_comments is not None:
+                items = items[:max(max_comments - fetched, 0)]  # the last page may overshoot the cap
+            for item in items:
+                buffer.extend(thread_rows(item, video_id, include_replies))
+            fetched += len(items)
+            done = not next_page_token or (max_comments is not None and fetched >= max_comments)
+            if len(buffer) >= batch_size or done:
+                flush_comments(connection, video_id, buffer, next_page_token, fetched, done)
+                written += len(buffer)
+                buffer = []
+            if done:
+                break
+    except HttpError as e:
+        if e.resp.status == 403 and b"commentsDisabled" in (e.content or b""):
+            flush_comments(connection, video_id, [], None, fetched, True)
+            print(f"Comments are disabled for video {video_id}.")
+        else:
+            print(f"Error fetching comments for video {video_id}: {e}")
+
+    return written
+
+def harvest_comments(connection, video_ids: list, **options) -> int:
+    total = 0
+    for video_id in video_ids:
+        try:
+            written = harvest_video_comments(connection, video_id, **options)
+        except KeyPoolExhausted as e:
+            print(f"Stopping comment harvest at video {video_id}: {e}")
+            break
+        total += written
+        print(f"Stored {written} comments for video {video_id}.")
+    refresh_stats_for_videos(connection, video_ids)
+    return total
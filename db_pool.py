@@ -0,0 +1,198 @@
+from contextlib import contextmanager
+import threading
+import time
+import os
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_RECYCLE_USES = int(os.getenv("DB_POOL_RECYCLE_USES", "500"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections idle longer than this are pinged before being handed out
+DB_POOL_CHECK_IDLE = float(os.getenv("DB_POOL_CHECK_IDLE", "30"))
+
+class PoolTimeout(Exception):
+    pass
+
+# Thin proxy handed to callers: close() returns the connection to its pool
+# instead of tearing down the TCP/TLS session. `raw` is the driver connection.
+class PooledConnection:
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self.raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def close(self):
+        if self.raw is not None:
+            self._pool.putconn(self.raw)
+            self.raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ConnectionPool:
+    def __init__(self, connect, min_size: int = DB_POOL_MIN, max_size: int = DB_POOL_MAX,
+                 max_uses: int = DB_POOL_RECYCLE_USES, timeout: float = DB_POOL_TIMEOUT,
+                 check_idle: float = DB_POOL_CHECK_IDLE):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_uses = max_uses
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._idle = []      # [(raw, last_used)]
+        self._uses = {}      # id(raw) -> checkouts so far
+        self._size = 0
+        self._cond = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+
+    def _new_connection(self):
+        raw = self._connect()
+        self._uses[id(raw)] = 0
+        self._size += 1
+        return raw
+
+    def _discard(self, raw):
+        with self._cond:
+            self._uses.pop(id(raw), None)
+            self._size -= 1
+            self._cond.notify()
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(raw) -> bool:
+        if getattr(raw, "closed", 0):  # psycopg2
+            return False
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    # Connecting and health checks happen outside the lock; the lock only guards
+    # the idle list and the slot count, so one slow handshake never blocks others
+    def getconn(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection available after {self.timeout:.0f}s "
+                                          f"(pool max {self.max_size}).")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                else:
+                    raw, last_used = None, None
+                    self._size += 1
+
+            if raw is None:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._uses[id(raw)] = 1
+                return PooledConnection(self, raw)
+
+            if time.monotonic() - last_used < self.check_idle or self._is_alive(raw):
+                with self._cond:
+                    self._uses[id(raw)] += 1
+                return PooledConnection(self, raw)
+            self._discard(raw)
+
+    def putconn(self, raw):
+        with self._cond:
+            if id(raw) not in self._uses:
+                return
+            recycle = self._uses[id(raw)] >= self.max_uses
+        try:
+            raw.rollback()  # never hand out a connection with an open transaction
+            healthy = not getattr(raw, "closed", 0)
+        except Exception:
+            healthy = False
+        if not healthy or recycle:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw, _ in idle:
+            self._discard(raw)
+
+    # Raise the cap for a run with more worker threads; extra connections are opened on demand
+    def resize(self, max_size: int):
+        with self._cond:
+            self.max_size = max(max_size, self.min_size, 1)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "max": self.max_size}
+
+def connect_postgres():
+    import psycopg2
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        sslmode=os.getenv("DB_SSLMODE", "require")
+    )
+
+def connect_mysql():
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", "ibi"),
+        port=os.getenv("DB_PORT", "3306")
+    )
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# One pool per process and driver; the dashboard wraps these in st.cache_resource
+def get_postgres_pool() -> ConnectionPool:
+    with _pools_lock:
+        if "postgresql" not in _pools:
+            _pools["postgresql"] = ConnectionPool(connect_postgres)
+        return _pools["postgresql"]
+
+def get_mysql_pool() -> ConnectionPool:
+    with _pools_lock:
+        if "mysql" not in _pools:
+            _pools["mysql"] = ConnectionPool(connect_mysql)
+        return _pools["mysql"]
+
+def get_db_pool(dialect: str) -> ConnectionPool:
+    return get_postgres_pool() if dialect == "postgresql" else get_mysql_pool()
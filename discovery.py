@@ -0,0 +1,113 @@
+from googleapiclient.errors import HttpError
+import threading
+
+from key_pool import get_pool, endpoint_cost
+
+# Video discovery for a channel. The uploads playlist (playlistItems.list,
+# 1 unit per 50 videos, no result cap) is always tried first; search.list
+# (100 units per 50 videos, ~500 results at most) is only an explicit
+# fallback for channels whose uploads playlist cannot be read.
+STRATEGY_UPLOADS = "uploads"
+STRATEGY_SEARCH = "search"
+STRATEGY_AUTO = "auto"
+
+_uploads_playlists = {}   # channel_id -> uploads playlist id
+_stats = {}               # strategy -> {"calls", "units", "videos"}
+_lock = threading.Lock()
+
+def _record(strategy: str, method_id: str, videos: int):
+    with _lock:
+        stats = _stats.setdefault(strategy, {"calls": 0, "units": 0, "videos": 0})
+        stats["calls"] += 1
+        stats["units"] += endpoint_cost(method_id)
+        stats["videos"] += videos
+
+# Quota spent per strategy in this process, with the cost per 1000 videos found
+def quota_report() -> dict:
+    with _lock:
+        return {strategy: {**stats, "units_per_1000_videos":
+                           round(1000 * stats["units"] / stats["videos"], 1) if stats["videos"] else None}
+                for strategy, stats in _stats.items()}
+
+# get_channel_info already has the uploads playlist in hand; remembering it saves a call per walk
+def remember_uploads_playlist(channel_id: str, playlist_id: str):
+    if channel_id and playlist_id:
+        with _lock:
+            _uploads_playlists[channel_id] = playlist_id
+
+def uploads_playlist_id(channel_id: str) -> str:
+    with _lock:
+        if channel_id in _uploads_playlists:
+            return _uploads_playlists[channel_id]
+    response = get_pool().execute(lambda yt: yt.channels().list(id=channel_id, part="contentDetails"))
+    _record(STRATEGY_UPLOADS, "youtube.channels.list", 0)
+    if not response.get("items"):
+        return None
+    playlist_id = response["items"][0]["contentDetails"]["relatedPlaylists"].get("uploads")
+    remember_uploads_playlist(channel_id, playlist_id)
+    return playlist_id
+
+# Newest first. Stops at stop_at_video_id, at anything published before `since`
+# ('YYYY-MM-DD HH:MM:SS'), or after max_results IDs.
+def walk_uploads(channel_id: str, playlist_id: str = None, stop_at_video_id: str = None, since: str = None,
+                 max_results: int = None) -> list:
+    playlist_id = playlist_id or uploads_playlist_id(channel_id)
+    if not playlist_id:
+        raise LookupError(f"Channel {channel_id} has no uploads playlist")
+    pool = get_pool()
+    video_ids, next_page_token = [], None
+    while True:
+        response = pool.execute(lambda yt: yt.playlistItems().list(
+            part="snippet",
+            playlistId=playlist_id,
+            maxResults=50,
+            pageToken=next_page_token
+        ))
+        items = response.get("items", [])
+        _record(STRATEGY_UPLOADS, "youtube.playlistItems.list", len(items))
+        for item in items:
+            video_id = item["snippet"]["resourceId"]["videoId"]
+            published = item["snippet"]["publishedAt"][:19].replace("T", " ")
+            if video_id == stop_at_video_id or (since and published < str(since)):
+                return video_ids
+            video_ids.append(video_id)
+            if max_results is not None and len(video_ids) >= max_results:
+                return video_ids
+        next_page_token = response.get("nextPageToken")
+        if not next_page_token:
+            return video_ids
+
+def search_channel_videos(channel_id: str, max_results: int = None) -> list:
+    pool = get_pool()
+    video_ids, next_page_token = [], None
+    while True:
+        response = pool.execute(lambda yt: yt.search().list(
+            part="id",
+            channelId=channel_id,
+            maxResults=50,
+            type="video",
+            order="date",
+            pageToken=next_page_token
+        ))
+        items = response.get("items", [])
+        _record(STRATEGY_SEARCH, "youtube.search.list", len(items))
+        video_ids.extend(item["id"]["videoId"] for item in items)
+        if max_results is not None and len(video_ids) >= max_results:
+            return video_ids[:max_results]
+        next_page_token = response.get("nextPageToken")
+        if not next_page_token:
+            return video_ids
+
+# strategy="auto" walks the uploads playlist and falls back to search only if the
+# playlist is missing or unreadable; "uploads" never searches; "search" always does.
+def discover_video_ids(channel_id: str, strategy: str = STRATEGY_AUTO, max_results: int = None,
+                       stop_at_video_id: str = None, since: str = None, playlist_id: str = None) -> list:
+    if strategy == STRATEGY_SEARCH:
+        return search_channel_videos(channel_id, max_results)
+    try:
+        return walk_uploads(channel_id, playlist_id, stop_at_video_id, since, max_results)
+    except (LookupError, HttpError) as e:
+        if strategy != STRATEGY_AUTO or (isinstance(e, HttpError) and e.resp.status != 404):
+            raise
+        print(f"⚠️ Uploads playlist unavailable for {channel_id} ({e}); falling back to search.list")
+        return search_channel_videos(channel_id, max_results)
@@ -0,0 +1,159 @@
+from datetime import datetime
+import pandas as pd
+import glob
+import sys
+import os
+
+from streaming import iter_frames, STREAM_CHUNK_ROWS
+from insights import QUERIES
+
+EXPORT_DIR = os.getenv("WAREHOUSE_EXPORT_DIR", "exports")
+PART_FILE = "part-0.parquet"
+
+# table -> (per-channel query, publish date column). Dated tables are partitioned
+# by channel_id and publish_month; the others only by channel_id.
+EXPORT_TABLES = {
+    "channels": ("SELECT * FROM channels WHERE channel_id = %s", None),
+    "playlists": ("SELECT * FROM playlists WHERE channel_id = %s", None),
+    "videos": ("SELECT * FROM videos WHERE channel_id = %s ORDER BY published_date", "published_date"),
+    "comments": ("""
+        SELECT cm.* FROM comments cm JOIN videos v ON v.video_id = cm.video_id
+        WHERE v.channel_id = %s ORDER BY cm.published_date
+    """, "published_date"),
+}
+
+# Same shape as the warehouse summary tables (channel_stats.py), computed on the snapshot
+# (views they read, definition)
+SNAPSHOT_VIEWS = [
+    (("videos", "comments"), """
+    CREATE VIEW video_comment_stats AS
+    SELECT v.video_id, v.channel_id, COUNT(cm.comment_id) AS comment_count,
+           CAST(COALESCE(SUM(cm.likes), 0) AS BIGINT) AS comment_likes
+    FROM videos v LEFT JOIN comments cm ON cm.video_id = v.video_id
+    GROUP BY v.video_id, v.channel_id
+    """),
+    (("channels", "videos", "video_comment_stats"), """
+    CREATE VIEW channel_stats AS
+    SELECT c.channel_id, c.channel_name,
+           COUNT(v.video_id) AS video_count, CAST(COALESCE(SUM(v.views), 0) AS BIGINT) AS total_views,
+           CAST(COALESCE(SUM(v.likes), 0) AS BIGINT) AS total_likes, AVG(v.duration) AS avg_duration_seconds,
+           CAST(COALESCE(SUM(s.comment_count), 0) AS BIGINT) AS comment_count,
+           CAST(COALESCE(SUM(s.comment_likes), 0) AS BIGINT) AS comment_likes
+    FROM channels c
+    LEFT JOIN videos v ON v.channel_id = c.channel_id
+    LEFT JOIN video_comment_stats s ON s.video_id = v.video_id
+    GROUP BY c.channel_id, c.channel_name
+    """)
+]
+
+def partition_dir(root: str, table: str, channel_id: str, month: str = None) -> str:
+    path = os.path.join(root, table, f"channel_id={channel_id}")
+    return os.path.join(path, f"publish_month={month}") if month else path
+
+# Write atomically so readers never see a half-written partition
+def _write_partition(frames: list, directory: str):
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    df = df.drop(columns=["channel_id"], errors="ignore")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, PART_FILE)
+    df.to_parquet(path + ".tmp", index=False, compression="zstd")
+    os.replace(path + ".tmp", path)
+
+def _export_undated(connection, root: str, table: str, query: str, channel_id: str) -> int:
+    frames = [df for df in iter_frames(connection, query, (channel_id,), server_side=False) if not df.empty]
+    if not frames:
+        return 0
+    _write_partition(frames, partition_dir(root, table, channel_id))
+    return 1
+
+# Rows arrive ordered by publish date, so each month is contiguous: buffer one
+# month at a time and write it out when the next one starts. Closed months that
+# were already exported are skipped; the current month is rewritten every run.
+def _export_dated(connection, root: str, table: str, query: str, date_column: str, channel_id: str,
+                  full: bool, chunk_size: int) -> int:
+    current_month = datetime.now().strftime("%Y-%m")
+    written = 0
+    month, buffered = None, []
+
+    def flush():
+        nonlocal written
+        if buffered:
+            _write_partition(buffered, partition_dir(root, table, channel_id, month))
+            written += 1
+
+    for chunk in iter_frames(connection, query, (channel_id,), chunk_size, server_side=True):
+        if chunk.empty:
+            continue
+        months = pd.to_datetime(chunk[date_column]).dt.strftime("%Y-%m")
+        for chunk_month, rows in chunk.groupby(months, sort=False):
+            if chunk_month != month:
+                flush()
+                month, buffered = chunk_month, []
+                exists = os.path.exists(os.path.join(partition_dir(root, table, channel_id, month), PART_FILE))
+                skip = exists and month < current_month and not full
+            if not skip:
+                buffered.append(rows)
+    flush()
+    return written
+
+# Export the warehouse tables to Parquet under `root`. Returns partitions written per table.
+def export_snapshot(connection, root: str = EXPORT_DIR, channel_ids: list = None, full: bool = False,
+                    chunk_size: int = STREAM_CHUNK_ROWS) -> dict:
+    if channel_ids is None:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT channel_id FROM channels ORDER BY channel_id")
+            channel_ids = [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    written = {table: 0 for table in EXPORT_TABLES}
+    try:
+        for channel_id in channel_ids:
+            for table, (query, date_column) in EXPORT_TABLES.items():
+                if date_column:
+                    written[table] += _export_dated(connection, root, table, query, date_column,
+                                                    channel_id, full, chunk_size)
+                else:
+                    written[table] += _export_undated(connection, root, table, query, channel_id)
+    finally:
+        connection.rollback()  # end the read transaction held by the server-side cursors
+    return written
+
+def snapshot_available(root: str = EXPORT_DIR) -> bool:
+    return all(glob.glob(os.path.join(root, table, "**", "*.parquet"), recursive=True)
+               for table in ("channels", "videos"))
+
+# In-memory DuckDB session with one view per exported table (partition columns
+# restored from the directory names) plus the summary views.
+def open_snapshot(root: str = EXPORT_DIR):
+    import duckdb  # imported on first use, keeps the dashboard's cold start light
+    db = duckdb.connect()
+    views = set()
+    for table, (_, date_column) in EXPORT_TABLES.items():
+        if not glob.glob(os.path.join(root, table, "**", "*.parquet"), recursive=True):
+            continue
+        pattern = os.path.join(root, table, "**", "*.parquet").replace("'", "''")
+        hive_types = "{'channel_id': VARCHAR, 'publish_month': VARCHAR}" if date_column else "{'channel_id': VARCHAR}"
+        db.execute(f"""
+            CREATE VIEW {table} AS SELECT * FROM read_parquet('{pattern}',
+                hive_partitioning = true, union_by_name = true, hive_types = {hive_types})
+        """)
+        views.add(table)
+    for needs, view in SNAPSHOT_VIEWS:
+        if views.issuperset(needs):
+            db.execute(view)
+            views.add(view.split()[2])
+    return db
+
+def query_snapshot(query: str, root: str = EXPORT_DIR) -> pd.DataFrame:
+    db = open_snapshot(root)
+    try:
+        return db.execute(query).df()
+    finally:
+        db.close()
+
+# Same as `python harvester.py export` (e.g. `--full`, `--query "Top 10 Most Viewed Videos"`)
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(["export", *sys.argv[1:]]))
@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import time
+import os
+
+import api_client
+import youtube
+
+# Worker threads shared by all channels, and the chunk of videos handed to one worker
+HARVEST_WORKERS = int(os.getenv("HARVEST_WORKERS", "16"))
+HARVEST_CHANNEL_WORKERS = int(os.getenv("HARVEST_CHANNEL_WORKERS", "10"))
+VIDEO_CHUNK_SIZE = youtube.MAX_VIDEO_IDS_PER_REQUEST
+
+@dataclass
+class ChannelHarvest:
+    channel_id: str
+    channel: dict = field(default_factory=dict)
+    playlists: list = field(default_factory=list)
+    video_ids: list = field(default_factory=list)
+    videos: list = field(default_factory=list)
+    comments: list = field(default_factory=list)
+    errors: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+# Runs the per-channel fetchers for many channels at once.
+# Channel, playlist and video-ID lookups start together; video details and
+# comments are split into chunks so one large channel spreads across workers.
+class HarvestEngine:
+    def __init__(self, max_workers: int = HARVEST_WORKERS, max_channels: int = HARVEST_CHANNEL_WORKERS,
+                 max_inflight: int = api_client.MAX_INFLIGHT_REQUESTS, with_comments: bool = True):
+        self.max_workers = max_workers
+        self.max_channels = max_channels
+        self.max_inflight = max_inflight
+        self.with_comments = with_comments
+
+    def harvest(self, channel_ids: list) -> dict:
+        api_client.set_max_inflight(self.max_inflight)
+        channel_ids = list(dict.fromkeys(channel_ids))
+
+        # Stage tasks never wait on other futures, so a separate pool for the
+        # per-channel coordinators keeps the two levels from deadlocking.
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="harvest-stage") as stages, \
+             ThreadPoolExecutor(max_workers=max(1, min(self.max_channels, len(channel_ids))),
+                                thread_name_prefix="harvest-channel") as channels:
+            futures = {
+                channel_id: channels.submit(self._harvest_channel, stages, channel_id)
+                for channel_id in channel_ids
+            }
+            return {channel_id: future.result() for channel_id, future in futures.items()}
+
+    def _harvest_channel(self, stages, channel_id: str) -> ChannelHarvest:
+        started = time.monotonic()
+        result = ChannelHarvest(channel_id)
+
+        channel = stages.submit(youtube.get_channel_info, channel_id)
+        playlists = stages.submit(youtube.get_playlist_details, channel_id)
+        video_ids = stages.submit(youtube.get_video_ids, channel_id)
+
+        result.channel = self._collect(result, "channel", channel) or {}
+        if not result.channel and "channel" not in result.errors:
+            result.errors["channel"] = "Channel not found or API error"
+        result.playlists = self._collect(result, "playlists", playlists) or []
+        result.video_ids = self._collect(result, "video_ids", video_ids) or []
+
+        chunks = youtube.chunked(result.video_ids, VIDEO_CHUNK_SIZE)
+        video_futures = [stages.submit(youtube.get_video_info, chunk) for chunk in chunks]
+        comment_futures = [stages.submit(youtube.get_comment_info, chunk) for chunk in chunks] if self.with_comments else []
+
+        for future in video_futures:
+            result.videos.extend(self._collect(result, "videos", future) or [])
+        for future in comment_futures:
+            result.comments.extend(self._collect(result, "comments", future) or [])
+
+        result.elapsed = time.monotonic() - started
+        status = "✅" if result.ok else "⚠️"
+        print(f"{status} {channel_id}: {len(result.videos)} videos, {len(result.comments)} comments, "
+              f"{len(result.playlists)} playlists in {result.elapsed:.1f}s")
+        return result
+
+    @staticmethod
+    def _collect(result: ChannelHarvest, stage: str, future):
+        try:
+            return future.result()
+        except Exception as e:
+            result.errors.setdefault(stage, str(e))
+            return None
+
+def harvest_channels(channel_ids: list, **options) -> dict:
+    return HarvestEngine(**options).harvest(channel_ids)
@@ -0,0 +1,447 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import threading
+import time
+import sys
+import os
+
+from key_pool import KeyPoolExhausted
+from channel_stats import create_summary_tables, refresh_channel_stats, refresh_all_stats, refresh_stats_for_videos, \
+    STATS_CHANNEL_CHUNK
+from comments import harvest_video_comments, migrate_comment_channels, create_comment_progress_table, COMMENT_BATCH_SIZE
+from indexes import apply_index_migrations
+from migration import create_archive_tables, migrate_videos, estimate_rows, _load_state, MIGRATE_CHUNK_ROWS
+from stats_snapshots import create_snapshot_tables, capture_from_videos, downsample, SNAPSHOT_RAW_DAYS
+from background_jobs import create_dashboard_job_table
+from streaming import STREAM_CHUNK_ROWS
+import api_client
+import job_queue
+import key_pool
+import db_pool
+
+# One entry point for every warehouse stage:
+#   python harvester.py init-schema   [--db mysql|postgresql] [--dry-run]
+#   python harvester.py harvest       [--mode queue|incremental] [--run RUN_ID] [--no-comments]
+#   python harvester.py refresh-stats [--snapshot] [--interval SECONDS]
+#   python harvester.py comments      [--max-comments N] [--replies] [--restart]
+#   python harvester.py migrate       [--full]
+#   python harvester.py export        [--root DIR] [--full] [--query NAME]
+#   python harvester.py snapshots     [--capture]
+#   python harvester.py replay        [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--journal-dir DIR]
+# Every stage also takes [--db mysql|postgresql] [--dry-run]; all but snapshots and
+# replay also take [channel_id ...] [--channels-file FILE] [-j/--concurrency N]
+# [--batch-size N]. The modules' own `python <module>.py` entry points call main(). All stages of a process share the API key pool,
+# the rate limiter and one database pool sized to the concurrency, and write
+# through bulk_writer, so a large run is tuned with flags instead of code edits.
+HARVEST_CONCURRENCY = int(os.getenv("HARVEST_CONCURRENCY", "4"))
+
+def read_channel_file(path: str) -> list:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        ids = [line.split("#", 1)[0].strip() for line in stream]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return [channel_id for channel_id in ids if channel_id]
+
+# Positional IDs plus --channels-file, de-duplicated in order; None when neither was given
+def channel_ids_from(args) -> list:
+    channel_ids = list(args.channels)
+    if args.channels_file:
+        channel_ids += read_channel_file(args.channels_file)
+    return list(dict.fromkeys(channel_ids)) or None
+
+def all_channel_ids(connection) -> list:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT channel_id FROM channels ORDER BY channel_id")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def chunked(items: list, size: int) -> list:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+# Run fn(connection, item) for every item on `concurrency` threads, each with its own pooled connection
+def run_parallel(pool, fn, items: list, concurrency: int) -> list:
+    def run(item):
+        with pool.connection() as conn:
+            return fn(conn, item)
+
+    if concurrency <= 1 or len(items) <= 1:
+        return [run(item) for item in items]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="harvester") as executor:
+        return list(executor.map(run, items))
+
+# The shared database pool, with one connection per worker thread plus one for the coordinating thread
+def open_pool(args) -> db_pool.ConnectionPool:
+    pool = db_pool.get_db_pool(args.db)
+    pool.resize(max(pool.max_size, getattr(args, "concurrency", 1) + 1))
+    return pool
+
+def print_key_status():
+    for status in key_pool.get_pool().status():
+        print(f"  key {status['key']}: {status['remaining']:,} units left"
+              + (f" (exhausted until {status['reset_at']})" if status["exhausted"] else ""))
+
+# ---------------------- init-schema ----------------------
+SCHEMA_STEPS = [
+    ("comment channel column", migrate_comment_channels),
+    ("comment progress table", create_comment_progress_table),
+    ("indexes", apply_index_migrations),
+    ("channel summary tables", create_summary_tables),
+    ("statistics snapshot tables", create_snapshot_tables),
+    ("job queue table", job_queue.create_job_table),
+    ("archive tables", create_archive_tables),
+    ("dashboard job table", create_dashboard_job_table),
+]
+
+def cmd_init_schema(args) -> int:
+    if args.dry_run:
+        steps = ["base tables (channels, videos, comments, playlists, ...)"] + [name for name, _ in SCHEMA_STEPS]
+        print(f"Would create on {args.db}: {', '.join(steps)}")
+        return 0
+    import youtube
+    pool = open_pool(args)
+    with pool.connection() as conn:
+        youtube.create_base_tables(conn)
+        print("✅ Base tables ready")
+        for name, create in SCHEMA_STEPS:
+            create(conn)
+            print(f"✅ {name.capitalize()} ready")
+    return 0
+
+# ---------------------- harvest ----------------------
+def cmd_harvest(args) -> int:
+    channel_ids = channel_ids_from(args)
+    if channel_ids is None:
+        import youtube
+        channel_ids = youtube.channel_ids
+    if args.mode == "incremental" and args.db != "mysql":
+        print("❌ Incremental harvests write through the MySQL connection; use --mode queue for PostgreSQL.")
+        return 2
+
+    # playlistItems.list and videos.list accept at most 50 IDs per call
+    job_queue.VIDEO_BATCH_SIZE = max(1, min(args.batch_size, 50))
+    if args.dry_run:
+        print(f"Would harvest {len(channel_ids)} channel(s) ({args.mode} mode, {args.concurrency} worker(s), "
+              f"{job_queue.VIDEO_BATCH_SIZE} videos per request, comments {'off' if args.no_comments else 'on'})"
+              + (f" into run {args.run}" if args.run else ""))
+        print_key_status()
+        return 0
+
+    pool = open_pool(args)
+    if args.mode == "incremental":
+        from incremental import harvest_incremental
+        # One connection per channel thread: harvest_incremental does all its writes on it
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="harvester") as executor:
+            futures = {executor.submit(harvest_incremental, channel_id): channel_id for channel_id in channel_ids}
+            summaries, failures = [], []
+            for future in as_completed(futures):
+                try:
+                    summaries.append(future.result())
+                except Exception as e:
+                    failures.append((futures[future], e))
+        print(f"✅ {sum(s['new_videos'] for s in summaries)} new videos, "
+              f"{sum(s['refreshed'] for s in summaries)} refreshed across {len(summaries)} channel(s)")
+        for channel_id, error in failures:
+            print(f"❌ {channel_id}: {error}")
+        return 1 if failures else 0
+
+    job_queue.use_worker_keys()
+    with pool.connection() as conn:
+        run_id = job_queue.prepare_run(conn, channel_ids, args.run)
+    queue = job_queue.JobQueue(pool, run_id, workers=args.concurrency, with_comments=not args.no_comments)
+    status = queue.run()
+    print(f"✅ Run {queue.run_id}: " + ", ".join(f"{count} {name}" for name, count in sorted(status.items())))
+    return 1 if status.get("failed") else 0
+
+# ---------------------- refresh-stats ----------------------
+def cmd_refresh_stats(args) -> int:
+    channel_ids = channel_ids_from(args)
+    scope = f"{len(channel_ids)} channel(s)" if channel_ids else "all channels"
+    if args.dry_run:
+        print(f"Would refresh summary statistics for {scope}"
+              + (f" in batches of {args.batch_size} on {args.concurrency} thread(s)" if channel_ids else "")
+              + (", then snapshot video statistics" if args.snapshot else "")
+              + (f", every {args.interval:g}s" if args.interval else ""))
+        return 0
+
+    pool = open_pool(args)
+    with pool.connection() as conn:
+        create_summary_tables(conn)
+        if args.snapshot:
+            create_snapshot_tables(conn)
+    # With --interval this is the scheduled refresh and runs until interrupted
+    while True:
+        started = time.monotonic()
+        if channel_ids:
+            run_parallel(pool, refresh_channel_stats, chunked(channel_ids, args.batch_size), args.concurrency)
+        else:
+            with pool.connection() as conn:
+                refresh_all_stats(conn)
+        if args.snapshot:
+            with pool.connection() as conn:
+                print(f"✅ Captured {capture_from_videos(conn, channel_ids)} video snapshots")
+        print(f"✅ Statistics refreshed for {scope} in {time.monotonic() - started:.1f}s")
+        if not args.interval:
+            return 0
+        time.sleep(args.interval)
+
+# ---------------------- comments ----------------------
+# Videos that report comments and are not finished yet (all of them with restart)
+def pending_comment_videos(connection, channel_ids: list = None, restart: bool = False) -> list:
+    conditions, params = ["v.comment_count > 0"], []
+    if channel_ids:
+        conditions.append(f"v.channel_id IN ({', '.join(['%s'] * len(channel_ids))})")
+        params += channel_ids
+    if not restart:
+        conditions.append("(p.completed IS NULL OR NOT p.completed)")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT v.video_id FROM videos v
+            LEFT JOIN comment_progress p ON p.video_id = v.video_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY v.video_id
+        """, params)
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def cmd_comments(args) -> int:
+    pool = open_pool(args)
+    with pool.connection() as conn:
+        create_comment_progress_table(conn)
+        video_ids = pending_comment_videos(conn, channel_ids_from(args), args.restart)
+    if args.dry_run:
+        print(f"Would fetch comments for {len(video_ids)} video(s) on {args.concurrency} thread(s), "
+              f"writing every {args.batch_size} rows"
+              + (f", at most {args.max_comments} per video" if args.max_comments else "")
+              + (", with replies" if args.replies else ""))
+        print_key_status()
+        return 0
+
+    exhausted = threading.Event()
+    totals = {"comments": 0, "videos": 0}
+    lock = threading.Lock()
+
+    def harvest(conn, video_id):
+        if exhausted.is_set():
+            return
+        try:
+            written = harvest_video_comments(conn, video_id, include_replies=args.replies,
+                                             max_comments=args.max_comments, batch_size=args.batch_size,
+                                             restart=args.restart)
+        except KeyPoolExhausted as e:
+            if not exhausted.is_set():
+                print(f"Stopping comment harvest at video {video_id}: {e}")
+            exhausted.set()
+            return
+        with lock:
+            totals["comments"] += written
+            totals["videos"] += 1
+
+    run_parallel(pool, harvest, video_ids, args.concurrency)
+    with pool.connection() as conn:
+        refresh_stats_for_videos(conn, video_ids)
+    print(f"✅ Stored {totals['comments']:,} comments for {totals['videos']} of {len(video_ids)} video(s)")
+    return 1 if exhausted.is_set() else 0
+
+# ---------------------- migrate ----------------------
+def cmd_migrate(args) -> int:
+    channel_ids = channel_ids_from(args)
+    scopes = channel_ids or [None]
+    pool = open_pool(args)
+    if args.dry_run:
+        with pool.connection() as conn:
+            for channel_id in scopes:
+                cursor = conn.cursor()
+                try:
+                    state = _load_state(cursor, f"archived_videos:{channel_id or '*'}")
+                except Exception:  # migration_state does not exist yet
+                    conn.rollback()
+                    state = None
+                finally:
+                    cursor.close()
+                if args.full or state is None:
+                    mode = "full copy"
+                elif state[4] is None:
+                    mode = f"resume after key {state[2]!r}"
+                else:
+                    mode = f"rows changed since {state[1]}"
+                print(f"Would migrate {channel_id or 'all channels'}: ~{estimate_rows(conn, channel_id):,} rows, "
+                      f"{mode}, {args.batch_size} keys per chunk")
+        return 0
+
+    with pool.connection() as conn:
+        create_archive_tables(conn)
+
+    def migrate(conn, channel_id):
+        label = channel_id or "all channels"
+        result = migrate_videos(
+            conn, channel_id=channel_id, chunk_size=args.batch_size, full=args.full,
+            progress=lambda done, total, rows: print(f"  {label}: {done:,}/{total:,} keys scanned, {rows:,} rows copied")
+        )
+        print(f"✅ {label}: migrated {result['rows']:,} rows in {result['chunks']} chunks"
+              + (f" (changed since {result['since']})" if result["since"] else " (full copy)"))
+        return result
+
+    results = run_parallel(pool, migrate, scopes, args.concurrency)
+    print(f"✅ Migrated {sum(r['rows'] for r in results):,} rows")
+    return 0
+
+# ---------------------- export ----------------------
+def cmd_export(args) -> int:
+    from export import export_snapshot, query_snapshot
+    if args.query:
+        from insights import QUERIES
+        if args.query not in QUERIES:
+            print(f"❌ Unknown query {args.query!r}; choose from: {', '.join(QUERIES)}")
+            return 2
+        print(query_snapshot(QUERIES[args.query], args.root).to_string(index=False))
+        return 0
+    pool = open_pool(args)
+    channel_ids = channel_ids_from(args)
+    if channel_ids is None:
+        with pool.connection() as conn:
+            channel_ids = all_channel_ids(conn)
+    if args.dry_run:
+        print(f"Would export {len(channel_ids)} channel(s) to {args.root} "
+              f"({'full' if args.full else 'incremental'}, {args.batch_size} rows per chunk, "
+              f"{args.concurrency} thread(s))")
+        return 0
+
+    # Each channel has its own partition directories, so groups never write the same file
+    groups = [channel_ids[i::args.concurrency] for i in range(min(args.concurrency, len(channel_ids)))]
+    results = run_parallel(
+        pool, lambda conn, group: export_snapshot(conn, args.root, group, args.full, args.batch_size),
+        groups, args.concurrency
+    )
+    written = {}
+    for result in results:
+        for table, count in result.items():
+            written[table] = written.get(table, 0) + count
+    print(f"✅ Snapshot written to {args.root}: "
+          + ", ".join(f"{table} {count} partitions" for table, count in written.items()))
+    return 0
+
+# ---------------------- snapshots ----------------------
+# Daily maintenance: create upcoming partitions, downsample expired ones and,
+# with --capture, snapshot every video as currently stored
+def cmd_snapshots(args) -> int:
+    if args.dry_run:
+        print("Would create upcoming snapshot partitions"
+              + (", snapshot every video" if args.capture else "")
+              + f" and downsample partitions older than {SNAPSHOT_RAW_DAYS} days")
+        return 0
+    pool = open_pool(args)
+    with pool.connection() as conn:
+        create_snapshot_tables(conn)
+        if args.capture:
+            print(f"✅ Captured {capture_from_videos(conn)} video snapshots")
+        dropped = downsample(conn)
+    print(f"✅ Snapshot partitions downsampled: {', '.join(dropped) if dropped else 'none'}")
+    return 0
+
+# ---------------------- replay ----------------------
+# Rebuild the warehouse tables from the raw response journal instead of the API
+def cmd_replay(args) -> int:
+    from journal_replay import replay
+    from raw_journal import JOURNAL_DIR
+    directory = args.journal_dir or JOURNAL_DIR
+    days = f" from {args.since or 'the start'} to {args.until or 'today'}"
+    if args.dry_run:
+        print(f"Would replay the journal in {directory}{days}, writing every {args.batch_size} rows")
+        return 0
+    pool = open_pool(args)
+    with pool.connection() as conn:
+        counts = replay(conn, directory, since=args.since, until=args.until, batch_size=args.batch_size)
+    print("✅ Rebuilt from journal: " + ", ".join(f"{table} {count} rows" for table, count in counts.items()))
+    return 0
+
+# ---------------------- CLI ----------------------
+def add_db_options(parser):
+    parser.add_argument("--db", choices=["mysql", "postgresql"], default="mysql")
+    parser.add_argument("--dry-run", action="store_true", help="print what would be done and exit")
+
+def add_common_options(parser, concurrency: int, batch_size: int):
+    add_db_options(parser)
+    parser.add_argument("channels", nargs="*", metavar="channel_id", help="channel IDs to work on")
+    parser.add_argument("--channels-file", metavar="FILE",
+                        help="file with one channel ID per line ('#' starts a comment, '-' reads stdin)")
+    parser.add_argument("-j", "--concurrency", type=int, default=concurrency,
+                        help=f"worker threads (default {concurrency})")
+    parser.add_argument("--batch-size", type=int, default=batch_size, help=f"rows per batch (default {batch_size})")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="harvester.py", description="YouTube warehouse harvester")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    init = subparsers.add_parser("init-schema", help="create every table and index the stages need")
+    add_db_options(init)
+    init.set_defaults(handler=cmd_init_schema)
+
+    harvest = subparsers.add_parser("harvest", help="fetch channels, videos and comments from the API")
+    add_common_options(harvest, job_queue.JOB_WORKERS, job_queue.VIDEO_BATCH_SIZE)
+    harvest.add_argument("--mode", choices=["queue", "incremental"], default="queue",
+                         help="queue: resumable job queue; incremental: only videos newer than the watermark")
+    harvest.add_argument("--run", metavar="RUN_ID",
+                         help="job queue run to create or resume (default: the newest unfinished run, else today's)")
+    harvest.add_argument("--no-comments", action="store_true")
+    harvest.set_defaults(handler=cmd_harvest)
+
+    stats = subparsers.add_parser("refresh-stats", help="recompute the channel summary tables")
+    add_common_options(stats, HARVEST_CONCURRENCY, STATS_CHANNEL_CHUNK)
+    stats.add_argument("--snapshot", action="store_true", help="also append current video statistics to the history")
+    stats.add_argument("--interval", type=float, default=0, metavar="SECONDS",
+                       help="repeat every SECONDS until interrupted (default: run once)")
+    stats.set_defaults(handler=cmd_refresh_stats)
+
+    comments = subparsers.add_parser("comments", help="fetch comments for stored videos (resumable)")
+    add_common_options(comments, HARVEST_CONCURRENCY, COMMENT_BATCH_SIZE)
+    comments.add_argument("--max-comments", type=int, help="stop after this many threads per video")
+    comments.add_argument("--replies", action="store_true", help="include replies")
+    comments.add_argument("--restart", action="store_true", help="ignore saved progress and start over")
+    comments.set_defaults(handler=cmd_comments)
+
+    migrate = subparsers.add_parser("migrate", help="copy changed videos into the archive")
+    add_common_options(migrate, 1, MIGRATE_CHUNK_ROWS)
+    migrate.add_argument("--full", action="store_true", help="copy everything, ignoring the last run")
+    migrate.set_defaults(handler=cmd_migrate)
+
+    export = subparsers.add_parser("export", help="write the warehouse to Parquet")
+    add_common_options(export, 1, STREAM_CHUNK_ROWS)
+    export.add_argument("--root", default=os.getenv("WAREHOUSE_EXPORT_DIR", "exports"))
+    export.add_argument("--full", action="store_true", help="rewrite every partition")
+    export.add_argument("--query", metavar="NAME", help="print this insight, computed from the snapshot, and exit")
+    export.set_defaults(handler=cmd_export)
+
+    snapshots = subparsers.add_parser("snapshots", help="maintain the video statistics history partitions")
+    add_db_options(snapshots)
+    snapshots.add_argument("--capture", action="store_true", help="also snapshot every video as currently stored")
+    snapshots.set_defaults(handler=cmd_snapshots)
+
+    replay = subparsers.add_parser("replay", help="rebuild the tables from the raw response journal")
+    add_db_options(replay)
+    replay.add_argument("--since", metavar="YYYY-MM-DD", help="first journal day to replay")
+    replay.add_argument("--until", metavar="YYYY-MM-DD", help="last journal day to replay")
+    replay.add_argument("--journal-dir", metavar="DIR", help="journal directory (default YOUTUBE_JOURNAL_DIR)")
+    replay.add_argument("--batch-size", type=int, default=COMMENT_BATCH_SIZE,
+                        help=f"rows per batch (default {COMMENT_BATCH_SIZE})")
+    replay.set_defaults(handler=cmd_replay)
+    return parser
+
+def main(argv: list) -> int:
+    args = build_parser().parse_args(argv)
+    concurrency = getattr(args, "concurrency", 1)
+    if concurrency < 1 or getattr(args, "batch_size", 1) < 1:
+        print("❌ --concurrency and --batch-size must be at least 1.")
+        return 2
+    # Enough in-flight API slots for every worker thread
+    if concurrency > api_client.MAX_INFLIGHT_REQUESTS:
+        api_client.set_max_inflight(concurrency)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+from googleapiclient.errors import HttpError
+from key_pool import KeyPoolExhausted
+import sys
+import os
+
+import youtube
+from channel_stats import refresh_channel_stats
+from stats_snapshots import record_snapshots, video_stat_rows
+from parsers import parse_video_statistics
+
+# Videos younger than this get their statistics refreshed on every incremental run
+REFRESH_WINDOW_DAYS = int(os.getenv("REFRESH_WINDOW_DAYS", "7"))
+
+# High-water mark per channel: newest video ID and publish date already stored
+def get_watermark(connection, channel_id: str) -> dict:
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT last_video_id, last_published_date FROM channel_watermarks WHERE channel_id = %s",
+            (channel_id,)
+        )
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+def save_watermark(connection, channel_id: str, video_id: str, published_date, commit: bool = True):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO channel_watermarks (channel_id, last_video_id, last_published_date)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_video_id = VALUES(last_video_id),
+                last_published_date = VALUES(last_published_date)
+        """, (channel_id, video_id, published_date))
+        if commit:
+            connection.commit()
+    finally:
+        cursor.close()
+
+# Re-fetch only the statistics part for videos published inside the refresh window
+def refresh_recent_stats(connection, channel_id: str, days: int = REFRESH_WINDOW_DAYS, exclude: set = None) -> int:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT video_id FROM videos WHERE channel_id = %s AND published_date >= NOW() - INTERVAL %s DAY",
+            (channel_id, days)
+        )
+        video_ids = [row[0] for row in cursor.fetchall() if not exclude or row[0] not in exclude]
+        if not video_ids:
+            return 0
+
+        stats, _ = youtube.fetch_videos_batched(video_ids, parse_video_statistics, part="statistics")
+        cursor.executemany(
+            "UPDATE videos SET views = %s, comment_count = %s, favorite_count = %s, likes = %s WHERE video_id = %s",
+            stats
+        )
+        connection.commit()
+        refresh_channel_stats(connection, [channel_id])
+        # parse_video_statistics rows are (views, comment_count, favorite_count, likes, video_id)
+        record_snapshots(connection, [(row[4], row[0], row[3], row[1]) for row in stats], [channel_id])
+        return len(stats)
+    finally:
+        cursor.close()
+
+# Incremental refresh of one channel: walk the uploads playlist only down to the
+# watermark, store full details for the new videos, refresh stats for recent ones.
+def harvest_incremental(channel_id: str, refresh_days: int = REFRESH_WINDOW_DAYS) -> dict:
+    summary = {"channel_id": channel_id, "new_videos": 0, "refreshed": 0}
+    channel = youtube.get_channel_info(channel_id)
+    if not channel:
+        print(f"⚠️ Channel {channel_id} not found.")
+        return summary
+
+    connection = youtube.get_db_connection()
+    try:
+        youtube.insert_channel_data(channel, connection)
+        watermark = get_watermark(connection, channel_id)
+        new_ids = youtube.get_video_ids(
+            channel_id,
+            playlist_id=channel["Playlist_Id"],
+            stop_at_video_id=watermark["last_video_id"] if watermark else None,
+            since=watermark["last_published_date"] if watermark else None
+        )
+
+        if new_ids:
+            videos, _ = youtube.get_video_details_batch(new_ids)
+            if videos:
+                newest = max(videos, key=lambda v: v[6])  # (video_id, ..., published_date, ...)
+                # The watermark only moves in the transaction that stored the videos
+                try:
+                    youtube.store_videos(connection, videos, commit=False)
+                    save_watermark(connection, channel_id, newest[0], newest[6], commit=False)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                refresh_channel_stats(connection, [channel_id])
+                record_snapshots(connection, video_stat_rows(videos), [channel_id])
+            summary["new_videos"] = len(videos)
+
+        summary["refreshed"] = refresh_recent_stats(connection, channel_id, refresh_days, exclude=set(new_ids))
+        print(f"✅ {channel_id}: {summary['new_videos']} new videos, {summary['refreshed']} refreshed.")
+    except (HttpError, KeyPoolExhausted) as e:
+        print(f"API Error during incremental harvest of {channel_id}: {e}")
+    finally:
+        connection.close()
+
+    return summary
+
+# Same as `python harvester.py harvest --mode incremental`
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(["harvest", "--mode", "incremental", *sys.argv[1:]]))
@@ -0,0 +1,45 @@
+from bulk_writer import dialect_of
+
+# Secondary indexes the dashboard and harvester rely on: channel -> videos and
+# channel -> comments lookups (newest first, for keyset paging) and video ->
+# comments joins. comments.channel_id is added by comments.migrate_comment_channels,
+# which has to run first. (name, table, columns)
+INDEX_MIGRATIONS = [
+    ("idx_videos_channel_published", "videos", ["channel_id", "published_date", "video_id"]),
+    ("idx_comments_video_published", "comments", ["video_id", "published_date", "comment_id"]),
+    ("idx_comments_channel_published", "comments", ["channel_id", "published_date", "comment_id"]),
+    ("idx_playlists_channel", "playlists", ["channel_id"]),
+]
+
+def _index_exists_mysql(cursor, table: str, name: str) -> bool:
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, name))
+    return cursor.fetchone() is not None
+
+# Idempotent: creates only the indexes that are missing. Returns the names created.
+def apply_index_migrations(connection, migrations: list = INDEX_MIGRATIONS) -> list:
+    postgres = dialect_of(connection) == "postgresql"
+    created = []
+    cursor = connection.cursor()
+    try:
+        for name, table, columns in migrations:
+            if postgres:
+                cursor.execute("SELECT to_regclass(%s)", (name,))
+                if cursor.fetchone()[0] is not None:
+                    continue
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+            else:
+                if _index_exists_mysql(cursor, table, name):
+                    continue
+                cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+            created.append(name)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return created
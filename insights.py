@@ -0,0 +1,73 @@
+# Predefined insight queries, run against the warehouse tables or, through
+# DuckDB, against the Parquet snapshot written by export.py
+QUERIES = {
+    "Videos and their Channels": """
+        SELECT v.title AS video_name, c.channel_name
+        FROM videos v
+        JOIN channels c ON v.channel_id = c.channel_id
+    """,
+
+    "Channels with Most Videos": """
+        SELECT channel_name, video_count
+        FROM channel_stats
+        ORDER BY video_count DESC
+    """,
+
+    "Top 10 Most Viewed Videos": """
+        SELECT v.title AS video_name, c.channel_name, v.views
+        FROM videos v
+        JOIN channels c ON v.channel_id = c.channel_id
+        ORDER BY v.views DESC
+        LIMIT 10
+    """,
+
+    "Total Views per Channel": """
+        SELECT channel_name, total_views
+        FROM channel_stats
+    """,
+
+    "Channels that Published Videos in 2022": """
+        SELECT DISTINCT c.channel_name
+        FROM videos v
+        JOIN channels c ON v.channel_id = c.channel_id
+        WHERE YEAR(v.published_date) = 2022
+    """,
+
+    "Average Video Duration per Channel": """
+        SELECT channel_name, avg_duration_seconds / 60 AS avg_duration_minutes
+        FROM channel_stats
+        WHERE video_count > 0
+    """,
+
+    "Top 10 Videos with Most Comments": """
+        SELECT v.title AS video_name, c.channel_name, s.comment_count
+        FROM video_comment_stats s
+        JOIN videos v ON s.video_id = v.video_id
+        JOIN channels c ON s.channel_id = c.channel_id
+        ORDER BY s.comment_count DESC
+        LIMIT 10
+    """,
+
+    "Videos with Most Likes": """
+        SELECT v.title AS video_name, c.channel_name, v.likes
+        FROM videos v
+        JOIN channels c ON v.channel_id = c.channel_id
+        ORDER BY v.likes DESC
+        LIMIT 10
+    """,
+
+    "Total Likes per Video": """
+        SELECT v.title AS video_name, v.likes
+        FROM videos v
+        ORDER BY v.likes DESC
+    """,
+
+    "Videos with Most Liked Comments": """
+        SELECT v.title AS video_name, c.channel_name, s.comment_likes AS total_comment_likes
+        FROM video_comment_stats s
+        JOIN videos v ON s.video_id = v.video_id
+        JOIN channels c ON s.channel_id = c.channel_id
+        ORDER BY s.comment_likes DESC
+        LIMIT 10
+    """
+}
@@ -0,0 +1,431 @@
+from googleapiclient.errors import HttpError
+from datetime import date
+from uuid import uuid4
+import threading
+import hashlib
+import socket
+import time
+import json
+import sys
+import os
+
+from key_pool import get_pool, KeyPoolExhausted, is_quota_error
+import key_pool
+from bulk_writer import bulk_upsert, dialect_of
+from parsers import channel_row, parse_video_details, CHANNEL_COLUMNS, VIDEO_COLUMNS
+from comments import thread_rows, migrate_comment_channels, COMMENT_COLUMNS, COMMENT_PAGE_SIZE
+from channel_stats import refresh_channel_stats
+from indexes import apply_index_migrations
+from stats_snapshots import create_snapshot_tables, record_snapshots, record_channel_totals, video_stat_rows
+import db_pool
+
+# Persistent work queue for long harvests. Each row is one unit of work (a
+# channel, one uploads-playlist page, one batch of video IDs or one comment
+# page) with its status, attempt count and page token. A unit's results, the
+# units it spawns and its own completion are committed together, so after a
+# crash a restart simply picks up the pending rows of the same run. Several
+# worker processes can share one run (see JobQueue and use_worker_keys).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+VIDEO_BATCH_SIZE = 50
+
+# Deeper work first keeps the queue narrow: finish comment pages before opening new channels
+JOB_PRIORITY = {"comment_page": 0, "video_batch": 1, "playlist_page": 2, "channel": 3}
+
+JOB_TABLE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS harvest_jobs (
+        job_key VARCHAR(255) PRIMARY KEY,
+        run_id VARCHAR(64) NOT NULL,
+        kind VARCHAR(32) NOT NULL,
+        priority INT NOT NULL,
+        target VARCHAR(255) NOT NULL,
+        page_token TEXT NULL,
+        payload TEXT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        attempts INT DEFAULT 0,
+        last_error TEXT NULL,
+        lease_owner VARCHAR(255) NULL,
+        lease_expires TIMESTAMP NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+]
+
+# Columns added after the table first shipped: (column, definition)
+JOB_COLUMN_MIGRATIONS = [
+    ("lease_owner", "VARCHAR(255) NULL"),
+    ("lease_expires", "TIMESTAMP NULL"),
+]
+
+JOB_INDEXES = [
+    ("idx_harvest_jobs_claim", "harvest_jobs", ["run_id", "status", "priority", "created_at"]),
+    ("idx_harvest_jobs_status", "harvest_jobs", ["status", "created_at"]),
+]
+
+# A run groups the jobs of one harvest; re-running with the same id resumes it.
+# Without an explicit id the newest run that still has unfinished jobs is resumed,
+# so a backfill restarted after midnight carries on; only a new run is named by date.
+def default_run_id(connection=None) -> str:
+    if os.getenv("HARVEST_RUN_ID"):
+        return os.getenv("HARVEST_RUN_ID")
+    if connection is not None:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT run_id FROM harvest_jobs WHERE status IN ('pending', 'running')
+                ORDER BY created_at DESC LIMIT 1
+            """)
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if row:
+            return row[0]
+    return date.today().isoformat()
+
+def create_job_table(connection):
+    cursor = connection.cursor()
+    try:
+        for query in JOB_TABLE_QUERIES:
+            cursor.execute(query)
+        schema = "current_schema()" if dialect_of(connection) == "postgresql" else "DATABASE()"
+        for column, definition in JOB_COLUMN_MIGRATIONS:
+            cursor.execute(f"""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = {schema} AND table_name = 'harvest_jobs' AND column_name = %s
+            """, (column,))
+            if cursor.fetchone() is None:
+                cursor.execute(f"ALTER TABLE harvest_jobs ADD COLUMN {column} {definition}")
+        connection.commit()
+    finally:
+        cursor.close()
+    apply_index_migrations(connection, JOB_INDEXES)
+
+# Page tokens can be long, so the key carries a digest of the token
+def _job(run_id: str, kind: str, target: str, page_token: str = None, payload=None) -> tuple:
+    token_digest = hashlib.sha1(page_token.encode("utf-8")).hexdigest()[:16] if page_token else ""
+    job_key = f"{run_id}:{kind}:{target}:{token_digest}"
+    return (job_key, run_id, kind, JOB_PRIORITY[kind], target, page_token,
+            json.dumps(payload) if payload is not None else None)
+
+# Insert jobs that are not queued yet (same key = same unit of work); no commit
+def _enqueue(cursor, connection, jobs: list):
+    if not jobs:
+        return
+    columns = "job_key, run_id, kind, priority, target, page_token, payload"
+    if dialect_of(connection) == "postgresql":
+        query = f"INSERT INTO harvest_jobs ({columns}) VALUES (%s, %s, %s, %s, %s, %s, %s) ON CONFLICT (job_key) DO NOTHING"
+    else:
+        query = f"INSERT IGNORE INTO harvest_jobs ({columns}) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    cursor.executemany(query, jobs)
+
+def enqueue_channels(connection, channel_ids: list, run_id: str = None) -> int:
+    run_id = run_id or default_run_id(connection)
+    cursor = connection.cursor()
+    try:
+        _enqueue(cursor, connection, [_job(run_id, "channel", channel_id) for channel_id in channel_ids])
+        connection.commit()
+    finally:
+        cursor.close()
+    return len(channel_ids)
+
+def queue_status(connection, run_id: str = None) -> dict:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT status, COUNT(*) FROM harvest_jobs WHERE run_id = %s GROUP BY status",
+                       (run_id or default_run_id(connection),))
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+# ---------------------- Job handlers ----------------------
+# Each handler writes its rows without committing and returns the jobs it spawns
+
+def _run_channel(connection, job: dict, with_comments: bool) -> list:
+    response = get_pool().execute(lambda yt: yt.channels().list(
+        part="snippet,contentDetails,statistics",
+        id=job["target"]
+    ))
+    if not response.get("items"):
+        return []
+    row = channel_row(response["items"][0])
+    bulk_upsert(connection, "channels", CHANNEL_COLUMNS, [row], ["channel_id"], commit=False)
+    if not row[-1]:
+        return []
+    return [_job(job["run_id"], "playlist_page", job["target"], payload=row[-1])]
+
+def _run_playlist_page(connection, job: dict, with_comments: bool) -> list:
+    playlist_id = json.loads(job["payload"])
+    response = get_pool().execute(lambda yt: yt.playlistItems().list(
+        part="contentDetails",
+        playlistId=playlist_id,
+        maxResults=VIDEO_BATCH_SIZE,
+        pageToken=job["page_token"]
+    ))
+    video_ids = [item["contentDetails"]["videoId"] for item in response.get("items", [])]
+    jobs = [_job(job["run_id"], "video_batch", job["target"], job["page_token"], video_ids)] if video_ids else []
+    if response.get("nextPageToken"):
+        jobs.append(_job(job["run_id"], "playlist_page", job["target"], response["nextPageToken"], playlist_id))
+    return jobs
+
+def _run_video_batch(connection, job: dict, with_comments: bool) -> list:
+    video_ids = json.loads(job["payload"])
+    response = get_pool().execute(lambda yt: yt.videos().list(
+        part="snippet,contentDetails,statistics",
+        id=",".join(video_ids)
+    ))
+    rows = [parse_video_details(item) for item in response.get("items", [])]
+    bulk_upsert(connection, "videos", VIDEO_COLUMNS, rows, ["video_id"],
+                update_columns=[c for c in VIDEO_COLUMNS if c not in ("video_id", "channel_id")], commit=False)
+    record_snapshots(connection, video_stat_rows(rows), commit=False)
+    if not with_comments:
+        return []
+    # Skip the commentThreads call for videos that have no comments
+    return [_job(job["run_id"], "comment_page", row[0]) for row in rows if row[9] > 0]
+
+def _run_comment_page(connection, job: dict, with_comments: bool) -> list:
+    response = get_pool().execute(lambda yt: yt.commentThreads().list(
+        part="snippet",
+        videoId=job["target"],
+        maxResults=COMMENT_PAGE_SIZE,
+        pageToken=job["page_token"]
+    ))
+    rows = [row for item in response.get("items", []) for row in thread_rows(item, job["target"])]
+    bulk_upsert(connection, "comments", COMMENT_COLUMNS, rows, ["comment_id"],
+                update_columns=["comment_text", "likes"], commit=False)
+    if response.get("nextPageToken"):
+        return [_job(job["run_id"], "comment_page", job["target"], response["nextPageToken"])]
+    return []
+
+JOB_HANDLERS = {
+    "channel": _run_channel,
+    "playlist_page": _run_playlist_page,
+    "video_batch": _run_video_batch,
+    "comment_page": _run_comment_page,
+}
+
+# ---------------------- Workers ----------------------
+JOB_COLUMNS = ["job_key", "run_id", "kind", "target", "page_token", "payload", "attempts"]
+
+# Workers lease jobs: a claimed job belongs to its owner until lease_expires, and the
+# owner's heartbeat keeps pushing that forward. A job whose worker died (or lost its
+# network) becomes claimable again once the lease runs out.
+class JobQueue:
+    def __init__(self, pool=None, run_id: str = None, workers: int = JOB_WORKERS, with_comments: bool = True,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, lease_seconds: int = JOB_LEASE_SECONDS, owner: str = None):
+        self.pool = pool or db_pool.get_mysql_pool()
+        if run_id is None:
+            with self.pool.connection() as conn:
+                run_id = default_run_id(conn)
+        self.run_id = run_id
+        self.workers = workers
+        self.with_comments = with_comments
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._counter_lock = threading.Lock()
+        self._channels = set()
+
+    def _lease_until(self, connection) -> str:
+        if dialect_of(connection) == "postgresql":
+            return "CURRENT_TIMESTAMP + %s * INTERVAL '1 second'"
+        return "CURRENT_TIMESTAMP + INTERVAL %s SECOND"
+
+    # SKIP LOCKED lets any number of workers, in any process, claim concurrently
+    # without blocking on (or double-claiming) the same row
+    def claim(self, connection) -> dict:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT {', '.join(JOB_COLUMNS)} FROM harvest_jobs
+                WHERE run_id = %s
+                  AND (status = 'pending' OR (status = 'running'
+                       AND (lease_expires IS NULL OR lease_expires < CURRENT_TIMESTAMP)))
+                ORDER BY priority, created_at, job_key
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """, (self.run_id,))
+            row = cursor.fetchone()
+            if row is None:
+                connection.commit()
+                return None
+            cursor.execute(f"""
+                UPDATE harvest_jobs SET status = 'running', attempts = attempts + 1, lease_owner = %s,
+                    lease_expires = {self._lease_until(connection)}, updated_at = CURRENT_TIMESTAMP
+                WHERE job_key = %s
+            """, (self.owner, self.lease_seconds, row[0]))
+            connection.commit()
+            job = dict(zip(JOB_COLUMNS, row))
+            job["attempts"] += 1
+            return job
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def heartbeat(self, connection) -> int:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"""
+                UPDATE harvest_jobs SET lease_expires = {self._lease_until(connection)}
+                WHERE lease_owner = %s AND status = 'running'
+            """, (self.lease_seconds, self.owner))
+            connection.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def _heartbeat_loop(self):
+        while not self._done.wait(self.lease_seconds / 3):
+            try:
+                with self.pool.connection() as conn:
+                    self.heartbeat(conn)
+            except Exception as e:
+                print(f"⚠️ Lease heartbeat failed: {e}")
+
+    # Only the current lease holder may finish a job; returns False if the lease was lost.
+    # refund=True hands the attempt back (the failure was not the job's fault).
+    def _finish(self, cursor, job: dict, status: str, error: str = None, refund: bool = False) -> bool:
+        cursor.execute("""
+            UPDATE harvest_jobs SET status = %s, last_error = %s, attempts = attempts - %s,
+                lease_owner = NULL, lease_expires = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE job_key = %s AND lease_owner = %s AND status = 'running'
+        """, (status, error, 1 if refund else 0, job["job_key"], self.owner))
+        return cursor.rowcount > 0
+
+    def _fail(self, connection, job: dict, status: str, error: str, refund: bool = False):
+        cursor = connection.cursor()
+        try:
+            self._finish(cursor, job, status, error, refund)
+            connection.commit()
+        finally:
+            cursor.close()
+
+    def run_job(self, connection, job: dict):
+        if job["attempts"] > self.max_attempts:
+            # Claimed again after its lease expired too many times (e.g. it keeps killing workers)
+            self._fail(connection, job, "failed", "lease expired too many times")
+            return
+        try:
+            spawned = JOB_HANDLERS[job["kind"]](connection, job, self.with_comments)
+            cursor = connection.cursor()
+            try:
+                _enqueue(cursor, connection, spawned)
+                if not self._finish(cursor, job, "done"):
+                    connection.rollback()
+                    print(f"⚠️ Lease on {job['job_key']} was lost; leaving it to its new owner")
+                    return
+            finally:
+                cursor.close()
+            connection.commit()
+            if job["kind"] in ("channel", "video_batch"):
+                with self._counter_lock:
+                    self._channels.add(job["target"])
+        except KeyPoolExhausted as e:
+            # Out of quota: put the job back untouched and stop pulling
+            connection.rollback()
+            self._fail(connection, job, "pending", str(e), refund=True)
+            self._stop.set()
+            print(f"⚠️ API quota exhausted, stopping workers: {e}")
+        except HttpError as e:
+            connection.rollback()
+            permanent = e.resp.status in (400, 403, 404) and not is_quota_error(e)
+            status = "failed" if permanent or job["attempts"] >= self.max_attempts else "pending"
+            self._fail(connection, job, status, str(e))
+            print(f"❌ {job['kind']} {job['target']}: {e}")
+        except Exception as e:
+            connection.rollback()
+            status = "failed" if job["attempts"] >= self.max_attempts else "pending"
+            self._fail(connection, job, status, str(e))
+            print(f"❌ {job['kind']} {job['target']}: {e}")
+
+    def _worker(self, max_jobs: int, counter: list):
+        with self.pool.connection() as conn:
+            while not self._stop.is_set():
+                with self._counter_lock:
+                    if max_jobs is not None and counter[0] >= max_jobs:
+                        return
+                    counter[0] += 1
+                job = self.claim(conn)
+                if job is not None:
+                    self.run_job(conn, job)
+                    continue
+                with self._counter_lock:
+                    counter[0] -= 1
+                # Nothing claimable right now; jobs still running (here or on other
+                # workers) may spawn more, so wait for them before giving up
+                status = queue_status(conn, self.run_id)
+                conn.commit()
+                if not status.get("pending") and not status.get("running"):
+                    return
+                self._stop.wait(JOB_POLL_INTERVAL)
+
+    # Work the run until no pending or running jobs remain (or quota runs out).
+    # Returns job counts by status.
+    def run(self, max_jobs: int = None) -> dict:
+        # Every worker holds a connection for its whole life, plus one for the
+        # heartbeat and one for the caller; a smaller pool would time workers out
+        self.pool.resize(max(self.pool.max_size, self.workers + 2))
+        self._stop.clear()
+        self._done.clear()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        counter = [0]
+        threads = [threading.Thread(target=self._worker, args=(max_jobs, counter), daemon=True)
+                   for _ in range(self.workers)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self._done.set()
+            heartbeat.join()
+        with self.pool.connection() as conn:
+            if self._channels:
+                refresh_channel_stats(conn, sorted(self._channels))
+                record_channel_totals(conn, sorted(self._channels))
+                self._channels.clear()
+            status = queue_status(conn, self.run_id)
+            conn.commit()
+            return status
+
+# Worker mode: start any number of `harvester.py harvest` processes, on any
+# machines, against the same warehouse and run id. HARVEST_WORKER_INDEX /
+# HARVEST_WORKER_COUNT give each process its own slice of the API key pool.
+def use_worker_keys():
+    worker_count = int(os.getenv("HARVEST_WORKER_COUNT", "1"))
+    if worker_count > 1:
+        keys = key_pool.use_slice(int(os.getenv("HARVEST_WORKER_INDEX", "0")), worker_count).keys
+        print(f"Using {len(keys)} API key(s): {', '.join('...' + k[-4:] for k in keys)}")
+
+# Create the queue tables and seed the run. Enqueueing is idempotent, so every worker may do this.
+# Returns the run id (an unfinished run is resumed when none is given).
+def prepare_run(connection, channel_ids: list, run_id: str = None) -> str:
+    # Workers starting together can race on CREATE TABLE IF NOT EXISTS; the retry sees the table
+    for attempt in range(3):
+        try:
+            create_job_table(connection)
+            create_snapshot_tables(connection)
+            migrate_comment_channels(connection)
+            break
+        except Exception:
+            connection.rollback()
+            if attempt == 2:
+                raise
+            time.sleep(1)
+    run_id = run_id or default_run_id(connection)
+    enqueue_channels(connection, channel_ids, run_id)
+    return run_id
+
+# Same as `python harvester.py harvest --mode queue`: enqueues the channels and works
+# the run until it is done; running it again after a crash resumes it
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(["harvest", "--mode", "queue", *sys.argv[1:]]))
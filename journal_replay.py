@@ -0,0 +1,144 @@
+import sys
+
+from raw_journal import iter_records, JOURNAL_DIR
+from parsers import (channel_row, parse_video_details, parse_video_statistics, playlist_row,
+                     CHANNEL_COLUMNS, VIDEO_COLUMNS, PLAYLIST_COLUMNS)
+from comments import comment_row, COMMENT_COLUMNS, COMMENT_BATCH_SIZE
+from bulk_writer import bulk_upsert
+from channel_stats import refresh_all_stats
+
+def _channel_rows(record: dict) -> list:
+    return [channel_row(item) for item in record["response"].get("items", []) if "snippet" in item]
+
+def _video_rows(record: dict) -> list:
+    return [parse_video_details(item) for item in record["response"].get("items", [])
+            if "snippet" in item and "contentDetails" in item]
+
+# Statistics-only refreshes (incremental.py) become updates of the stored video:
+# (video_id, views, comment_count, favorite_count, likes)
+def _video_stat_rows(record: dict) -> list:
+    return [(row[4],) + row[:4] for row in (parse_video_statistics(item) for item in record["response"].get("items", [])
+                                            if "snippet" not in item and "statistics" in item)]
+
+def _playlist_rows(record: dict) -> list:
+    return [playlist_row(item) for item in record["response"].get("items", []) if "snippet" in item]
+
+def _thread_rows(record: dict) -> list:
+    rows = []
+    for item in record["response"].get("items", []):
+        top = item["snippet"]["topLevelComment"]
+        video_id = item["snippet"].get("videoId") or top["snippet"].get("videoId")
+        channel_id = item["snippet"].get("channelId")
+        rows.append(comment_row(top, video_id, channel_id=channel_id))
+        rows.extend(comment_row(reply, video_id, top["id"], channel_id)
+                    for reply in item.get("replies", {}).get("comments", []))
+    return rows
+
+def _reply_rows(record: dict) -> list:
+    return [comment_row(item, item["snippet"]["videoId"], item["snippet"].get("parentId"))
+            for item in record["response"].get("items", []) if item["snippet"].get("videoId")]
+
+# table -> (columns, key columns, (parent table, parent key, position of the parent
+# key in a row)). Tables are listed parents first. A row whose parent is neither
+# stored nor written earlier in the same flush stays pending until a later flush
+# has written the parent, so a child seen before its parent never breaks a
+# foreign key; rows still orphaned at the end are skipped.
+REPLAY_TABLES = {
+    "channels": (CHANNEL_COLUMNS, ["channel_id"], None),
+    "playlists": (PLAYLIST_COLUMNS, ["playlist_id"], ("channels", "channel_id", 2)),
+    "videos": (VIDEO_COLUMNS, ["video_id"], ("channels", "channel_id", 1)),
+    "video_stats": (["video_id", "views", "comment_count", "favorite_count", "likes"], ["video_id"],
+                    ("videos", "video_id", 0)),
+    "comments": (COMMENT_COLUMNS, ["comment_id"], ("videos", "video_id", 1)),
+}
+# method -> [(table, row builder)]
+REPLAY_HANDLERS = {
+    "youtube.channels.list": [("channels", _channel_rows)],
+    "youtube.playlists.list": [("playlists", _playlist_rows)],
+    "youtube.videos.list": [("videos", _video_rows), ("video_stats", _video_stat_rows)],
+    "youtube.commentThreads.list": [("comments", _thread_rows)],
+    "youtube.comments.list": [("comments", _reply_rows)],
+}
+VIDEO_STATS_UPDATE = "UPDATE videos SET views = %s, comment_count = %s, favorite_count = %s, likes = %s WHERE video_id = %s"
+KEY_LOOKUP_CHUNK = 1000
+
+def _existing_keys(connection, table: str, key: str, values: set) -> set:
+    values, found = list(values), set()
+    cursor = connection.cursor()
+    try:
+        for i in range(0, len(values), KEY_LOOKUP_CHUNK):
+            chunk = values[i:i + KEY_LOOKUP_CHUNK]
+            cursor.execute(f"SELECT {key} FROM {table} WHERE {key} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            found.update(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+    return found
+
+def _write(connection, table: str, columns: list, key_columns: list, rows: list):
+    if table != "video_stats":
+        bulk_upsert(connection, table, columns, rows, key_columns)
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(VIDEO_STATS_UPDATE, [row[1:] + row[:1] for row in rows])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# Rebuild the warehouse tables from the journal without any API calls.
+# Later records win, so replaying in order leaves each row at its newest state.
+def replay(connection, directory: str = JOURNAL_DIR, since: str = None, until: str = None,
+           batch_size: int = COMMENT_BATCH_SIZE) -> dict:
+    pending = {table: {} for table in REPLAY_TABLES}
+    counts = {table: 0 for table in REPLAY_TABLES}
+    skipped = {table: 0 for table in REPLAY_TABLES}
+    threshold = batch_size
+
+    def flush(final: bool = False):
+        for table, (columns, key_columns, parent) in REPLAY_TABLES.items():
+            rows = list(pending[table].values())
+            if parent and rows:
+                parent_table, parent_key, position = parent
+                present = _existing_keys(connection, parent_table, parent_key, {row[position] for row in rows})
+                rows = [row for row in rows if row[position] in present]
+            if rows:
+                _write(connection, table, columns, key_columns, rows)
+                counts[table] += len(rows)
+                for row in rows:
+                    del pending[table][row[0]]
+            if final:
+                skipped[table] += len(pending[table])
+                pending[table].clear()
+
+    for record in iter_records(directory, since, until):
+        handlers = REPLAY_HANDLERS.get(record.get("method"))
+        if not handlers:
+            continue
+        try:
+            built = [(table, build_rows(record)) for table, build_rows in handlers]
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"⚠️ Skipping unparseable {record['method']} record from {record['ts']}: {e}")
+            continue
+        for table, rows in built:
+            for row in rows:
+                pending[table][row[0]] = row
+                if table == "videos":  # a full record supersedes older pending statistics
+                    pending["video_stats"].pop(row[0], None)
+        if sum(len(p) for p in pending.values()) >= threshold:
+            flush()
+            # Rows still waiting for their parent do not count towards the next batch
+            threshold = sum(len(p) for p in pending.values()) + batch_size
+    flush(final=True)
+    for table, count in skipped.items():
+        if count:
+            print(f"⚠️ Skipped {count} {table} rows whose parent is not in the journal or the database")
+    refresh_all_stats(connection)
+    return counts
+
+# Same as `python harvester.py replay`
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(["replay", *sys.argv[1:]]))
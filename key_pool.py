@@ -0,0 +1,170 @@
+from googleapiclient.errors import HttpError
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import threading
+import json
+import os
+
+import api_client
+
+# Daily quota per key and the unit cost of each endpoint we call (search is the expensive one)
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+DEFAULT_COST = 1
+ENDPOINT_COSTS = {
+    "youtube.search.list": 100,
+    "youtube.channels.list": 1,
+    "youtube.playlists.list": 1,
+    "youtube.playlistItems.list": 1,
+    "youtube.videos.list": 1,
+    "youtube.commentThreads.list": 1,
+    "youtube.comments.list": 1,
+}
+QUOTA_ERROR_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+# YouTube quotas reset at midnight Pacific time
+PACIFIC = ZoneInfo("America/Los_Angeles")
+
+class KeyPoolExhausted(Exception):
+    pass
+
+def endpoint_cost(method_id: str) -> int:
+    return ENDPOINT_COSTS.get(method_id, DEFAULT_COST)
+
+def next_quota_reset(now: datetime = None) -> datetime:
+    now = (now or datetime.now(PACIFIC)).astimezone(PACIFIC)
+    tomorrow = (now + timedelta(days=1)).date()
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=PACIFIC)
+
+def is_quota_error(error: HttpError) -> bool:
+    if error.resp.status != 403:
+        return False
+    try:
+        details = json.loads(error.content.decode("utf-8"))["error"].get("errors", [])
+    except (ValueError, KeyError, AttributeError):
+        return "quota" in str(error).lower()
+    return any(d.get("reason") in QUOTA_ERROR_REASONS for d in details)
+
+class _KeyState:
+    def __init__(self, key: str):
+        self.key = key
+        self.spent = 0
+        self.exhausted = False
+        self.reset_at = next_quota_reset()
+
+# Shared pool of API keys. Tracks units spent per key from the endpoint cost table,
+# hands out the key with the most budget left and parks exhausted keys until the
+# Pacific-time reset, so no fetcher retries a dead key.
+class KeyPool:
+    def __init__(self, api_keys: list, daily_quota: int = DAILY_QUOTA):
+        keys = [key.strip() for key in api_keys if key and key.strip()]
+        if not keys:
+            raise ValueError("Missing YouTube API Keys. Set YOUTUBE_API_KEYS or YOUTUBE_API_KEY.")
+        self.daily_quota = daily_quota
+        self._states = {key: _KeyState(key) for key in dict.fromkeys(keys)}
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self) -> list:
+        return list(self._states)
+
+    def _refresh(self, state: _KeyState, now: datetime):
+        if now >= state.reset_at:
+            state.spent = 0
+            state.exhausted = False
+            state.reset_at = next_quota_reset(now)
+
+    def remaining(self, key: str) -> int:
+        with self._lock:
+            state = self._states[key]
+            self._refresh(state, datetime.now(PACIFIC))
+            return 0 if state.exhausted else max(0, self.daily_quota - state.spent)
+
+    # Reserve `cost` units on the key with the most budget left
+    def acquire(self, cost: int = DEFAULT_COST) -> str:
+        now = datetime.now(PACIFIC)
+        with self._lock:
+            for state in self._states.values():
+                self._refresh(state, now)
+            candidates = [s for s in self._states.values()
+                          if not s.exhausted and self.daily_quota - s.spent >= cost]
+            if not candidates:
+                raise KeyPoolExhausted(
+                    f"All {len(self._states)} API keys are out of quota until "
+                    f"{min(s.reset_at for s in self._states.values()):%Y-%m-%d %H:%M %Z}."
+                )
+            state = max(candidates, key=lambda s: self.daily_quota - s.spent)
+            state.spent += cost
+            return state.key
+
+    def mark_exhausted(self, key: str):
+        with self._lock:
+            state = self._states[key]
+            state.exhausted = True
+            state.reset_at = next_quota_reset()
+
+    # Every count-th key starting at index: disjoint key sets for cooperating worker
+    # processes. With fewer keys than workers, workers share keys round-robin.
+    def slice(self, index: int, count: int) -> "KeyPool":
+        keys = self.keys
+        return KeyPool(keys[index::count] or [keys[index % len(keys)]], self.daily_quota)
+
+    def client(self, key: str):
+        return api_client.get_client(key)
+
+    # Execute the request produced by build_request(client), rotating to the next
+    # key with budget whenever the API reports the current one out of quota.
+    def execute(self, build_request):
+        cost = None
+        while True:
+            key = self.acquire(cost or DEFAULT_COST)
+            request = build_request(self.client(key))
+            if cost is None:
+                cost = endpoint_cost(request.methodId)
+                if cost > DEFAULT_COST:
+                    self._release(key, DEFAULT_COST)
+                    continue
+            try:
+                return request.execute()
+            except HttpError as e:
+                if not is_quota_error(e):
+                    raise
+                print(f"API Key ...{key[-4:]} quota exceeded. Trying the next API key...")
+                self.mark_exhausted(key)
+
+    def _release(self, key: str, cost: int):
+        with self._lock:
+            state = self._states[key]
+            state.spent = max(0, state.spent - cost)
+
+    def status(self) -> list:
+        now = datetime.now(PACIFIC)
+        with self._lock:
+            for state in self._states.values():
+                self._refresh(state, now)
+            return [{
+                "key": f"...{s.key[-4:]}",
+                "spent": s.spent,
+                "remaining": 0 if s.exhausted else max(0, self.daily_quota - s.spent),
+                "exhausted": s.exhausted,
+                "reset_at": s.reset_at.isoformat()
+            } for s in self._states.values()]
+
+def keys_from_env() -> list:
+    return (os.getenv("YOUTUBE_API_KEYS") or os.getenv("YOUTUBE_API_KEY") or "").split(",")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> KeyPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KeyPool(keys_from_env())
+        return _pool
+
+# Restrict this process to its slice of the configured keys
+def use_slice(index: int, count: int) -> KeyPool:
+    global _pool
+    with _pool_lock:
+        _pool = KeyPool(keys_from_env()).slice(index, count)
+        return _pool
@@ -0,0 +1,216 @@
+from datetime import timedelta
+import time
+import sys
+import os
+
+from bulk_writer import dialect_of
+from channel_stats import _upsert_clause
+from stats_snapshots import ensure_partitions, append_from_videos, record_channel_totals, now_utc
+
+# Incremental copy of videos into archived_videos. The source is walked in
+# primary-key ranges of MIGRATE_CHUNK_ROWS keys, each copied and committed in its
+# own short transaction, so locks and WAL come in small pieces and dashboard
+# queries keep running. Only rows whose videos.updated_at is newer than the
+# previous run's start (minus MIGRATE_OVERLAP_SECONDS, for transactions that were
+# still open then) are copied. Progress is checkpointed in migration_state, so an
+# interrupted run resumes after its last committed range.
+MIGRATE_CHUNK_ROWS = int(os.getenv("MIGRATE_CHUNK_ROWS", "5000"))
+MIGRATE_OVERLAP_SECONDS = int(os.getenv("MIGRATE_OVERLAP_SECONDS", "300"))
+MIGRATE_PAUSE_SECONDS = float(os.getenv("MIGRATE_PAUSE_SECONDS", "0"))
+
+ARCHIVE_TABLE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS archived_videos (
+        video_id VARCHAR(255) PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        views BIGINT DEFAULT 0,
+        likes BIGINT DEFAULT 0,
+        comments BIGINT DEFAULT 0
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS migration_state (
+        name VARCHAR(255) PRIMARY KEY,
+        since_ts TIMESTAMP NULL,
+        started_at TIMESTAMP NOT NULL,
+        last_key VARCHAR(255) NOT NULL,
+        rows_copied BIGINT DEFAULT 0,
+        finished_at TIMESTAMP NULL
+    );
+    """
+]
+
+# videos.updated_at is the change timestamp. MySQL maintains it with ON UPDATE;
+# PostgreSQL needs a trigger, which skips upserts that changed nothing.
+UPDATED_AT_DEFINITION = {
+    "postgresql": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    "mysql": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP",
+}
+
+POSTGRES_TOUCH_TRIGGER = [
+    """
+    CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at = CURRENT_TIMESTAMP;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    "DROP TRIGGER IF EXISTS videos_touch_updated_at ON videos;",
+    """
+    CREATE TRIGGER videos_touch_updated_at BEFORE UPDATE ON videos
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE FUNCTION touch_updated_at();
+    """
+]
+
+ARCHIVE_COPY_QUERY = """
+    INSERT INTO archived_videos (video_id, title, views, likes, comments)
+    SELECT video_id, title, views, likes, comment_count FROM videos
+    {where}
+"""
+
+def create_archive_tables(connection):
+    postgres = dialect_of(connection) == "postgresql"
+    schema = "current_schema()" if postgres else "DATABASE()"
+    cursor = connection.cursor()
+    try:
+        for query in ARCHIVE_TABLE_QUERIES:
+            cursor.execute(query)
+        cursor.execute(f"""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = {schema} AND table_name = 'videos' AND column_name = 'updated_at'
+        """)
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE videos ADD COLUMN updated_at {UPDATED_AT_DEFINITION[dialect_of(connection)]}")
+        if postgres:
+            cursor.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'videos_touch_updated_at'")
+            if cursor.fetchone() is None:
+                for query in POSTGRES_TOUCH_TRIGGER:
+                    cursor.execute(query)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# Planner estimate of the rows to walk (no COUNT(*) over the table)
+def estimate_rows(connection, channel_id: str = None) -> int:
+    cursor = connection.cursor()
+    try:
+        if channel_id:
+            cursor.execute("SELECT video_count FROM channel_stats WHERE channel_id = %s", (channel_id,))
+        elif dialect_of(connection) == "postgresql":
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = 'videos'")
+        else:
+            cursor.execute("""
+                SELECT table_rows FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = 'videos'
+            """)
+        row = cursor.fetchone()
+        return max(int(row[0] or 0), 0) if row else 0
+    finally:
+        cursor.close()
+
+def _load_state(cursor, name: str):
+    cursor.execute("SELECT since_ts, started_at, last_key, rows_copied, finished_at FROM migration_state WHERE name = %s",
+                   (name,))
+    return cursor.fetchone()
+
+def _save_state(cursor, connection, name: str, since, started_at, last_key: str, rows_copied: int, finished_at=None):
+    cursor.execute(
+        "INSERT INTO migration_state (name, since_ts, started_at, last_key, rows_copied, finished_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+        + _upsert_clause(connection, ["since_ts", "started_at", "last_key", "rows_copied", "finished_at"], "name"),
+        (name, since, started_at, last_key, rows_copied, finished_at)
+    )
+
+# Last primary key of the next range, or None when fewer than chunk_size keys remain
+def _range_end(cursor, after: str, chunk_size: int, channel_id: str = None):
+    channel_filter = " AND channel_id = %s" if channel_id else ""
+    cursor.execute(
+        f"SELECT video_id FROM videos WHERE video_id > %s{channel_filter} ORDER BY video_id LIMIT 1 OFFSET %s",
+        [after] + ([channel_id] if channel_id else []) + [chunk_size - 1]
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+# Copy changed videos into archived_videos (and append their statistics to the
+# snapshot history) range by range. `progress(done, total, rows_copied)` is called
+# after every committed range. full=True ignores the change timestamp and any
+# unfinished run. Returns {"rows", "chunks", "since", "resumed"}.
+def migrate_videos(connection, channel_id: str = None, chunk_size: int = MIGRATE_CHUNK_ROWS, full: bool = False,
+                   progress=None, pause: float = MIGRATE_PAUSE_SECONDS) -> dict:
+    name = f"archived_videos:{channel_id or '*'}"
+    postgres = dialect_of(connection) == "postgresql"
+    total = estimate_rows(connection, channel_id)
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT CURRENT_TIMESTAMP")
+        now = cursor.fetchone()[0].replace(tzinfo=None)
+        state = _load_state(cursor, name)
+        resumed = bool(state and state[4] is None and not full)
+        if resumed:
+            since, started_at, last_key, rows_copied = state[0], state[1], state[2], state[3]
+        else:
+            since = state[1] - timedelta(seconds=MIGRATE_OVERLAP_SECONDS) if state and not full else None
+            started_at, last_key, rows_copied = now, "", 0
+            _save_state(cursor, connection, name, since, started_at, last_key, rows_copied)
+        captured_at = now_utc()
+        if postgres:
+            ensure_partitions(connection, captured_at, months=0)
+        connection.commit()
+
+        chunks, done, channels = 0, 0, set()
+        while True:
+            end = _range_end(cursor, last_key, chunk_size, channel_id)
+            conditions, params = ["video_id > %s"], [last_key]
+            if end is not None:
+                conditions.append("video_id <= %s")
+                params.append(end)
+            if channel_id:
+                conditions.append("channel_id = %s")
+                params.append(channel_id)
+            if since is not None:
+                conditions.append("updated_at >= %s")
+                params.append(since)
+            where = "WHERE " + " AND ".join(conditions)
+
+            cursor.execute(ARCHIVE_COPY_QUERY.format(where=where)
+                           + _upsert_clause(connection, ["title", "views", "likes", "comments"], "video_id"), params)
+            copied = cursor.rowcount if postgres else None
+            append_from_videos(cursor, connection, captured_at, where, params)
+            cursor.execute(f"SELECT DISTINCT channel_id FROM videos {where}", params)
+            changed = [row[0] for row in cursor.fetchall()]
+            if copied is None:  # MySQL counts an upsert that updated a row twice
+                cursor.execute(f"SELECT COUNT(*) FROM videos {where}", params)
+                copied = cursor.fetchone()[0]
+            channels.update(changed)
+            rows_copied += copied
+            last_key = end if end is not None else last_key
+            _save_state(cursor, connection, name, since, started_at, last_key, rows_copied,
+                        finished_at=None if end is not None else now)
+            connection.commit()
+
+            chunks += 1
+            done += chunk_size if end is not None else 0
+            total = max(total, done)
+            if progress:
+                progress(done, total, rows_copied)
+            if end is None:
+                break
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    record_channel_totals(connection, sorted(channels), captured_at.date())
+    return {"rows": rows_copied, "chunks": chunks, "since": since, "resumed": resumed}
+
+# Same as `python harvester.py migrate`
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(["migrate", *sys.argv[1:]]))
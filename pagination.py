@@ -0,0 +1,28 @@
+import os
+
+# Rows fetched per "Load more" click in the dashboard tables
+PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "100"))
+
+# Keyset (seek) pagination, newest first: instead of OFFSET, each page starts
+# strictly after the (published_date, id) of the last row already shown, so
+# page N costs the same index range scan as page 1.
+def keyset_query(table: str, columns: list, where: str, order_columns: list, after: tuple = None,
+                 page_size: int = PAGE_SIZE) -> tuple:
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE {where}"
+    params = []
+    if after:
+        query += f" AND ({', '.join(order_columns)}) < ({', '.join(['%s'] * len(order_columns))})"
+        params.extend(after)
+    query += f" ORDER BY {', '.join(f'{c} DESC' for c in order_columns)} LIMIT %s"
+    params.append(page_size)
+    return query, params
+
+def next_cursor(df, order_columns: list) -> tuple:
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    values = []
+    for column in order_columns:
+        value = last[column.split(".")[-1]]
+        values.append(value.to_pydatetime() if hasattr(value, "to_pydatetime") else value)
+    return tuple(values)
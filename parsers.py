@@ -0,0 +1,98 @@
+import datetime
+import isodate
+
+# Row builders shared by the live fetchers and the raw-journal replay (raw_journal.py),
+# so both paths write identical rows
+
+CHANNEL_COLUMNS = ["channel_id", "channel_name", "subscribers", "views", "total_videos", "description", "playlist_id"]
+
+VIDEO_COLUMNS = ["video_id", "channel_id", "title", "tags", "thumbnail", "description", "published_date",
+                 "duration", "views", "comment_count", "favorite_count", "definition", "caption_status", "likes"]
+
+PLAYLIST_COLUMNS = ["playlist_id", "title", "channel_id", "channel_name", "published_at", "video_count"]
+
+def to_mysql_datetime(yt_datetime: str) -> str:
+    return yt_datetime[:19].replace("T", " ") if yt_datetime else None
+
+# channels.list item (part=snippet,contentDetails,statistics) -> get_channel_info dict
+def channel_info(item: dict) -> dict:
+    return {
+        "Channel_Name": item["snippet"]["title"],
+        "Channel_Id": item["id"],
+        "Subscribers": int(item["statistics"].get("subscriberCount", 0)),
+        "Views": int(item["statistics"].get("viewCount", 0)),
+        "Total_Videos": int(item["statistics"].get("videoCount", 0)),
+        "Channel_Description": item["snippet"].get("description", ""),
+        "Playlist_Id": item["contentDetails"]["relatedPlaylists"]["uploads"]
+    }
+
+# commentThreads.list item -> get_video_comments dict
+def comment_info(item: dict, video_id: str) -> dict:
+    snippet = item["snippet"]["topLevelComment"]["snippet"]
+    return {
+        "Comment_Id": item["id"],
+        "Video_Id": video_id,
+        "Comment_Text": snippet.get("textDisplay", "No text available"),
+        "Author": snippet.get("authorDisplayName", "Unknown"),
+        "Published_Date": to_mysql_datetime(snippet["publishedAt"]),
+        "Likes": snippet["likeCount"],
+        "Channel_Id": item["snippet"].get("channelId")
+    }
+
+# channels.list item (part=snippet,contentDetails,statistics) -> channels row
+def channel_row(item: dict) -> tuple:
+    statistics = item.get("statistics", {})
+    return (item["id"], item["snippet"]["title"], int(statistics.get("subscriberCount", 0)),
+            int(statistics.get("viewCount", 0)), int(statistics.get("videoCount", 0)),
+            item["snippet"].get("description", ""),
+            item.get("contentDetails", {}).get("relatedPlaylists", {}).get("uploads", ""))
+
+# Function to Parse a videos.list Item into a MySQL Row
+def parse_video_details(item):
+    snippet = item["snippet"]
+    content_details = item["contentDetails"]
+    statistics = item.get("statistics", {})
+
+    # Extract Required Data
+    video_id = item["id"]
+    channel_id = snippet["channelId"]
+    title = snippet["title"]
+    tags = ", ".join(snippet.get("tags", []))  # Convert list to comma-separated string
+    thumbnail = snippet["thumbnails"]["high"]["url"]
+    description = snippet.get("description", "")
+
+    # Convert Published Date Format
+    published_at = snippet["publishedAt"]
+    try:
+        published_date = datetime.datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%S.%fZ")
+    except ValueError:
+        published_date = datetime.datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
+    published_date = published_date.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Convert Duration - Convert ISO 8601 to Seconds
+    duration_iso = content_details["duration"]
+    duration_seconds = int(isodate.parse_duration(duration_iso).total_seconds())
+
+    # Fix Missing View Counts - Default to 0
+    views = int(statistics.get("viewCount", 0))
+    comments = int(statistics.get("commentCount", 0))
+    favorite_count = int(statistics.get("favoriteCount", 0))
+    likes = int(statistics.get("likeCount", 0))
+    definition = content_details["definition"]
+    caption_status = content_details["caption"]
+
+    return (video_id, channel_id, title, tags, thumbnail, description, published_date, duration_seconds,
+            views, comments, favorite_count, definition, caption_status, likes)
+
+# playlists.list item -> playlists row
+def playlist_row(item: dict) -> tuple:
+    snippet = item["snippet"]
+    return (item["id"], snippet["title"], snippet["channelId"], snippet["channelTitle"],
+            to_mysql_datetime(snippet.get("publishedAt")),
+            int(item.get("contentDetails", {}).get("itemCount", snippet.get("itemCount", 0))))
+
+# Statistics-only videos.list items: (views, comment_count, favorite_count, likes, video_id)
+def parse_video_statistics(item: dict) -> tuple:
+    statistics = item.get("statistics", {})
+    return (int(statistics.get("viewCount", 0)), int(statistics.get("commentCount", 0)),
+            int(statistics.get("favoriteCount", 0)), int(statistics.get("likeCount", 0)), item["id"])
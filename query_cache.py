@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import threading
+import time
+import re
+import os
+
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+def tables_in(query: str) -> frozenset:
+    return frozenset(name.lower().split(".")[-1] for name in _TABLE_PATTERN.findall(query))
+
+def normalize_sql(query: str) -> str:
+    return " ".join(query.split())
+
+def frame_size(df) -> int:
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+# LRU cache of query results (DataFrames) keyed by SQL text and parameters.
+# Entries expire after `ttl` seconds, the total footprint is capped at
+# `max_bytes`, and writers drop every entry that reads a table they touched.
+class QueryCache:
+    def __init__(self, ttl: float = QUERY_CACHE_TTL, max_bytes: int = QUERY_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, df, size, tables)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(query: str, params=None) -> tuple:
+        return normalize_sql(query), tuple(params) if params else ()
+
+    def get(self, query: str, params=None):
+        key = self.key_for(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, query: str, params, df):
+        size = frame_size(df)
+        if size > self.max_bytes:
+            return
+        key = self.key_for(query, params)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, df, size, tables_in(query))
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, *tables: str):
+        tables = {t.lower() for t in tables}
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e[3] & tables]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
@@ -0,0 +1,118 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import threading
+import random
+import json
+import time
+import os
+
+# Process-wide request rate for the YouTube API. Starts at RATE_LIMIT_QPS, halves
+# whenever the API pushes back (429, 5xx, rateLimitExceeded) and creeps back up
+# while requests succeed (AIMD), staying between RATE_LIMIT_MIN_QPS and RATE_LIMIT_MAX_QPS.
+RATE_LIMIT_QPS = float(os.getenv("YOUTUBE_RATE_LIMIT_QPS", "20"))
+RATE_LIMIT_MIN_QPS = float(os.getenv("YOUTUBE_RATE_LIMIT_MIN_QPS", "1"))
+RATE_LIMIT_MAX_QPS = float(os.getenv("YOUTUBE_RATE_LIMIT_MAX_QPS", "50"))
+RATE_LIMIT_BURST = int(os.getenv("YOUTUBE_RATE_LIMIT_BURST", "10"))
+MAX_RETRIES = int(os.getenv("YOUTUBE_MAX_RETRIES", "6"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 64.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+def error_reasons(error) -> set:
+    try:
+        details = json.loads(error.content.decode("utf-8"))["error"].get("errors", [])
+        return {d.get("reason") for d in details}
+    except (ValueError, KeyError, AttributeError):
+        return set()
+
+# 429/5xx and per-user rate limits are worth retrying; quota (403 quotaExceeded)
+# and client errors are not
+def is_retryable(error) -> bool:
+    status = error.resp.status
+    return status in RETRYABLE_STATUS or (status == 403 and bool(error_reasons(error) & RATE_LIMIT_REASONS))
+
+# Retry-After is either delta-seconds or an HTTP date
+def retry_after_seconds(resp) -> float:
+    value = resp.get("retry-after") if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    def __init__(self, rate: float = RATE_LIMIT_QPS, burst: int = RATE_LIMIT_BURST,
+                 min_rate: float = RATE_LIMIT_MIN_QPS, max_rate: float = RATE_LIMIT_MAX_QPS,
+                 max_retries: int = MAX_RETRIES):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.max_retries = max_retries
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.throttles = 0
+
+    # Take a token if one is available; otherwise return how long to wait before asking again
+    def try_acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    # Block until a token is available (and any Retry-After pause is over)
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    # Additive increase: +1 request/s for every `rate` successes, i.e. about +1/s per second
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + 1.0 / max(self.rate, 1.0))
+
+    # Multiplicative decrease. Returns how long the caller should wait before retrying:
+    # the server's Retry-After if given (which also pauses every other caller),
+    # otherwise exponential backoff with full jitter.
+    def on_throttle(self, attempt: int, retry_after: float = None) -> float:
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                return retry_after
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"rate": round(self.rate, 2), "successes": self.successes, "throttles": self.throttles}
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
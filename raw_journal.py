@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qsl
+from itertools import groupby
+import zstandard as zstd
+import threading
+import socket
+import atexit
+import heapq
+import glob
+import json
+import io
+import os
+
+from response_cache import IGNORED_PARAMS
+
+# Append-only journal of every raw API response, so the warehouse tables can be
+# rebuilt (or a new column backfilled) by re-parsing from disk with
+# journal_replay.py instead of re-spending quota. One zstd-compressed JSON-lines
+# segment per UTC day and writer process; records are buffered and appended as
+# whole zstd frames. A frame is written once JOURNAL_FLUSH_RECORDS records are
+# buffered or at most JOURNAL_FLUSH_SECONDS after they arrive, whichever is first,
+# so a crash loses at most that much. Compression and the fsync run on a
+# background writer thread; callers only append to the buffer.
+JOURNAL_DIR = os.getenv("YOUTUBE_JOURNAL_DIR", "journal")
+JOURNAL_ENABLED = os.getenv("YOUTUBE_RAW_JOURNAL", "1") != "0"
+JOURNAL_FLUSH_RECORDS = int(os.getenv("YOUTUBE_JOURNAL_FLUSH_RECORDS", "200"))
+JOURNAL_FLUSH_SECONDS = float(os.getenv("YOUTUBE_JOURNAL_FLUSH_SECONDS", "1"))
+JOURNAL_LEVEL = int(os.getenv("YOUTUBE_JOURNAL_LEVEL", "3"))
+
+class RawJournal:
+    def __init__(self, directory: str = JOURNAL_DIR, flush_records: int = JOURNAL_FLUSH_RECORDS,
+                 level: int = JOURNAL_LEVEL, flush_seconds: float = JOURNAL_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self._compressor = zstd.ZstdCompressor(level=level)
+        self._writer = f"{socket.gethostname()}-{os.getpid()}"
+        self._buffer = []  # (day, line)
+        self._lock = threading.Lock()  # guards _buffer only
+        self._write_lock = threading.Lock()  # one frame at a time, in buffer order
+        self._wake = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+        threading.Thread(target=self._flush_loop, daemon=True, name="raw-journal").start()
+
+    def segment_path(self, day: str) -> str:
+        return os.path.join(self.directory, f"responses-{day}.{self._writer}.jsonl.zst")
+
+    def record(self, request, body: dict):
+        self.append(request.methodId, dict(parse_qsl(urlparse(request.uri).query)), body)
+
+    def append(self, method_id: str, params: dict, body: dict):
+        params = {k: v for k, v in params.items() if k not in IGNORED_PARAMS}
+        now = datetime.now(timezone.utc)
+        line = json.dumps({"ts": now.isoformat(), "method": method_id, "params": params,
+                           "response": body}, separators=(",", ":"))
+        with self._lock:
+            self._buffer.append((now.strftime("%Y-%m-%d"), line))
+            full = len(self._buffer) >= self.flush_records
+        if full:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Raw journal write failed: {e}")
+
+    # Write everything buffered so far, one frame per day. Records that could not
+    # be written go back to the front of the buffer.
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            days = [(day, [line for _, line in lines]) for day, lines in groupby(records, key=lambda r: r[0])]
+            for i, (day, lines) in enumerate(days):
+                try:
+                    self._write_frame(day, lines)
+                except Exception:
+                    with self._lock:
+                        self._buffer = [(d, line) for d, rest in days[i:] for line in rest] + self._buffer
+                    raise
+
+    def _write_frame(self, day: str, lines: list):
+        frame = self._compressor.compress(("\n".join(lines) + "\n").encode("utf-8"))
+        with open(self.segment_path(day), "ab") as f:
+            f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_journal() -> RawJournal:
+    global _journal
+    if not JOURNAL_ENABLED:
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = RawJournal()
+        return _journal
+
+# ---------------------- Reading ----------------------
+def _read_segment(path: str):
+    with open(path, "rb") as f:
+        reader = zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        try:
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                if not line.endswith("\n"):
+                    break  # truncated tail of a frame cut off by a crash
+                yield json.loads(line)
+        except (zstd.ZstdError, ValueError) as e:
+            print(f"⚠️ Stopped reading damaged journal segment {path}: {e}")
+
+# Yield journal records oldest first. `since`/`until` are inclusive 'YYYY-MM-DD' days;
+# the segments of one day (one per writer process) are merged by timestamp.
+def iter_records(directory: str = JOURNAL_DIR, since: str = None, until: str = None):
+    days = {}
+    for path in glob.glob(os.path.join(directory, "responses-*.jsonl.zst")):
+        day = os.path.basename(path)[len("responses-"):len("responses-") + 10]
+        if (since and day < since) or (until and day > until):
+            continue
+        days.setdefault(day, []).append(path)
+    for day in sorted(days):
+        yield from heapq.merge(*(_read_segment(path) for path in sorted(days[day])), key=lambda r: r["ts"])
@@ -0,0 +1,105 @@
+from urllib.parse import urlparse, parse_qsl, urlencode
+import threading
+import hashlib
+import json
+import os
+
+# On-disk ETag cache for slow-changing API metadata.
+# Entries are keyed by endpoint + request parameters (never the API key) and
+# evicted least-recently-used once the directory grows past its byte budget.
+CACHE_DIR = os.getenv("YOUTUBE_CACHE_DIR", os.path.join(".cache", "youtube"))
+CACHE_MAX_BYTES = int(os.getenv("YOUTUBE_CACHE_MAX_MB", "256")) * 1024 * 1024
+CACHE_ENABLED = os.getenv("YOUTUBE_RESPONSE_CACHE", "1") != "0"
+CACHEABLE_METHODS = {
+    "youtube.channels.list",
+    "youtube.playlists.list",
+}
+IGNORED_PARAMS = {"key", "alt", "prettyPrint"}
+
+class ResponseCache:
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 methods: set = CACHEABLE_METHODS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.methods = set(methods)
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key_for(self, request) -> str:
+        if request.method != "GET" or request.methodId not in self.methods:
+            return None
+        params = sorted((k, v) for k, v in parse_qsl(urlparse(request.uri).query) if k not in IGNORED_PARAMS)
+        return hashlib.sha256(f"{request.methodId}?{urlencode(params)}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> dict:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used for eviction
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, etag: str, body: dict):
+        path = self._path(key)
+        data = json.dumps({"etag": etag, "body": body}).encode("utf-8")
+        with self._lock:
+            total = self._current_size()
+            try:
+                total -= os.path.getsize(path)
+            except OSError:
+                pass
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total_bytes = total + len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _current_size(self) -> int:
+        if self._total_bytes is None:
+            self._total_bytes = sum(e.stat().st_size for e in os.scandir(self.directory)
+                                    if e.name.endswith(".json"))
+        return self._total_bytes
+
+    # Drop least-recently-used entries until the cache is back under 90% of its budget
+    def _evict(self):
+        entries = sorted(
+            (e for e in os.scandir(self.directory) if e.name.endswith(".json")),
+            key=lambda e: e.stat().st_mtime
+        )
+        target = int(self.max_bytes * 0.9)
+        for entry in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+            self._total_bytes = 0
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> ResponseCache:
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
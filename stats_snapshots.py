@@ -0,0 +1,331 @@
+from datetime import datetime, date, timedelta, timezone
+import threading
+import sys
+import os
+
+from bulk_writer import bulk_upsert, dialect_of
+from channel_stats import _upsert_clause
+
+# Append-only history of video statistics. Every write path that overwrites
+# videos.views/likes/comment_count also appends (video_id, captured_at, views,
+# likes, comments) here. The raw table is range-partitioned by month; once a
+# month is older than SNAPSHOT_RAW_DAYS its rows are downsampled to one row per
+# video and day (video_stats_daily) and the partition is dropped. Channel totals
+# are kept per day in channel_stats_daily as snapshots arrive, so growth curves
+# read a handful of primary-key rows instead of scanning the snapshots.
+SNAPSHOT_RAW_DAYS = int(os.getenv("SNAPSHOT_RAW_DAYS", "35"))
+SNAPSHOT_PARTITIONS_AHEAD = int(os.getenv("SNAPSHOT_PARTITIONS_AHEAD", "2"))
+SNAPSHOT_TABLE = "video_stats_snapshots"
+SNAPSHOT_COLUMNS = ["video_id", "captured_at", "views", "likes", "comments"]
+CHANNEL_STATS_CHUNK = 500
+
+# PostgreSQL: declarative partitions, one child table per month
+# MySQL: RANGE COLUMNS partitions pYYYYMM plus a catch-all p_future
+SNAPSHOT_TABLE_QUERIES = {
+    "postgresql": f"""
+        CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+            video_id VARCHAR(255) NOT NULL,
+            captured_at TIMESTAMP NOT NULL,
+            views BIGINT DEFAULT 0,
+            likes BIGINT DEFAULT 0,
+            comments BIGINT DEFAULT 0,
+            PRIMARY KEY (video_id, captured_at)
+        ) PARTITION BY RANGE (captured_at);
+    """,
+    "mysql": f"""
+        CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+            video_id VARCHAR(255) NOT NULL,
+            captured_at DATETIME NOT NULL,
+            views BIGINT DEFAULT 0,
+            likes BIGINT DEFAULT 0,
+            comments BIGINT DEFAULT 0,
+            PRIMARY KEY (video_id, captured_at)
+        ) PARTITION BY RANGE COLUMNS (captured_at) (
+            PARTITION p_future VALUES LESS THAN (MAXVALUE)
+        );
+    """
+}
+
+# Portable DDL (valid on both MySQL and PostgreSQL)
+ROLLUP_TABLE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS video_stats_daily (
+        video_id VARCHAR(255) NOT NULL,
+        snapshot_date DATE NOT NULL,
+        views BIGINT DEFAULT 0,
+        likes BIGINT DEFAULT 0,
+        comments BIGINT DEFAULT 0,
+        PRIMARY KEY (video_id, snapshot_date)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS channel_stats_daily (
+        channel_id VARCHAR(255) NOT NULL,
+        snapshot_date DATE NOT NULL,
+        video_count INT DEFAULT 0,
+        views BIGINT DEFAULT 0,
+        likes BIGINT DEFAULT 0,
+        comments BIGINT DEFAULT 0,
+        PRIMARY KEY (channel_id, snapshot_date)
+    );
+    """
+]
+
+CHANNEL_DAILY_QUERY = """
+    INSERT INTO channel_stats_daily (channel_id, snapshot_date, video_count, views, likes, comments)
+    SELECT channel_id, %s, COUNT(*), COALESCE(SUM(views), 0), COALESCE(SUM(likes), 0), COALESCE(SUM(comment_count), 0)
+    FROM videos
+    WHERE channel_id IN ({placeholders})
+    GROUP BY channel_id
+"""
+
+# Last value of each day (counters only grow, so MAX is the day's last reading)
+DOWNSAMPLE_QUERY = f"""
+    INSERT INTO video_stats_daily (video_id, snapshot_date, views, likes, comments)
+    SELECT video_id, CAST(captured_at AS DATE), MAX(views), MAX(likes), MAX(comments)
+    FROM {SNAPSHOT_TABLE}
+    WHERE captured_at < %s
+    GROUP BY video_id, CAST(captured_at AS DATE)
+"""
+
+# Months whose PostgreSQL partition is known to be committed. Only added to after
+# a commit: a rolled-back CREATE TABLE ... PARTITION OF must be checked again.
+_known_months = set()
+_months_lock = threading.Lock()
+
+def _month_start(day) -> date:
+    return date(day.year, day.month, 1)
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def _partition_name(connection, month: date) -> str:
+    suffix = f"p{month:%Y%m}"
+    return f"{SNAPSHOT_TABLE}_{suffix}" if dialect_of(connection) == "postgresql" else suffix
+
+def now_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+# (partition name, first day of its month), oldest first
+def list_partitions(connection) -> list:
+    cursor = connection.cursor()
+    try:
+        if dialect_of(connection) == "postgresql":
+            cursor.execute("""
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = %s
+            """, (SNAPSHOT_TABLE,))
+        else:
+            cursor.execute("""
+                SELECT partition_name FROM information_schema.partitions
+                WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+            """, (SNAPSHOT_TABLE,))
+        names = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+    partitions = []
+    for name in names:
+        suffix = name.rsplit("_p", 1)[-1] if "_p" in name else name[1:]
+        if suffix.isdigit() and len(suffix) == 6:
+            partitions.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+# Make sure monthly partitions exist from `start`'s month through `months` months
+# ahead. On MySQL new months are split off p_future, so only months after the
+# newest existing partition can be added (older rows already live in p_future's
+# predecessors). PostgreSQL DDL joins the caller's transaction; with commit=True
+# it is committed here and the months are remembered for record_snapshots.
+def ensure_partitions(connection, start=None, months: int = SNAPSHOT_PARTITIONS_AHEAD, commit: bool = False) -> list:
+    month = _month_start(start or now_utc())
+    wanted = [month]
+    for _ in range(months):
+        wanted.append(_next_month(wanted[-1]))
+
+    existing = {m for _, m in list_partitions(connection)}
+    created = []
+    cursor = connection.cursor()
+    try:
+        if dialect_of(connection) == "postgresql":
+            for month in wanted:
+                if month not in existing:
+                    cursor.execute(
+                        f"CREATE TABLE IF NOT EXISTS {_partition_name(connection, month)} PARTITION OF {SNAPSHOT_TABLE} "
+                        f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+                    )
+                    created.append(month)
+        else:
+            newest = max(existing) if existing else None
+            new = [m for m in wanted if newest is None or m > newest]
+            if new:
+                parts = ", ".join(f"PARTITION {_partition_name(connection, m)} VALUES LESS THAN ('{_next_month(m)}')"
+                                  for m in new)
+                cursor.execute(f"ALTER TABLE {SNAPSHOT_TABLE} REORGANIZE PARTITION p_future INTO "
+                               f"({parts}, PARTITION p_future VALUES LESS THAN (MAXVALUE))")
+                created.extend(new)
+    finally:
+        cursor.close()
+    if commit:
+        connection.commit()
+        with _months_lock:
+            _known_months.update(wanted)
+    return created
+
+def create_snapshot_tables(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(SNAPSHOT_TABLE_QUERIES[dialect_of(connection)])
+        for query in ROLLUP_TABLE_QUERIES:
+            cursor.execute(query)
+    finally:
+        cursor.close()
+    ensure_partitions(connection, commit=True)
+
+# (video_id, views, likes, comments) from parse_video_details rows (parsers.VIDEO_COLUMNS)
+def video_stat_rows(videos) -> list:
+    return [(row[0], row[8], row[13], row[9]) for row in videos]
+
+# Append one snapshot per video, all stamped with the same captured_at, and
+# refresh the day's channel totals for `channel_ids`. PostgreSQL partitions for a
+# new month are created on the fly; MySQL rows fall into p_future until the
+# maintenance job below splits it. With commit=False the caller owns the transaction,
+# so a partition created here is not remembered and the next call checks again.
+def record_snapshots(connection, stats, channel_ids: list = None, captured_at: datetime = None,
+                     commit: bool = True) -> int:
+    captured_at = captured_at or now_utc()
+    rows = [(video_id, captured_at, views or 0, likes or 0, comments or 0)
+            for video_id, views, likes, comments in stats]
+    if not rows:
+        return 0
+
+    month = _month_start(captured_at)
+    unknown = False
+    if dialect_of(connection) == "postgresql":
+        with _months_lock:
+            unknown = month not in _known_months
+        if unknown:
+            ensure_partitions(connection, captured_at, months=0)
+    result = bulk_upsert(connection, SNAPSHOT_TABLE, SNAPSHOT_COLUMNS, rows, ["video_id", "captured_at"],
+                         update_columns=[], commit=commit)
+    if channel_ids:
+        record_channel_totals(connection, channel_ids, captured_at.date(), commit=commit)
+    if unknown and commit:
+        with _months_lock:
+            _known_months.add(month)
+    return result["rows"]
+
+# Upsert today's (or `day`'s) totals of these channels from the videos table
+def record_channel_totals(connection, channel_ids: list, day: date = None, commit: bool = True):
+    channel_ids = list(dict.fromkeys(c for c in channel_ids if c))
+    if not channel_ids:
+        return
+    day = day or now_utc().date()
+    cursor = connection.cursor()
+    try:
+        for i in range(0, len(channel_ids), CHANNEL_STATS_CHUNK):
+            chunk = channel_ids[i:i + CHANNEL_STATS_CHUNK]
+            cursor.execute(
+                CHANNEL_DAILY_QUERY.format(placeholders=", ".join(["%s"] * len(chunk)))
+                + _upsert_clause(connection, ["video_count", "views", "likes", "comments"], "channel_id, snapshot_date"),
+                [day] + chunk
+            )
+        if commit:
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# INSERT ... SELECT one snapshot per row of `videos` matching `where` (e.g.
+# "WHERE channel_id = %s"); no commit, the caller owns the transaction
+def append_from_videos(cursor, connection, captured_at: datetime, where: str = "", params=()) -> int:
+    select = (f"SELECT video_id, %s, COALESCE(views, 0), COALESCE(likes, 0), COALESCE(comment_count, 0) "
+              f"FROM videos {where}")
+    if dialect_of(connection) == "postgresql":
+        query = f"INSERT INTO {SNAPSHOT_TABLE} ({', '.join(SNAPSHOT_COLUMNS)}) {select} ON CONFLICT DO NOTHING"
+    else:
+        query = f"INSERT IGNORE INTO {SNAPSHOT_TABLE} ({', '.join(SNAPSHOT_COLUMNS)}) {select}"
+    cursor.execute(query, [captured_at] + list(params))
+    return cursor.rowcount
+
+# Set-based snapshot of every video (optionally only these channels) as stored right now
+def capture_from_videos(connection, channel_ids: list = None) -> int:
+    captured_at = now_utc()
+    if dialect_of(connection) == "postgresql":
+        ensure_partitions(connection, captured_at, months=0)
+    where, params = "", []
+    if channel_ids is not None:
+        where = f"WHERE channel_id IN ({', '.join(['%s'] * len(channel_ids))})"
+        params = list(channel_ids)
+    cursor = connection.cursor()
+    try:
+        count = append_from_videos(cursor, connection, captured_at, where, params)
+        if channel_ids is None:
+            cursor.execute("SELECT DISTINCT channel_id FROM videos")
+            channel_ids = [row[0] for row in cursor.fetchall()]
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    record_channel_totals(connection, channel_ids, captured_at.date())
+    return count
+
+# Retention: every month partition that ends before today - raw_days is rolled up
+# into video_stats_daily and dropped. Safe to rerun; the rollup is idempotent.
+def downsample(connection, raw_days: int = SNAPSHOT_RAW_DAYS) -> list:
+    cutoff = now_utc().date() - timedelta(days=raw_days)
+    dropped = []
+    for name, month in list_partitions(connection):
+        upper = _next_month(month)
+        if upper > cutoff:
+            break
+        cursor = connection.cursor()
+        try:
+            cursor.execute(DOWNSAMPLE_QUERY + _upsert_clause(connection, ["views", "likes", "comments"],
+                                                             "video_id, snapshot_date"), (upper,))
+            connection.commit()
+            if dialect_of(connection) == "postgresql":
+                cursor.execute(f"DROP TABLE {name}")
+            else:
+                cursor.execute(f"ALTER TABLE {SNAPSHOT_TABLE} DROP PARTITION {name}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        dropped.append(name)
+    return dropped
+
+# ---------------------- Growth curves ----------------------
+# Both read by primary-key prefix: daily rollups for the downsampled past, raw
+# snapshots for the retained window.
+VIDEO_GROWTH_QUERY = f"""
+    SELECT snapshot_date AS captured_at, views, likes, comments
+    FROM video_stats_daily WHERE video_id = %s
+    UNION ALL
+    SELECT captured_at, views, likes, comments
+    FROM {SNAPSHOT_TABLE} WHERE video_id = %s
+    ORDER BY captured_at
+"""
+
+CHANNEL_GROWTH_QUERY = """
+    SELECT snapshot_date, video_count, views, likes, comments
+    FROM channel_stats_daily WHERE channel_id = %s
+    ORDER BY snapshot_date
+"""
+
+def video_growth_query(video_id: str) -> tuple:
+    return VIDEO_GROWTH_QUERY, (video_id, video_id)
+
+def channel_growth_query(channel_id: str) -> tuple:
+    return CHANNEL_GROWTH_QUERY, (channel_id,)
+
+# Maintenance, run daily (cron); same as `python harvester.py snapshots [--capture]`
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(["snapshots", *sys.argv[1:]]))
@@ -0,0 +1,51 @@
+from uuid import uuid4
+import pandas as pd
+import os
+
+from bulk_writer import dialect_of
+
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "10000"))
+
+# Build a DataFrame column by column from row tuples (no per-row dicts).
+# Columns are keyed by position so duplicate names from joins survive.
+def frame_from_rows(rows: list, columns: list) -> pd.DataFrame:
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame({i: values for i, values in enumerate(zip(*rows))})
+    df.columns = columns
+    return df
+
+def _open_cursor(connection, server_side: bool):
+    if not server_side:
+        return connection.cursor()
+    if dialect_of(connection) == "postgresql":
+        # Named cursor = server-side; rows arrive `itersize` at a time
+        return connection.cursor(name=f"stream_{uuid4().hex}")
+    return connection.cursor(buffered=False)
+
+# Yield the result of `query` as DataFrames of at most chunk_size rows.
+# With server_side=True only one chunk of raw rows is held in memory at a time.
+def iter_frames(connection, query: str, params=None, chunk_size: int = STREAM_CHUNK_ROWS, server_side: bool = True):
+    cursor = _open_cursor(connection, server_side)
+    if server_side and hasattr(cursor, "itersize"):
+        cursor.itersize = chunk_size
+    try:
+        cursor.execute(query, params if params else ())
+        first = True
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+            if rows or first:
+                yield frame_from_rows(rows, columns)
+            first = False
+            if len(rows) < chunk_size:
+                break
+    finally:
+        cursor.close()
+
+def read_frame(connection, query: str, params=None, chunk_size: int = STREAM_CHUNK_ROWS,
+               server_side: bool = False) -> pd.DataFrame:
+    frames = list(iter_frames(connection, query, params, chunk_size, server_side))
+    if not frames:
+        return pd.DataFrame()
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
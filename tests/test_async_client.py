@@ -0,0 +1,180 @@
+from googleapiclient.errors import HttpError
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import threading
+import asyncio
+import json
+import time
+
+import pytest
+
+from key_pool import KeyPool, KeyPoolExhausted
+from rate_limiter import RateLimiter
+import async_client
+import raw_journal
+
+# AsyncYouTubeClient against a local aiohttp server standing in for the YouTube API.
+# handler(request, calls) returns a web.Response; every request is also recorded
+# in `calls` as (path, query params, client port).
+
+def api_error(status: int, reason: str, headers: dict = None) -> web.Response:
+    body = {"error": {"code": status, "errors": [{"reason": reason}], "message": reason}}
+    return web.json_response(body, status=status, headers=headers)
+
+def comment_thread(comment_id: str, video_id: str) -> dict:
+    return {
+        "id": comment_id,
+        "snippet": {
+            "videoId": video_id,
+            "channelId": "UC1",
+            "topLevelComment": {"id": comment_id, "snippet": {
+                "textDisplay": f"text {comment_id}", "authorDisplayName": "author",
+                "publishedAt": "2024-01-02T03:04:05Z", "likeCount": 3
+            }}
+        }
+    }
+
+def run_client(handler, coroutine, keys=("key-1", "key-2")):
+    calls = []
+    key_pool = KeyPool(list(keys))
+
+    async def endpoint(request):
+        calls.append((request.path, dict(request.query), request.transport.get_extra_info("peername")[1]))
+        return handler(request, calls)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/youtube/v3/{resource}", endpoint)
+        async with TestServer(app) as server:
+            client = async_client.AsyncYouTubeClient(
+                key_pool=key_pool, base_url=str(server.make_url("/youtube/v3")), concurrency=4,
+                limiter=RateLimiter(rate=1000, burst=1000, max_rate=1000)
+            )
+            async with client:
+                return await coroutine(client)
+
+    return asyncio.run(main()), calls, key_pool
+
+@pytest.fixture(autouse=True)
+def no_journal(monkeypatch):
+    monkeypatch.setattr(raw_journal, "get_journal", lambda: None)
+
+def test_quota_exceeded_rotates_to_the_next_key():
+    def handler(request, calls):
+        if request.query["key"] == "key-1":
+            return api_error(403, "quotaExceeded")
+        return web.json_response({"items": [{"id": "v1"}]})
+
+    result, calls, key_pool = run_client(handler, lambda client: client.request("videos", part="id", id="v1"))
+
+    assert result == {"items": [{"id": "v1"}]}
+    assert [query["key"] for _, query, _ in calls] == ["key-1", "key-2"]
+    assert key_pool.remaining("key-1") == 0
+    assert key_pool.remaining("key-2") == key_pool.daily_quota - 1
+
+def test_all_keys_exhausted_raises():
+    def handler(request, calls):
+        return api_error(403, "quotaExceeded")
+
+    with pytest.raises(KeyPoolExhausted):
+        run_client(handler, lambda client: client.request("videos", part="id", id="v1"))
+
+def test_retry_after_is_honoured_and_charged_once():
+    def handler(request, calls):
+        if len(calls) == 1:
+            return api_error(429, "rateLimitExceeded", headers={"Retry-After": "1"})
+        return web.json_response({"items": []})
+
+    async def timed(client):
+        started = time.monotonic()
+        await client.request("videos", part="id", id="v1")
+        return time.monotonic() - started, client.limiter.throttles
+
+    (elapsed, throttles), calls, key_pool = run_client(handler, timed, keys=("key-1",))
+
+    assert len(calls) == 2
+    assert elapsed >= 0.9
+    assert throttles == 1
+    # The retry reuses the reservation instead of charging the call twice
+    assert key_pool.remaining("key-1") == key_pool.daily_quota - 1
+
+def test_non_retryable_error_raises_http_error():
+    def handler(request, calls):
+        return api_error(404, "videoNotFound")
+
+    with pytest.raises(HttpError) as info:
+        run_client(handler, lambda client: client.request("videos", part="id", id="v1"))
+    assert info.value.resp.status == 404
+
+def test_connections_are_reused():
+    def handler(request, calls):
+        return web.json_response({"items": []})
+
+    async def sequential(client):
+        for _ in range(5):
+            await client.request("videos", part="id", id="v1")
+
+    _, calls, _ = run_client(handler, sequential)
+
+    assert len(calls) == 5
+    assert len({port for _, _, port in calls}) == 1
+
+def test_video_comments_match_the_sync_fetcher_shape():
+    def handler(request, calls):
+        if request.query.get("pageToken") == "p2":
+            return web.json_response({"items": [comment_thread("c3", "v1")]})
+        return web.json_response({"items": [comment_thread("c1", "v1"), comment_thread("c2", "v1")],
+                                  "nextPageToken": "p2"})
+
+    comments, calls, _ = run_client(handler, lambda client: client.get_video_comments("v1"))
+
+    assert [c["Comment_Id"] for c in comments] == ["c1", "c2", "c3"]
+    assert comments[0] == {
+        "Comment_Id": "c1", "Video_Id": "v1", "Comment_Text": "text c1", "Author": "author",
+        "Published_Date": "2024-01-02 03:04:05", "Likes": 3, "Channel_Id": "UC1"
+    }
+
+def test_video_comments_are_trimmed_to_max_comments():
+    def handler(request, calls):
+        return web.json_response({"items": [comment_thread(f"c{i}", "v1") for i in range(3)], "nextPageToken": "p2"})
+
+    comments, calls, _ = run_client(handler, lambda client: client.get_video_comments("v1", max_comments=2))
+
+    assert len(comments) == 2
+    assert len(calls) == 1
+
+def test_comments_disabled_returns_no_comments():
+    def handler(request, calls):
+        return api_error(403, "commentsDisabled")
+
+    comments, _, _ = run_client(handler, lambda client: client.get_comments(["v1"]))
+
+    assert comments == {"v1": []}
+
+def test_other_403_errors_are_raised():
+    def handler(request, calls):
+        return api_error(403, "forbidden")
+
+    with pytest.raises(HttpError):
+        run_client(handler, lambda client: client.get_video_comments("v1"))
+
+def test_journal_appends_run_off_the_event_loop(monkeypatch):
+    appended = []
+
+    class Journal:
+        def append(self, method_id, params, body):
+            appended.append((method_id, params, body, threading.current_thread()))
+
+    monkeypatch.setattr(raw_journal, "get_journal", lambda: Journal())
+
+    def handler(request, calls):
+        return web.json_response({"items": [{"id": "v1"}]})
+
+    _, _, _ = run_client(handler, lambda client: client.request("videos", part="id", id="v1"))
+
+    assert len(appended) == 1
+    method_id, params, body, thread = appended[0]
+    assert method_id == "youtube.videos.list"
+    assert "key" not in params and params["id"] == "v1"
+    assert json.dumps(body) == json.dumps({"items": [{"id": "v1"}]})
+    assert thread is not threading.main_thread()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import raw_journal
+
+def read_back(directory) -> list:
+    return [(record["method"], record["params"]) for record in raw_journal.iter_records(str(directory))]
+
+def test_records_are_written_within_the_flush_interval(tmp_path):
+    journal = raw_journal.RawJournal(str(tmp_path), flush_records=1000, flush_seconds=0.1)
+    journal.append("youtube.videos.list", {"id": "v1", "key": "secret"}, {"items": []})
+
+    deadline = time.monotonic() + 5
+    while not read_back(tmp_path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert read_back(tmp_path) == [("youtube.videos.list", {"id": "v1"})]
+
+def test_full_buffer_is_written_without_waiting_for_the_interval(tmp_path):
+    journal = raw_journal.RawJournal(str(tmp_path), flush_records=3, flush_seconds=3600)
+    for i in range(3):
+        journal.append("youtube.videos.list", {"id": f"v{i}"}, {"items": []})
+
+    deadline = time.monotonic() + 5
+    while len(read_back(tmp_path)) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert [params["id"] for _, params in read_back(tmp_path)] == ["v0", "v1", "v2"]
+
+def test_concurrent_appends_keep_every_record(tmp_path):
+    journal = raw_journal.RawJournal(str(tmp_path), flush_records=7, flush_seconds=0.05)
+
+    def append(worker):
+        for i in range(50):
+            journal.append("youtube.videos.list", {"id": f"{worker}-{i}"}, {"items": []})
+
+    threads = [threading.Thread(target=append, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.flush()
+
+    ids = [params["id"] for _, params in read_back(tmp_path)]
+    assert sorted(ids) == sorted(f"{worker}-{i}" for worker in range(4) for i in range(50))
@@ -0,0 +1,46 @@
+from datetime import datetime
+import os
+
+import pytest
+
+import stats_snapshots
+
+# Partition handling of video_stats_snapshots on a local PostgreSQL database
+# (HARVEST_TEST_PG_DSN, as in test_worker_processes.py)
+DSN = os.getenv("HARVEST_TEST_PG_DSN")
+
+pytestmark = pytest.mark.skipif(not DSN, reason="HARVEST_TEST_PG_DSN is not set")
+
+@pytest.fixture
+def connection():
+    import psycopg2
+    connection = psycopg2.connect(DSN)
+    stats_snapshots.create_snapshot_tables(connection)
+    yield connection
+    connection.rollback()
+    connection.close()
+
+def drop_partition(connection, month: datetime):
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {stats_snapshots.SNAPSHOT_TABLE}_p{month:%Y%m}")
+    connection.commit()
+    cursor.close()
+
+def test_rolled_back_partition_is_created_again(connection):
+    captured_at = datetime(2031, 5, 6, 7, 8, 9)
+    drop_partition(connection, captured_at)
+    stats_snapshots._known_months.discard(stats_snapshots._month_start(captured_at))
+    try:
+        # Inside a caller's transaction that is then rolled back (e.g. a job that lost its lease)
+        stats_snapshots.record_snapshots(connection, [("v-partition", 1, 2, 3)], captured_at=captured_at, commit=False)
+        connection.rollback()
+
+        assert stats_snapshots.record_snapshots(connection, [("v-partition", 4, 5, 6)], captured_at=captured_at) == 1
+        assert stats_snapshots._month_start(captured_at) in stats_snapshots._known_months
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT views FROM {stats_snapshots.SNAPSHOT_TABLE} WHERE video_id = 'v-partition'")
+        assert cursor.fetchall() == [(4,)]
+        cursor.close()
+    finally:
+        drop_partition(connection, captured_at)
+        stats_snapshots._known_months.discard(stats_snapshots._month_start(captured_at))
@@ -0,0 +1,140 @@
+from uuid import uuid4
+import subprocess
+import signal
+import time
+import sys
+import os
+
+import pytest
+
+# Several `harvester.py harvest` worker processes sharing one run against a local
+# PostgreSQL database, with the YouTube API replaced by FakeApi. One worker is
+# killed while it holds leases; the others must finish the run, re-claiming its
+# jobs once their leases expire. Set HARVEST_TEST_PG_DSN (e.g.
+# "dbname=harvest_test host=localhost") to run it; the schema is created there.
+DSN = os.getenv("HARVEST_TEST_PG_DSN")
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 3
+CHANNELS = 4
+PLAYLIST_PAGES = 3
+
+pytestmark = pytest.mark.skipif(not DSN, reason="HARVEST_TEST_PG_DSN is not set")
+
+class FakeRequest:
+    def __init__(self, resource: str, params: dict):
+        self.resource = resource
+        self.params = params
+
+class FakeResource:
+    def __init__(self, name: str):
+        self.name = name
+
+    def list(self, **params):
+        return FakeRequest(self.name, params)
+
+class FakeYouTube:
+    def __getattr__(self, name):
+        return lambda: FakeResource(name)
+
+def video_item(video_id: str) -> dict:
+    return {
+        "id": video_id,
+        "snippet": {"channelId": video_id.rsplit("-", 2)[0], "title": f"Video {video_id}",
+                    "thumbnails": {"high": {"url": "https://example.com/t.jpg"}}, "publishedAt": "2024-01-02T03:04:05Z"},
+        "contentDetails": {"duration": "PT1M", "definition": "hd", "caption": "false"},
+        "statistics": {"viewCount": "10", "likeCount": "1", "commentCount": "0"}
+    }
+
+# Stands in for key_pool.get_pool(): answers channels/playlistItems/videos.list after `delay` seconds
+class FakeApi:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def execute(self, build):
+        request = build(FakeYouTube())
+        time.sleep(self.delay)
+        params = request.params
+        if request.resource == "channels":
+            return {"items": [{"id": params["id"], "snippet": {"title": f"Channel {params['id']}"},
+                               "contentDetails": {"relatedPlaylists": {"uploads": "UU" + params["id"]}}}]}
+        if request.resource == "playlistItems":
+            page = int(params.get("pageToken") or 0)
+            items = [{"contentDetails": {"videoId": f"{params['playlistId'][2:]}-{page}-{i}"}} for i in range(50)]
+            return {"items": items, **({"nextPageToken": str(page + 1)} if page + 1 < PLAYLIST_PAGES else {})}
+        if request.resource == "videos":
+            return {"items": [video_item(video_id) for video_id in params["id"].split(",")]}
+        raise AssertionError(f"unexpected {request.resource}.list call")
+
+def harvester_process(delay: float, *argv: str) -> subprocess.Popen:
+    env = dict(os.environ, JOB_LEASE_SECONDS="2", JOB_POLL_INTERVAL="0.2")
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), str(delay), *argv], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+def wait_for(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.1)
+
+def fetch(connection, query: str, params=()) -> list:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        connection.commit()
+        return rows
+    finally:
+        cursor.close()
+
+def test_killed_worker_jobs_are_finished_by_the_others():
+    import psycopg2
+
+    init = harvester_process(0, "init-schema", "--db", "postgresql")
+    output, _ = init.communicate(timeout=120)
+    assert init.returncode == 0, output
+
+    run_id = f"test-{uuid4().hex[:8]}"
+    channel_ids = [f"ch{uuid4().hex[:8]}" for _ in range(CHANNELS)]
+    harvest = ["harvest", "--db", "postgresql", "--run", run_id, "--concurrency", "2", "--no-comments", *channel_ids]
+    connection = psycopg2.connect(DSN)
+    try:
+        # The doomed worker hangs inside its first API calls, holding their leases
+        doomed = harvester_process(3600, *harvest)
+        wait_for(lambda: fetch(connection, "SELECT 1 FROM harvest_jobs WHERE run_id = %s AND lease_owner LIKE %s",
+                               (run_id, f"%-{doomed.pid}-%")))
+        workers = [harvester_process(0.02, *harvest) for _ in range(WORKERS - 1)]
+        doomed.send_signal(signal.SIGKILL)
+        doomed.communicate(timeout=30)
+
+        for worker in workers:
+            output, _ = worker.communicate(timeout=180)
+            assert worker.returncode == 0, output
+
+        jobs = fetch(connection, "SELECT kind, status, attempts FROM harvest_jobs WHERE run_id = %s", (run_id,))
+        assert len(jobs) == CHANNELS * (1 + 2 * PLAYLIST_PAGES)
+        assert {status for _, status, _ in jobs} == {"done"}
+        assert max(attempts for _, _, attempts in jobs) <= 2
+        # The killed worker's jobs were re-claimed after their leases expired
+        assert any(attempts == 2 for _, _, attempts in jobs)
+        videos = fetch(connection, f"SELECT COUNT(*) FROM videos WHERE channel_id IN ({', '.join(['%s'] * CHANNELS)})",
+                       channel_ids)
+        assert videos[0][0] == CHANNELS * PLAYLIST_PAGES * 50
+    finally:
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM harvest_jobs WHERE run_id = %s", (run_id,))
+        cursor.execute(f"DELETE FROM channels WHERE channel_id IN ({', '.join(['%s'] * CHANNELS)})", channel_ids)
+        connection.commit()
+        connection.close()
+
+# Worker process: `python test_worker_processes.py DELAY harvester-args...`
+if __name__ == "__main__":
+    sys.path.insert(0, REPO)
+    import psycopg2
+    import db_pool
+    import job_queue
+    import harvester
+
+    db_pool.connect_postgres = lambda: psycopg2.connect(DSN)
+    fake_api = FakeApi(float(sys.argv[1]))
+    job_queue.get_pool = lambda: fake_api
+    sys.exit(harvester.main(sys.argv[2:]))
@@ -1,125 +1,149 @@
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import streamlit as st
+from mysql.connector import Error
+from datetime import datetime
+import mysql.connector
+from api_client import get_client
+from key_pool import get_pool
+from comments import iter_comment_pages, harvest_comments, migrate_comment_channels, COMMENT_PROGRESS_TABLE_QUERY
+from bulk_writer import bulk_upsert, dialect_of
+from db_pool import get_mysql_pool
+from channel_stats import SUMMARY_TABLE_QUERIES, refresh_channel_stats
+from indexes import apply_index_migrations
+from stats_snapshots import create_snapshot_tables, record_snapshots, video_stat_rows
+from discovery import discover_video_ids, walk_uploads, remember_uploads_playlist
+from parsers import channel_info, comment_info, parse_video_details, VIDEO_COLUMNS, PLAYLIST_COLUMNS
+import sys
 import os
 
 # Secure API Key (Store in Environment Variable)
 API_KEY = os.getenv("YOUTUBE_API_KEY")
-YOUTUBE_SERVICE_NAME = "youtube"
-YOUTUBE_API_VERSION = "v3"
 
-# Initialize YouTube API
+# Initialize YouTube API (built on first use and shared by the whole process)
 def api_connect():
     if not API_KEY:
         raise ValueError("Missing YouTube API Key. Set it as an environment variable.")
-    return build(YOUTUBE_SERVICE_NAME, YOUTUBE_API_VERSION, developerKey=API_KEY)
+    return get_client(API_KEY)
 
-youtube = api_connect()
+# `youtube.youtube` still works, but the client is only built when first used,
+# so importing this module does no API or discovery work
+def __getattr__(name):
+    if name == "youtube":
+        return api_connect()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# The fetchers below report an HttpError for one call and return what they have.
+# KeyPoolExhausted (every API key out of quota) is never caught here: it
+# propagates so the caller stops the whole harvest instead of storing partial
+# results (incremental, harvest_engine and job_queue all handle it).
 
 # Fetch Channel Info
 def get_channel_info(channel_id: str) -> dict:
     try:
-        response = youtube.channels().list(
+        response = get_pool().execute(lambda yt: yt.channels().list(
             part="snippet,contentDetails,statistics",
             id=channel_id
-        ).execute()
+        ))
 
         if not response.get("items"):
             return {}
 
-        item = response["items"][0]
-        return {
-            "Channel_Name": item["snippet"]["title"],
-            "Channel_Id": item["id"],
-            "Subscribers": int(item["statistics"].get("subscriberCount", 0)),
-            "Views": int(item["statistics"].get("viewCount", 0)),
-            "Total_Videos": int(item["statistics"].get("videoCount", 0)),
-            "Channel_Description": item["snippet"].get("description", ""),
-            "Playlist_Id": item["contentDetails"]["relatedPlaylists"]["uploads"]
-        }
+        info = channel_info(response["items"][0])
+        remember_uploads_playlist(info["Channel_Id"], info["Playlist_Id"])
+        return info
     except HttpError as e:
         print(f"API Error: {e}")
         return {}
 
-# Fetch Video IDs
-def get_video_ids(channel_id: str) -> list:
+# Fetch Video IDs (uploads playlist, newest first). In incremental mode the walk
+# stops at the channel's high-water mark: the last known video ID or anything
+# published before `since` ('YYYY-MM-DD HH:MM:SS').
+def get_video_ids(channel_id: str, playlist_id: str = None, stop_at_video_id: str = None, since: str = None) -> list:
     try:
-        response = youtube.channels().list(
-            id=channel_id, part="contentDetails"
-        ).execute()
+        return walk_uploads(channel_id, playlist_id, stop_at_video_id, since)
+    except (HttpError, LookupError) as e:
+        print(f"API Error: {e}")
+        return []
 
-        playlist_id = response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-        video_ids, next_page_token = [], None
+# Batched Video Lookups (videos.list accepts up to 50 IDs per call)
+MAX_VIDEO_IDS_PER_REQUEST = 50
 
-        while True:
-            response = youtube.playlistItems().list(
-                part="snippet",
-                playlistId=playlist_id,
-                maxResults=50,
-                pageToken=next_page_token
-            ).execute()
+def chunked(items: list, size: int) -> list:
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
-            video_ids.extend(item["snippet"]["resourceId"]["videoId"] for item in response.get("items", []))
-            next_page_token = response.get("nextPageToken")
+def fetch_videos_batched(video_ids: list, parse_item, part: str = "snippet,contentDetails,statistics") -> tuple:
+    # Returns (records, missing_ids); IDs the API did not return (deleted,
+    # private, or part of a failed chunk) are reported in missing_ids.
+    records, missing_ids = [], []
+    unique_ids = list(dict.fromkeys(video_ids))
 
-            if not next_page_token:
-                break
+    for chunk in chunked(unique_ids, MAX_VIDEO_IDS_PER_REQUEST):
+        try:
+            response = get_pool().execute(lambda yt: yt.videos().list(
+                part=part,
+                id=",".join(chunk),
+                maxResults=len(chunk)
+            ))
+        except HttpError as e:
+            print(f"API Error for video batch starting at {chunk[0]}: {e}")
+            missing_ids.extend(chunk)
+            continue
 
-        return video_ids
-    except HttpError as e:
-        print(f"API Error: {e}")
-        return []
+        found_ids = set()
+        for item in response.get("items", []):
+            found_ids.add(item["id"])
+            record = parse_item(item)
+            if record:
+                records.append(record)
+        missing_ids.extend(video_id for video_id in chunk if video_id not in found_ids)
+
+    if missing_ids:
+        print(f"⚠️ {len(missing_ids)} video(s) missing or private: {', '.join(missing_ids[:10])}"
+              f"{' ...' if len(missing_ids) > 10 else ''}")
+
+    return records, missing_ids
 
 # Fetch Video Info
-def get_video_info(video_ids: list) -> list:
-    video_data = []
-    for video_id in video_ids:
-        try:
-            response = youtube.videos().list(
-                part="snippet,contentDetails,statistics",
-                id=video_id
-            ).execute()
-
-            for item in response.get("items", []):
-                video_data.append({
-                    "Channel_Name": item["snippet"]["channelTitle"],
-                    "Channel_Id": item["snippet"]["channelId"],
-                    "Video_Id": item["id"],
-                    "Title": item["snippet"]["title"],
-                    "Tags": item["snippet"].get("tags", []),
-                    "Thumbnail": item["snippet"]["thumbnails"],
-                    "Description": item["snippet"].get("description", ""),
-                    "Published_Date": item["snippet"]["publishedAt"],
-                    "Duration": item["contentDetails"]["duration"],
-                    "Views": int(item["statistics"].get("viewCount", 0)),
-                    "Comments": int(item["statistics"].get("commentCount", 0)),
-                    "Favorite_Count": int(item["statistics"].get("favoriteCount", 0)),
-                    "Definition": item["contentDetails"]["definition"],
-                    "Caption_Status": item["contentDetails"]["caption"]
-                })
-        except HttpError as e:
-            print(f"API Error for video {video_id}: {e}")
+def parse_video_info(item: dict) -> dict:
+    return {
+        "Channel_Name": item["snippet"]["channelTitle"],
+        "Channel_Id": item["snippet"]["channelId"],
+        "Video_Id": item["id"],
+        "Title": item["snippet"]["title"],
+        "Tags": item["snippet"].get("tags", []),
+        "Thumbnail": item["snippet"]["thumbnails"],
+        "Description": item["snippet"].get("description", ""),
+        "Published_Date": item["snippet"]["publishedAt"],
+        "Duration": item["contentDetails"]["duration"],
+        "Views": int(item["statistics"].get("viewCount", 0)),
+        "Comments": int(item["statistics"].get("commentCount", 0)),
+        "Favorite_Count": int(item["statistics"].get("favoriteCount", 0)),
+        "Definition": item["contentDetails"]["definition"],
+        "Caption_Status": item["contentDetails"]["caption"]
+    }
 
+def get_video_info(video_ids: list) -> list:
+    video_data, _ = fetch_videos_batched(video_ids, parse_video_info)
     return video_data
 
 # Fetch Comments
-def get_comment_info(video_ids: list) -> list:
+def get_comment_info(video_ids: list, max_per_video: int = None) -> list:
     comments_data = []
     for video_id in video_ids:
+        fetched = 0
         try:
-            response = youtube.commentThreads().list(
-                part="snippet",
-                videoId=video_id,
-                maxResults=50
-            ).execute()
-
-            comments_data.extend({
-                "Comment_Id": item["snippet"]["topLevelComment"]["id"],
-                "Video_Id": item["snippet"]["topLevelComment"]["snippet"]["videoId"],
-                "Comment_Text": item["snippet"]["topLevelComment"]["snippet"]["textDisplay"],
-                "Comment_Authors": item["snippet"]["topLevelComment"]["snippet"]["authorDisplayName"],
-                "Comment_Published": item["snippet"]["topLevelComment"]["snippet"]["publishedAt"]
-            } for item in response.get("items", []))
+            for items, _ in iter_comment_pages(video_id):
+                if max_per_video is not None:
+                    items = items[:max(max_per_video - fetched, 0)]
+                comments_data.extend({
+                    "Comment_Id": item["snippet"]["topLevelComment"]["id"],
+                    "Video_Id": item["snippet"]["topLevelComment"]["snippet"]["videoId"],
+                    "Comment_Text": item["snippet"]["topLevelComment"]["snippet"]["textDisplay"],
+                    "Comment_Authors": item["snippet"]["topLevelComment"]["snippet"]["authorDisplayName"],
+                    "Comment_Published": item["snippet"]["topLevelComment"]["snippet"]["publishedAt"]
+                } for item in items)
+                fetched += len(items)
+                if max_per_video is not None and fetched >= max_per_video:
+                    break
         except HttpError as e:
             print(f"API Error for video {video_id}: {e}")
 
@@ -127,17 +151,18 @@ def get_comment_info(video_ids: list) -> list:
 
 # Fetch Playlist Details
 def get_playlist_details(channel_id: str) -> list:
+    pool = get_pool()
     playlists = []
     next_page_token = None
 
     try:
         while True:
-            response = youtube.playlists().list(
+            response = pool.execute(lambda yt: yt.playlists().list(
                 part="snippet,contentDetails",
                 channelId=channel_id,
                 maxResults=50,
                 pageToken=next_page_token
-            ).execute()
+            ))
 
             playlists.extend({
                 "Playlist_Id": item["id"],
@@ -157,24 +182,167 @@ def get_playlist_details(channel_id: str) -> list:
     return playlists
 
 
-import os
-import mysql.connector
-from mysql.connector import Error
-
-# Secure Database Connection
+# Secure Database Connection (pooled; close() returns it to the shared MySQL pool)
 def db_connect():
     try:
-        return mysql.connector.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME", "ibi"),
-            port=os.getenv("DB_PORT", "3306")
-        )
+        return get_mysql_pool().getconn()
     except Error as err:
         print(f"Database Connection Error: {err}")
         return None
 
+# Warehouse tables (channels, videos, comments, playlists, ...) per dialect
+BASE_TABLE_QUERIES = {
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id VARCHAR(255) PRIMARY KEY,
+            channel_name VARCHAR(255) NOT NULL,
+            subscribers INT DEFAULT 0,
+            views BIGINT DEFAULT 0,
+            total_videos INT DEFAULT 0,
+            description TEXT NULL,
+            playlist_id VARCHAR(255) NULL
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS videos (
+            video_id VARCHAR(255) PRIMARY KEY,
+            channel_id VARCHAR(255) NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            tags TEXT NULL,
+            thumbnail TEXT NULL,
+            description TEXT NULL,
+            published_date DATETIME NOT NULL, 
+            duration INT DEFAULT 0, -- Store in seconds for easier calculations
+            views BIGINT DEFAULT 0,
+            comment_count INT DEFAULT 0, 
+            favorite_count INT DEFAULT 0,
+            likes BIGINT DEFAULT 0,
+            definition ENUM('hd', 'sd') NOT NULL,
+            caption_status ENUM('true', 'false') NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, -- change timestamp for migration.py
+            FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS comments (
+            comment_id VARCHAR(255) PRIMARY KEY,
+            video_id VARCHAR(255) NOT NULL,
+            comment_text TEXT NOT NULL,
+            comment_author VARCHAR(255) NOT NULL,
+            published_date DATETIME NOT NULL,
+            likes INT DEFAULT 0,
+            parent_id VARCHAR(255) NULL, -- Set for replies, NULL for top-level comments
+            channel_id VARCHAR(255) NULL, -- Channel of the video, for per-channel paging
+            FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS comment_progress (
+            video_id VARCHAR(255) PRIMARY KEY,
+            next_page_token TEXT NULL,
+            comments_fetched INT DEFAULT 0,
+            completed BOOLEAN DEFAULT FALSE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS playlists (
+            playlist_id VARCHAR(255) PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            channel_id VARCHAR(255) NOT NULL,
+            channel_name VARCHAR(255) NOT NULL,
+            published_at DATETIME NOT NULL,
+            video_count INT DEFAULT 0,
+            FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS channel_watermarks (
+            channel_id VARCHAR(255) PRIMARY KEY,
+            last_video_id VARCHAR(255) NOT NULL,
+            last_published_date DATETIME NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        );
+        """
+    ],
+    # Same tables for PostgreSQL: TIMESTAMP for DATETIME, CHECK constraints for the
+    # ENUMs; videos.updated_at is kept current by the trigger from migration.py
+    "postgresql": [
+        """
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id VARCHAR(255) PRIMARY KEY,
+            channel_name VARCHAR(255) NOT NULL,
+            subscribers INT DEFAULT 0,
+            views BIGINT DEFAULT 0,
+            total_videos INT DEFAULT 0,
+            description TEXT NULL,
+            playlist_id VARCHAR(255) NULL
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS videos (
+            video_id VARCHAR(255) PRIMARY KEY,
+            channel_id VARCHAR(255) NOT NULL REFERENCES channels(channel_id) ON DELETE CASCADE,
+            title VARCHAR(255) NOT NULL,
+            tags TEXT NULL,
+            thumbnail TEXT NULL,
+            description TEXT NULL,
+            published_date TIMESTAMP NOT NULL,
+            duration INT DEFAULT 0,
+            views BIGINT DEFAULT 0,
+            comment_count INT DEFAULT 0,
+            favorite_count INT DEFAULT 0,
+            likes BIGINT DEFAULT 0,
+            definition VARCHAR(2) NOT NULL CHECK (definition IN ('hd', 'sd')),
+            caption_status VARCHAR(5) NOT NULL CHECK (caption_status IN ('true', 'false')),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS comments (
+            comment_id VARCHAR(255) PRIMARY KEY,
+            video_id VARCHAR(255) NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+            comment_text TEXT NOT NULL,
+            comment_author VARCHAR(255) NOT NULL,
+            published_date TIMESTAMP NOT NULL,
+            likes INT DEFAULT 0,
+            parent_id VARCHAR(255) NULL,
+            channel_id VARCHAR(255) NULL
+        );
+        """,
+        COMMENT_PROGRESS_TABLE_QUERY,
+        """
+        CREATE TABLE IF NOT EXISTS playlists (
+            playlist_id VARCHAR(255) PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            channel_id VARCHAR(255) NOT NULL REFERENCES channels(channel_id) ON DELETE CASCADE,
+            channel_name VARCHAR(255) NOT NULL,
+            published_at TIMESTAMP NOT NULL,
+            video_count INT DEFAULT 0
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS channel_watermarks (
+            channel_id VARCHAR(255) PRIMARY KEY REFERENCES channels(channel_id) ON DELETE CASCADE,
+            last_video_id VARCHAR(255) NOT NULL,
+            last_published_date TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    ]
+}
+
+def create_base_tables(connection):
+    cursor = connection.cursor()
+    try:
+        for query in BASE_TABLE_QUERIES[dialect_of(connection)]:
+            cursor.execute(query)
+        connection.commit()
+    finally:
+        cursor.close()
+
 def create_tables():
     db_connection = db_connect()
     if not db_connection:
@@ -183,65 +351,20 @@ def create_tables():
     cursor = db_connection.cursor()
 
     try:
-        table_queries = [
-            """
-            CREATE TABLE IF NOT EXISTS channels (
-                channel_id VARCHAR(255) PRIMARY KEY,
-                channel_name VARCHAR(255) NOT NULL,
-                subscribers INT DEFAULT 0,
-                views BIGINT DEFAULT 0,
-                total_videos INT DEFAULT 0,
-                description TEXT NULL,
-                playlist_id VARCHAR(255) NULL
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS videos (
-                video_id VARCHAR(255) PRIMARY KEY,
-                channel_id VARCHAR(255) NOT NULL,
-                title VARCHAR(255) NOT NULL,
-                tags TEXT NULL,
-                thumbnail TEXT NULL,
-                description TEXT NULL,
-                published_date DATETIME NOT NULL, 
-                duration INT DEFAULT 0, -- Store in seconds for easier calculations
-                views BIGINT DEFAULT 0,
-                comment_count INT DEFAULT 0, 
-                favorite_count INT DEFAULT 0,
-                definition ENUM('hd', 'sd') NOT NULL,
-                caption_status ENUM('true', 'false') NOT NULL,
-                FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS comments (
-                comment_id VARCHAR(255) PRIMARY KEY,
-                video_id VARCHAR(255) NOT NULL,
-                comment_text TEXT NOT NULL,
-                comment_author VARCHAR(255) NOT NULL,
-                published_date DATETIME NOT NULL,
-                FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS playlists (
-                playlist_id VARCHAR(255) PRIMARY KEY,
-                title VARCHAR(255) NOT NULL,
-                channel_id VARCHAR(255) NOT NULL,
-                channel_name VARCHAR(255) NOT NULL,
-                published_at DATETIME NOT NULL,
-                video_count INT DEFAULT 0,
-                FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
-            );
-            """
-        ]
-        
-        for query in table_queries:
+        create_base_tables(db_connection)
+        for query in SUMMARY_TABLE_QUERIES:
             cursor.execute(query)
         
         db_connection.commit()
         print("✅ Tables created successfully!")
 
+        migrate_comment_channels(db_connection)
+        created = apply_index_migrations(db_connection)
+        if created:
+            print(f"✅ Indexes created: {', '.join(created)}")
+
+        create_snapshot_tables(db_connection)
+
     except Error as err:
         print(f"❌ Error executing query: {err}")
     
@@ -249,9 +372,6 @@ def create_tables():
         cursor.close()
         db_connection.close()
 
-if __name__ == "__main__":
-    create_tables()
-
 channel_ids = [
     "UC2J_VKrAzOEJuQvFFtj3KUw", # CSK
     "UCl23mvQ3321L7zO6JyzhVmg", # MI
@@ -266,8 +386,11 @@ channel_ids = [
 ]
 
 # Function to insert or update channel data
-def insert_channel_data(channel_data):
-    connection = db_connect()
+# Uses the caller's connection when one is given (and leaves it open)
+def insert_channel_data(channel_data, connection=None):
+    own_connection = connection is None
+    if own_connection:
+        connection = db_connect()
     if not connection:
         return
 
@@ -290,9 +413,9 @@ def insert_channel_data(channel_data):
             channel_data["Channel_Id"],
             channel_data["Channel_Name"],
             channel_data.get("Subscribers", 0),
-            channel_data.get("views", 0),
+            channel_data.get("Views", 0),
             channel_data.get("Total_Videos", 0),
-            channel_data.get("Channel_description", ""),
+            channel_data.get("Channel_Description", ""),
             channel_data.get("Playlist_Id", "")
         ))
 
@@ -306,171 +429,63 @@ def insert_channel_data(channel_data):
         print(f"❌ Unexpected error: {e}")
     finally:
         cursor.close()
-        connection.close()
+        if own_connection:
+            connection.close()
 
 
-import mysql.connector
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import datetime
-import isodate  # Fix for duration conversion
-import os
-
-# YouTube API Keys (Use Multiple to Avoid Quota Issues)
-api_keys = os.getenv("YOUTUBE_API_KEYS", "").split(',')
-
 # MySQL Connection
 def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD", ""),
-        database=os.getenv("DB_NAME", "ibi"),
-        port=os.getenv("DB_PORT", "3306")
-    )
+    return get_mysql_pool().getconn()
 
 # Function to Fetch Videos from YouTube API
 def get_videos(channel_id):
-    videos = []
-    for api_key in api_keys:
-        try:
-            youtube = build('youtube', 'v3', developerKey=api_key)
-
-            request = youtube.search().list(
-                part="id",
-                channelId=channel_id,
-                maxResults=50,
-                type="video"
-            )
-            response = request.execute()
-
-            for item in response.get("items", []):
-                video_id = item["id"]["videoId"]
-                video_details = get_video_details(youtube, video_id)
-                if video_details:
-                    videos.append(video_details)
-            
-            if videos:
-                return videos  # Return videos if data is fetched successfully
+    try:
+        # Latest 50 uploads (1 quota unit, versus 100 for the search.list call used before)
+        video_ids = discover_video_ids(channel_id, max_results=50)
+        videos, _ = get_video_details_batch(video_ids)
+        return videos
 
-        except HttpError as e:
-            if e.resp.status == 403:  # API quota exceeded
-                print(f"API Key quota exceeded. Trying the next API key...")
-                continue  # Try with the next API key
-            else:
-                print(f"Error fetching videos: {e}")
-                return []
+    except HttpError as e:
+        print(f"Error fetching videos: {e}")
+        return []
 
-    print("All API keys exceeded quota or failed.")
-    return []
+# Function to Fetch Video Details in Batches of 50
+def get_video_details_batch(video_ids):
+    return fetch_videos_batched(video_ids, parse_video_details)
 
 # Function to Fetch Video Details
-def get_video_details(youtube, video_id):
-    try:
-        request = youtube.videos().list(
-            part="snippet,contentDetails,statistics",
-            id=video_id
-        )
-        response = request.execute()
-        if not response["items"]:
-            return None
-
-        item = response["items"][0]
-        snippet = item["snippet"]
-        content_details = item["contentDetails"]
-        statistics = item.get("statistics", {})
-
-        # Extract Required Data
-        channel_id = snippet["channelId"]
-        title = snippet["title"]
-        tags = ", ".join(snippet.get("tags", []))  # Convert list to comma-separated string
-        thumbnail = snippet["thumbnails"]["high"]["url"]
-        description = snippet.get("description", "")
-        
-        # Convert Published Date Format
-        published_at = snippet["publishedAt"]
-        try:
-            published_date = datetime.datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%S.%fZ")
-        except ValueError:
-            published_date = datetime.datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
-        published_date = published_date.strftime('%Y-%m-%d %H:%M:%S')
-
-        # Convert Duration - Convert ISO 8601 to Seconds
-        duration_iso = content_details["duration"]
-        duration_seconds = int(isodate.parse_duration(duration_iso).total_seconds())
-
-        # Fix Missing View Counts - Default to 0
-        views = int(statistics.get("viewCount", 0))
-        comments = int(statistics.get("commentCount", 0))
-        favorite_count = int(statistics.get("favoriteCount", 0))
-        definition = content_details["definition"]
-        caption_status = content_details["caption"]
-
-        return (video_id, channel_id, title, tags, thumbnail, description, published_date, duration_seconds, 
-                views, comments, favorite_count, definition, caption_status)
-    
-    except HttpError as e:
-        print(f"Error fetching video details: {e}")
-        return None
+def get_video_details(video_id):
+    videos, _ = get_video_details_batch([video_id])
+    return videos[0] if videos else None
 
 # Function to Insert Videos into MySQL
-def insert_videos(videos):
+# Upsert video rows on the caller's connection; raises on database errors.
+# With commit=False the caller commits (e.g. together with the channel watermark).
+def store_videos(connection, videos, commit=True) -> dict:
+    return bulk_upsert(connection, "videos", VIDEO_COLUMNS, videos, ["video_id"],
+                       update_columns=[c for c in VIDEO_COLUMNS if c not in ("video_id", "channel_id")],
+                       commit=commit)
+
+# Returns True once the videos are stored
+def insert_videos(videos) -> bool:
     conn = get_db_connection()
-    cursor = conn.cursor()
-
-    insert_query = """
-        INSERT INTO videos (video_id, channel_id, title, tags, thumbnail, description, published_date, 
-                            duration, views, comment_count, favorite_count, definition, caption_status)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-            title=VALUES(title), tags=VALUES(tags), thumbnail=VALUES(thumbnail), 
-            description=VALUES(description), published_date=VALUES(published_date), 
-            duration=VALUES(duration), views=VALUES(views), comment_count=VALUES(comment_count),
-            favorite_count=VALUES(favorite_count), definition=VALUES(definition),
-            caption_status=VALUES(caption_status)
-    """
 
     try:
-        cursor.executemany(insert_query, videos)
-        conn.commit()
-        print("✅ Videos inserted successfully!")
+        result = store_videos(conn, videos)
+        print(f"✅ Videos stored: {result['inserted']} inserted, {result['updated']} updated.")
+        refresh_channel_stats(conn, [video[1] for video in videos])
+        record_snapshots(conn, video_stat_rows(videos), [video[1] for video in videos])
+        return True
     except mysql.connector.Error as err:
         print(f"❌ Error inserting videos: {err}")
-        conn.rollback()
+        return False
     finally:
         conn.close()
 
-# Test with a Sample Channel ID
-if __name__ == "__main__":
-    test_channel_id = os.getenv("TEST_CHANNEL_ID", "")
-    if test_channel_id:
-        videos = get_videos(test_channel_id)
-        if videos:
-            insert_videos(videos)
-    else:
-        print("No test channel ID provided.")
-
-import mysql.connector
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from datetime import datetime
-
-# API Keys (Replace with environment variables or a secure method to store keys)
-api_keys = [
-    "YOUR_API_KEY_1",
-    "YOUR_API_KEY_2",
-    "YOUR_API_KEY_3",
-    "YOUR_API_KEY_4"
-]
 
-# MySQL connection setup (Use environment variables for credentials)
+# MySQL connection setup (credentials come from the DB_* environment variables)
 def create_connection():
-    return mysql.connector.connect(
-        host="YOUR_HOST", 
-        user="YOUR_USER",       
-        password="YOUR_PASSWORD",  
-        database="YOUR_DATABASE"   
-    )
+    return get_mysql_pool().getconn()
 
 # Convert YouTube datetime to MySQL datetime format
 def convert_to_mysql_datetime(yt_datetime):
@@ -480,166 +495,109 @@ def convert_to_mysql_datetime(yt_datetime):
         print(f"Error converting datetime: {e}")
         return None
 
-# Function to fetch video comments for a given video ID
-def get_video_comments(video_id):
+# Function to fetch video comments for a given video ID (all pages unless max_comments is set)
+def get_video_comments(video_id, max_comments=None):
     comments = []
     
-    for api_key in api_keys:
-        try:
-            youtube = build('youtube', 'v3', developerKey=api_key)
-            request = youtube.commentThreads().list(
-                part="snippet",
-                videoId=video_id,
-                maxResults=50
-            )
-            response = request.execute()
-
-            if 'items' in response:
-                for item in response['items']:
-                    comment = {
-                        'Comment_Id': item['id'],
-                        'Video_Id': video_id,
-                        'Comment_Text': item['snippet']['topLevelComment']['snippet'].get('textDisplay', 'No text available'),
-                        'Author': item['snippet']['topLevelComment']['snippet'].get('authorDisplayName', 'Unknown'),
-                        'Published_Date': convert_to_mysql_datetime(item['snippet']['topLevelComment']['snippet']['publishedAt']),
-                        'Likes': item['snippet']['topLevelComment']['snippet']['likeCount']
-                    }
-                    comments.append(comment)
-            
-            if comments:
-                return comments
-            else:
-                print(f"No comments found for video {video_id}.")
-                return None
-
-        except HttpError as e:
-            if e.resp.status == 403:  # Quota Exceeded error
-                print(f"API Key {api_key} quota exceeded. Trying the next API key...")
-                continue  # Try with the next API key
-            else:
-                print(f"Error fetching comments for video {video_id}: {e}")
-                return None
+    try:
+        for items, _ in iter_comment_pages(video_id):
+            if max_comments is not None:
+                items = items[:max(max_comments - len(comments), 0)]
+            comments.extend(comment_info(item, video_id) for item in items)
+            if max_comments is not None and len(comments) >= max_comments:
+                break
+        
+        if comments:
+            return comments
+        else:
+            print(f"No comments found for video {video_id}.")
+            return None
 
-    print(f"All API keys exceeded quota or failed for video {video_id}.")
-    return None
+    except HttpError as e:
+        print(f"Error fetching comments for video {video_id}: {e}")
+        return None
 
 # Function to insert comment data into MySQL
 def insert_comment_data(connection, comment_data):
+    comment_data_list = [(comment['Comment_Id'], comment['Video_Id'], comment['Comment_Text'],
+                          comment['Author'], comment['Published_Date'], comment['Likes'], comment.get('Channel_Id'))
+                         for comment in comment_data]
     try:
-        cursor = connection.cursor()
-        comment_data_list = [(comment['Comment_Id'], comment['Video_Id'], comment['Comment_Text'],
-                              comment['Author'], comment['Published_Date'], comment['Likes'])
-                             for comment in comment_data]
-
-        cursor.executemany("""
-            INSERT INTO comments (comment_id, video_id, comment_text, comment_author, published_date, likes)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, comment_data_list)
-
-        connection.commit()
-        print(f"Successfully inserted {len(comment_data)} comments.")
+        result = bulk_upsert(connection, "comments",
+                             ["comment_id", "video_id", "comment_text", "comment_author", "published_date", "likes",
+                              "channel_id"],
+                             comment_data_list, ["comment_id"], update_columns=["comment_text", "likes"])
+        print(f"Successfully stored {result['rows']} comments ({result['inserted']} new).")
     except Exception as e:
-        connection.rollback()
         print(f"Error inserting comment data: {e}")
-    finally:
-        cursor.close()
 
-# Function to fetch video IDs for a given channel
-def get_video_ids(api_key, channel_id):
-    youtube = build("youtube", "v3", developerKey=api_key)
-    video_ids = []
-    next_page_token = None
-
-    while True:
-        request = youtube.search().list(
-            part="id",
-            channelId=channel_id,
-            maxResults=50,
-            type="video",
-            pageToken=next_page_token
-        )
-        response = request.execute()
-
-        for item in response.get("items", []):
-            video_ids.append(item["id"]["videoId"])
-
-        next_page_token = response.get("nextPageToken")
-        if not next_page_token:
-            break
+# Function to fetch all video IDs for a given channel (uploads playlist; search.list only as a fallback)
+def search_video_ids(channel_id):
+    return discover_video_ids(channel_id)
 
-    return video_ids
+MAX_COMMENTS_PER_VIDEO = int(os.getenv("MAX_COMMENTS_PER_VIDEO", "0")) or None
 
-CHANNEL_ID = "YOUR_CHANNEL_ID"  # Replace with the desired channel ID
-video_ids = get_video_ids(api_keys[0], CHANNEL_ID)
-connection = create_connection()
-
-for video_id in video_ids:
-    print(f"Fetching comments for video {video_id}...")
-    comments = get_video_comments(video_id)
-    if comments:
-        insert_comment_data(connection, comments)
-    else:
-        print(f"No comments found for video {video_id}.")
-
-connection.close()
+# Streams every comment page of the channel's videos into MySQL in batches; re-running resumes unfinished videos
+def harvest_channel_comments(channel_id, max_comments=MAX_COMMENTS_PER_VIDEO):
+    video_ids = search_video_ids(channel_id)
+    connection = create_connection()
+    try:
+        harvest_comments(connection, video_ids, max_comments=max_comments)
+    finally:
+        connection.close()
 
 # Function to get playlists from a YouTube channel
 def get_playlists(channel_id):
+    pool = get_pool()
     playlists = []
+    next_page_token = None
     
-    for api_key in api_keys:
-        try:
-            youtube = build('youtube', 'v3', developerKey=api_key)
-            request = youtube.playlists().list(
+    try:
+        while True:
+            response = pool.execute(lambda yt: yt.playlists().list(
                 part="snippet",
                 channelId=channel_id,
-                maxResults=50
-            )
-            while request:
-                response = request.execute()
-                for item in response["items"]:
-                    playlists.append({
-                        "playlist_id": item["id"],
-                        "title": item["snippet"]["title"],
-                        "channel_id": item["snippet"]["channelId"],
-                        "channel_name": item["snippet"]["channelTitle"],
-                        "published_at": convert_to_mysql_datetime(item["snippet"].get("publishedAt", None)),
-                        "video_count": item["snippet"].get("itemCount", 0)
-                    })
-                request = youtube.playlists().list_next(request, response)
-            
-            if playlists:
-                return playlists
-        except HttpError as e:
-            if e.resp.status == 403:
-                print(f"API Key {api_key} quota exceeded. Trying the next API key...")
-                continue  
-            else:
-                print(f"Error fetching playlists for channel {channel_id}: {e}")
-                return []
+                maxResults=50,
+                pageToken=next_page_token
+            ))
+            for item in response["items"]:
+                playlists.append({
+                    "playlist_id": item["id"],
+                    "title": item["snippet"]["title"],
+                    "channel_id": item["snippet"]["channelId"],
+                    "channel_name": item["snippet"]["channelTitle"],
+                    "published_at": convert_to_mysql_datetime(item["snippet"].get("publishedAt", None)),
+                    "video_count": item["snippet"].get("itemCount", 0)
+                })
+            next_page_token = response.get("nextPageToken")
+            if not next_page_token:
+                break
+    except HttpError as e:
+        print(f"Error fetching playlists for channel {channel_id}: {e}")
+        return []
     
-    print(f"All API keys exceeded quota or failed for channel {channel_id}.")
-    return []
+    return playlists
 
 def insert_playlist_data(playlists, connection):
-    cursor = connection.cursor()
-    for playlist in playlists:
-        try:
-            cursor.execute("""
-                INSERT INTO playlists (playlist_id, title, channel_id, channel_name, published_at, video_count)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (playlist["playlist_id"], playlist["title"], playlist["channel_id"], playlist["channel_name"], 
-                  playlist["published_at"], playlist["video_count"]))
-            connection.commit()
-        except mysql.connector.Error as err:
-            print(f"Error inserting playlist {playlist['title']}: {err}")
-            connection.rollback()
-    cursor.close()
-
-for channel_id in [CHANNEL_ID]:
-    playlists = get_playlists(channel_id)
-    if playlists:
-        insert_playlist_data(playlists, connection)
-
-print("Playlist data inserted successfully!")
+    rows = [(playlist["playlist_id"], playlist["title"], playlist["channel_id"], playlist["channel_name"],
+             playlist["published_at"], playlist["video_count"]) for playlist in playlists]
+    try:
+        bulk_upsert(connection, "playlists", PLAYLIST_COLUMNS, rows, ["playlist_id"])
+    except mysql.connector.Error as err:
+        print(f"Error inserting playlists: {err}")
+
+def harvest_playlists(channel_ids):
+    connection = create_connection()
+    try:
+        for channel_id in channel_ids:
+            playlists = get_playlists(channel_id)
+            if playlists:
+                insert_playlist_data(playlists, connection)
+        print("Playlist data inserted successfully!")
+    finally:
+        connection.close()
 
+# Same as `python harvester.py` (init-schema, harvest, comments, ...)
+if __name__ == "__main__":
+    import harvester
+    sys.exit(harvester.main(sys.argv[1:]))